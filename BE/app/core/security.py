@@ -17,6 +17,8 @@ SECRET_KEY = os.getenv("SECRET_KEY", "default_secret_key")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+# Static bearer token for metrics scrapers, which can't log in; unset allows admins only
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
 class Security():
     def __init__(self):
@@ -181,4 +183,24 @@ async def get_current_recruiter(credentials: HTTPAuthorizationCredentials = Depe
             detail="Access denied. Recruiter role required."
         )
     
-    return payload.get("user_id")
\ No newline at end of file
+    return payload.get("user_id")
+
+
+async def get_metrics_viewer(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> str:
+    """
+    FastAPI dependency for operational endpoints (metrics).
+    Accepts the METRICS_TOKEN scrape token or the JWT of an admin.
+    Raises HTTPException otherwise.
+    """
+    token = credentials.credentials
+    if METRICS_TOKEN and secrets.compare_digest(token, METRICS_TOKEN):
+        return "metrics-scraper"
+    
+    payload = await security.get_current_user(token)
+    if payload.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Admin role required."
+        )
+    
+    return payload.get("user_id")
@@ -1,6 +1,6 @@
 from beanie import Document, init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
-from app.database.models import user, candidate, recruiter, resume_analysis, job, gmail_integration, template
+from app.database.models import user, candidate, recruiter, resume_analysis, job, gmail_integration, template, resume_document, processed_attachment, lease, scan_job, scan_run, outbox_email
 from app.utils.logger import get_logger
 import os
 import dotenv
@@ -29,7 +29,13 @@ class Connection:
                         resume_analysis.ResumeAnalysis,
                         job.Job,
                         gmail_integration.GmailIntegration,
-                        template.ResumeTemplate
+                        template.ResumeTemplate,
+                        resume_document.ResumeDocument,
+                        processed_attachment.ProcessedAttachment,
+                        lease.Lease,
+                        scan_job.ScanJob,
+                        scan_run.ScanRun,
+                        outbox_email.OutboxEmail
                     ]
                 )
                 ping = await db_client.db.command("ping")
@@ -29,9 +29,11 @@ class GmailIntegration(Document):
     last_scan_status: Optional[str] = None  # success, error
     last_scan_count: int = Field(default=0, description="Number of CVs processed in last scan")
     last_error: Optional[str] = None
+    history_id: Optional[str] = None  # Gmail mailbox historyId at the last successful scan (incremental sync)
     
     # Email notification settings
     send_notifications: bool = Field(default=True, description="Send email after analysis")
+    notification_mode: str = Field(default="immediate", description="immediate, hourly or daily digest")
     notification_email: Optional[str] = None  # Override email for notifications
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -53,6 +55,7 @@ class GmailIntegration(Document):
                 "scan_schedule": "daily",
                 "scan_time": "09:00",
                 "is_active": True,
-                "send_notifications": True
+                "send_notifications": True,
+                "notification_mode": "immediate"
             }
         }
@@ -1,6 +1,6 @@
 from beanie import Document, Link
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from enum import Enum
 from app.database.models.common import Location
@@ -20,6 +20,13 @@ class JobStatus(str, Enum):
     CLOSED = "closed"
     DRAFT = "draft"
 
+class JobKeywordProfile(BaseModel):
+    """Search keywords and term weights derived from a job's title and description"""
+    keywords: List[str] = []  # Ranked phrases used to search mailboxes for applications
+    term_counts: Dict[str, float] = {}  # Weighted term frequencies used for resume matching
+    version: int = 1  # Bumped when the profile algorithm changes
+    computed_at: datetime = Field(default_factory=datetime.utcnow)
+
 class Job(Document):
     company_id: str  # Link back to CompanyProfile
     recruiter_id: str # Link to the specific user who posted it
@@ -34,6 +41,9 @@ class Job(Document):
     status: JobStatus = JobStatus.OPEN
     candidates_count: int = 0
     
+    # Recomputed whenever the title or description changes
+    keyword_profile: Optional[JobKeywordProfile] = None
+    
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Settings:
@@ -0,0 +1,20 @@
+from beanie import Document
+from pymongo import IndexModel, ASCENDING
+from datetime import datetime
+
+
+class Lease(Document):
+    """
+    Time-limited named lock shared by all API/worker processes.
+    Used for scheduler leader election and per-integration scan locks.
+    """
+    name: str  # e.g. "scheduler-leader", "scan:<integration_id>"
+    holder: str  # Process or run that owns the lease
+    expires_at: datetime  # The lease is free once this has passed
+    renewed_at: datetime
+
+    class Settings:
+        name = "leases"
+        indexes = [
+            IndexModel([("name", ASCENDING)], unique=True),
+        ]
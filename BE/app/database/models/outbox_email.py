@@ -0,0 +1,34 @@
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from typing import Optional
+from datetime import datetime
+
+
+class OutboxEmail(Document):
+    """
+    An email waiting to be sent, or already sent, by the outbox sender.
+    Callers only insert; the sender claims, sends and retries them.
+    """
+    to_email: str
+    subject: str
+    html_content: str
+    from_email: Optional[str] = None
+    from_name: Optional[str] = None
+
+    status: str = "pending"  # pending, sending, sent, failed
+    attempts: int = 0
+    last_error: Optional[str] = None
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    claimed_by: Optional[str] = None
+    claimed_until: Optional[datetime] = None  # A "sending" email past this is claimed again
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: Optional[datetime] = None
+
+    class Settings:
+        name = "email_outbox"
+        indexes = [
+            IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+            IndexModel([("status", ASCENDING), ("claimed_until", ASCENDING)]),
+        ]
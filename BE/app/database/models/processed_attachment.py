@@ -0,0 +1,34 @@
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from typing import Optional
+from datetime import datetime
+
+
+class ProcessedAttachment(Document):
+    """
+    Ledger of email attachments handled by a Gmail integration's scans.
+    An entry is claimed ("processing") before analysis and marked "done" afterwards,
+    so overlapping or repeated scans never analyze the same attachment twice.
+    """
+    integration_id: str
+    message_id: str  # Gmail message id
+    part_id: str  # MIME partId; stable for a message, unlike the attachment id
+    content_hash: str  # SHA-256 of the attachment bytes (same key as ResumeDocument)
+    filename: Optional[str] = None
+
+    status: str = "processing"  # processing, done
+    analysis_id: Optional[str] = None
+
+    claimed_at: datetime = Field(default_factory=datetime.utcnow)
+    processed_at: Optional[datetime] = None
+
+    class Settings:
+        name = "processed_attachments"
+        indexes = [
+            IndexModel(
+                [("integration_id", ASCENDING), ("message_id", ASCENDING), ("content_hash", ASCENDING)],
+                unique=True
+            ),
+            IndexModel([("integration_id", ASCENDING), ("message_id", ASCENDING), ("part_id", ASCENDING)]),
+        ]
@@ -1,6 +1,7 @@
 from beanie import Document
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 
@@ -20,6 +21,20 @@ class AnalysisScores(BaseModel):
     ats_compatibility_score: float = Field(..., ge=0, le=100)
 
 
+class LocalMetrics(BaseModel):
+    """Deterministic metrics computed from the extracted text (no LLM involved)"""
+    word_count: int = 0
+    section_count: int = 0
+    missing_sections: List[str] = []
+    bullet_ratio: float = 0.0
+    quantified_bullet_ratio: float = 0.0
+    avg_sentence_length: float = 0.0
+    has_contact_info: bool = False
+    ats_score: float = 0.0
+    readability_score: float = 0.0
+    keyword_match: Optional[float] = None  # None when no job description was given
+
+
 class JobContext(BaseModel):
     """Job details provided for targeted analysis"""
     job_title: Optional[str] = None
@@ -33,6 +48,12 @@ class ResumeAnalysis(Document):
     """
     user_id: str  # Reference to User document ID
     job_id: Optional[str] = None  # Reference to Job document ID (if analysis is for a specific job)
+    document_id: Optional[str] = None  # Reference to the extracted ResumeDocument
+    
+    # Where the resume came from
+    source: str = "upload"  # upload, gmail
+    candidate_email: Optional[str] = None  # Sender address for resumes received by email
+    source_metadata: Optional[Dict[str, Any]] = None  # e.g. Gmail message id, subject, date, scan run id
     
     # Resume file information
     file_name: str
@@ -44,6 +65,7 @@ class ResumeAnalysis(Document):
     
     # Analysis results
     scores: AnalysisScores
+    local_metrics: Optional[LocalMetrics] = None
     
     # Strengths identified
     strengths: List[str] = []
@@ -61,6 +83,11 @@ class ResumeAnalysis(Document):
     # Raw AI response (optional - for debugging/future reference)
     raw_analysis: Optional[str] = None
     
+    # Versioning (re-scores after a fix link back to the analysis they were derived from)
+    parent_analysis_id: Optional[str] = None
+    version: int = 1
+    changed_sections: Optional[List[str]] = None
+    
     # Metadata
     analyzed_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -69,6 +96,14 @@ class ResumeAnalysis(Document):
         indexes = [
             "user_id",  # Index for fast user-based queries
             "job_id",   # Index for filtering by job
+            "document_id",  # Index for finding analyses of the same resume
+            "parent_analysis_id",  # Index for walking analysis versions
+            "source",  # Index for separating scanned resumes from uploads
             "analyzed_at",  # Index for sorting by date
+            # Index for the best candidates of a Gmail scan run (notification summaries)
+            IndexModel(
+                [("source_metadata.scan_run_id", ASCENDING), ("scores.overall_score", DESCENDING)],
+                partialFilterExpression={"source_metadata.scan_run_id": {"$exists": True}}
+            ),
         ]
 
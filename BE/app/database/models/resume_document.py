@@ -0,0 +1,74 @@
+import zlib
+from beanie import Document
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
+from typing import Optional, List
+from datetime import datetime
+
+
+class ResumeSection(BaseModel):
+    """Boundaries of a detected section inside the normalized resume text"""
+    name: str  # canonical name, e.g. "experience", "education", "skills"
+    heading: str  # heading line as it appears in the resume
+    start: int  # offset of the first character after the heading
+    end: int  # offset one past the last character of the section
+
+
+class ResumeDocument(Document):
+    """
+    Extracted representation of an uploaded resume, stored once per file content hash.
+    The analyzer, apply-fix and the Gmail scanner read this instead of re-parsing the binary.
+    """
+    content_hash: str  # SHA-256 of the raw file bytes (or of the text for derived documents)
+
+    # Source file information
+    file_name: str
+    file_type: Optional[str] = None
+    file_size: int = 0
+
+    # Normalized text, zlib-compressed to keep the collection compact
+    text_compressed: bytes
+    text_length: int = 0
+
+    # Structure detected during extraction
+    sections: List[ResumeSection] = Field(default_factory=list)
+    page_count: int = 0
+    links: List[str] = Field(default_factory=list)
+
+    # Set when this document was produced by editing another one (e.g. /apply-fix)
+    parent_document_id: Optional[str] = None
+
+    # Users who uploaded or derived this content; documents are shared across users by hash,
+    # so reads on behalf of a user must check they are listed (or have an analysis of it)
+    owner_ids: List[str] = Field(default_factory=list)
+
+    extracted_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "resume_documents"
+        indexes = [
+            IndexModel([("content_hash", ASCENDING)], unique=True),
+        ]
+
+    @staticmethod
+    def compress_text(text: str) -> bytes:
+        """Compress normalized text for storage"""
+        return zlib.compress(text.encode("utf-8"), 6)
+
+    def get_text(self) -> str:
+        """Return the decompressed normalized text"""
+        return zlib.decompress(self.text_compressed).decode("utf-8")
+
+    def get_section(self, name: str) -> Optional[ResumeSection]:
+        """Return the first section with the given canonical name"""
+        for section in self.sections:
+            if section.name == name:
+                return section
+        return None
+
+    def get_section_text(self, name: str) -> Optional[str]:
+        """Return the text of a section, or None if the section was not detected"""
+        section = self.get_section(name)
+        if not section:
+            return None
+        return self.get_text()[section.start:section.end].strip()
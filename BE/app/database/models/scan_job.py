@@ -0,0 +1,44 @@
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from typing import List, Optional
+from datetime import datetime
+
+
+class ScanJob(Document):
+    """
+    A queued Gmail scan, enqueued by the API or the scheduler and executed by a
+    scan worker (`python -m app.worker`, or the API process in combined mode).
+    """
+    integration_id: str
+    job_ids: Optional[List[str]] = None  # Jobs to scan for; None = the integration's defaults
+    trigger: str = "manual"  # manual, scheduled
+
+    status: str = "queued"  # queued, running, done, failed
+    # The integration id while queued or running, cleared afterwards; its unique index
+    # keeps a single active scan per integration
+    active_key: Optional[str] = None
+    attempts: int = 0
+    error: Optional[str] = None
+
+    enqueued_at: datetime = Field(default_factory=datetime.utcnow)
+    scheduled_for: Optional[datetime] = None  # Fire time of a scheduled scan (UTC)
+    available_at: datetime = Field(default_factory=datetime.utcnow)  # Not claimed before this (retry backoff)
+
+    worker_id: Optional[str] = None
+    started_at: Optional[datetime] = None
+    lease_until: Optional[datetime] = None  # A running job whose worker stops renewing is retried
+    finished_at: Optional[datetime] = None
+
+    class Settings:
+        name = "scan_jobs"
+        indexes = [
+            IndexModel([("status", ASCENDING), ("available_at", ASCENDING)]),
+            IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)]),
+            IndexModel([("integration_id", ASCENDING), ("status", ASCENDING)]),
+            IndexModel(
+                [("active_key", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"active_key": {"$type": "string"}}
+            ),
+        ]
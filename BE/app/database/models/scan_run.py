@@ -0,0 +1,94 @@
+from beanie import Document, PydanticObjectId
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from typing import List, Optional
+from datetime import datetime
+
+
+class ScanCheckpoint(BaseModel):
+    """Where an interrupted scan continues from"""
+    mode: Optional[str] = None  # incremental, full
+    history_id: Optional[str] = None  # Mailbox position when the scan first started
+    search_query: Optional[str] = None
+    page_token: Optional[str] = None  # Next page of search_query
+    processed_message_ids: List[str] = Field(default_factory=list)
+
+
+class ScanCounters(BaseModel):
+    emails_seen: int = 0
+    attachments_fetched: int = 0
+    attachments_skipped: int = 0  # Already processed by an earlier scan
+    resumes_extracted: int = 0
+    analyzed: int = 0
+    failed: int = 0  # Attachments that could not be extracted or analyzed
+
+
+class CandidateSummary(BaseModel):
+    analysis_id: str
+    file_name: str
+    candidate_email: Optional[str] = None
+    job_title: Optional[str] = None
+    score: float
+
+
+class ScanSummary(BaseModel):
+    """What a finished run found, precomputed for notification emails"""
+    analyzed: int = 0
+    job_titles: List[str] = Field(default_factory=list)
+    top_candidates: List[CandidateSummary] = Field(default_factory=list)
+
+
+class ScanRun(Document):
+    """
+    One execution of a Gmail scan, checkpointed after every page of messages.
+    A run still marked "running" when the next scan of its integration starts was
+    interrupted and is resumed from its checkpoint.
+    """
+    integration_id: str
+    trigger: str = "manual"  # manual, scheduled
+    scan_job_ids: List[str] = Field(default_factory=list)  # Queued scans that ran it (one per resume)
+    status: str = "running"  # running, success, error, interrupted
+    error: Optional[str] = None
+    resumed_count: int = 0
+
+    checkpoint: ScanCheckpoint = Field(default_factory=ScanCheckpoint)
+    counters: ScanCounters = Field(default_factory=ScanCounters)
+
+    # Notification of the run's results; pending runs are sent in the recipient's next digest
+    summary: Optional[ScanSummary] = None
+    notification_status: Optional[str] = None  # pending, sending, sent, skipped, failed
+    notification_attempts: int = 0
+    notification_recipient: Optional[str] = None
+    notification_mode: Optional[str] = None  # immediate, hourly, daily
+    notification_claim: Optional[str] = None  # Digest send that owns the run while "sending"
+
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+    class Settings:
+        name = "scan_runs"
+        indexes = [
+            IndexModel([("integration_id", ASCENDING), ("started_at", DESCENDING)]),
+            IndexModel([("integration_id", ASCENDING), ("status", ASCENDING)]),
+            IndexModel([("scan_job_ids", ASCENDING)]),
+            IndexModel(
+                [("notification_status", ASCENDING), ("finished_at", ASCENDING)],
+                partialFilterExpression={"notification_status": {"$type": "string"}}
+            ),
+        ]
+
+
+class ScanRunProgress(BaseModel):
+    """A ScanRun without its checkpoint, for the progress endpoints"""
+    id: PydanticObjectId = Field(alias="_id")
+    integration_id: str
+    trigger: str
+    scan_job_ids: List[str] = Field(default_factory=list)
+    status: str
+    error: Optional[str] = None
+    resumed_count: int = 0
+    counters: ScanCounters
+    started_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from beanie import PydanticObjectId
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Union
 from datetime import datetime
+import asyncio
+import json
 import secrets
 
 from app.core.security import get_current_recruiter
 from app.database.models.gmail_integration import GmailIntegration
 from app.database.models.job import Job
+from app.database.models.scan_job import ScanJob
+from app.database.models.scan_run import ScanRun, ScanRunProgress
 from app.services.gmail_service import gmail_service
+from app.services.notification_service import NOTIFICATION_MODES
+from app.services.scan_queue import MAX_QUEUED_SCANS, ScanQueueFull, scan_queue
+from app.services.scheduler_service import schedule_integration, unschedule_integration
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -27,6 +36,7 @@ class GmailConfigUpdate(BaseModel):
     job_ids: Optional[List[str]] = None
     keywords: Optional[List[str]] = None
     send_notifications: Optional[bool] = None
+    notification_mode: Optional[str] = Field(None, description="immediate, hourly or daily digest")
     notification_email: Optional[str] = None
 
 
@@ -35,6 +45,85 @@ class ScanNowRequest(BaseModel):
     job_ids: Optional[List[str]] = None
 
 
+# How often the progress stream checks a running scan
+SCAN_EVENTS_POLL_SECONDS = 1.0
+# Comment line sent on an idle stream so proxies keep it open
+SCAN_EVENTS_KEEPALIVE_SECONDS = 15.0
+
+
+def _scan_run_data(run: ScanRunProgress) -> dict:
+    return {
+        "scan_id": str(run.id),
+        "trigger": run.trigger,
+        "status": run.status,
+        "error": run.error,
+        "resumed_count": run.resumed_count,
+        "counters": run.counters.model_dump(),
+        "started_at": run.started_at.isoformat(),
+        "updated_at": run.updated_at.isoformat(),
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None
+    }
+
+
+def _queued_scan_data(scan_job: ScanJob) -> dict:
+    return {
+        "scan_id": str(scan_job.id),
+        "trigger": scan_job.trigger,
+        "status": "queued" if scan_job.status in ("queued", "running") else scan_job.status,
+        "error": scan_job.error,
+        "enqueued_at": scan_job.enqueued_at.isoformat()
+    }
+
+
+async def _find_scan(integration_id: str, scan_id: str) -> Optional[Union[ScanRunProgress, ScanJob]]:
+    """
+    The scan run with this id, or the run started for the queued scan with this id
+    (as returned by /scan-now); the queued scan itself if no worker has started it yet
+    """
+    try:
+        object_id = PydanticObjectId(scan_id)
+    except Exception:
+        return None
+    
+    run = await ScanRun.find_one({
+        "integration_id": integration_id,
+        "$or": [{"_id": object_id}, {"scan_job_ids": scan_id}]
+    }).project(ScanRunProgress)
+    if run:
+        return run
+    return await ScanJob.find_one({"_id": object_id, "integration_id": integration_id})
+
+
+async def _get_integration_id(recruiter_id: str) -> str:
+    integration = await GmailIntegration.find_one(
+        GmailIntegration.recruiter_id == recruiter_id
+    )
+    if not integration:
+        raise HTTPException(status_code=404, detail="No Gmail integration found")
+    return str(integration.id)
+
+
+def _scan_data(scan: Union[ScanRunProgress, ScanJob]) -> dict:
+    return _queued_scan_data(scan) if isinstance(scan, ScanJob) else _scan_run_data(scan)
+
+
+async def _scan_event(scan: Union[ScanRunProgress, ScanJob], data: dict) -> str:
+    """
+    "progress" while the scan is queued or running, "retrying" while a failed run's
+    scan is queued to resume it, and "done" once it has finished for good
+    """
+    if data["status"] in ("queued", "running"):
+        return "progress"
+    if data["status"] == "error" and isinstance(scan, ScanRunProgress) and scan.scan_job_ids:
+        retry = await ScanJob.find_one({
+            "_id": {"$in": [PydanticObjectId(job_id) for job_id in scan.scan_job_ids]},
+            "status": {"$in": ["queued", "running"]},
+        })
+        if retry is not None:
+            return "retrying"
+    return "done"
+
+
 @router.get("/status")
 async def get_gmail_status(recruiter_id: str = Depends(get_current_recruiter)):
     """Get Gmail integration status for current recruiter"""
@@ -67,6 +156,7 @@ async def get_gmail_status(recruiter_id: str = Depends(get_current_recruiter)):
                 "last_scan_status": integration.last_scan_status,
                 "last_scan_count": integration.last_scan_count,
                 "send_notifications": integration.send_notifications,
+                "notification_mode": integration.notification_mode,
                 "notification_email": integration.notification_email
             }
         }
@@ -112,7 +202,7 @@ async def gmail_oauth_callback(code: str, state: str):
         _, recruiter_id = state.rsplit(':', 1)
         
         # Exchange code for tokens
-        token_data = gmail_service.exchange_code_for_tokens(code)
+        token_data = await gmail_service.exchange_code_for_tokens(code)
         
         # Check if integration already exists
         existing = await GmailIntegration.find_one(
@@ -141,6 +231,8 @@ async def gmail_oauth_callback(code: str, state: str):
             )
             await integration.insert()
         
+        await schedule_integration(integration)
+        
         logger.info(f"Gmail connected successfully for recruiter {recruiter_id}")
         
         return {
@@ -168,7 +260,9 @@ async def disconnect_gmail(recruiter_id: str = Depends(get_current_recruiter)):
             raise HTTPException(status_code=404, detail="No Gmail integration found")
         
         # Delete the integration
+        gmail_service.evict_service(str(integration.id))
         await integration.delete()
+        await unschedule_integration(str(integration.id))
         
         return {
             "status": "success",
@@ -197,12 +291,24 @@ async def update_gmail_config(
         
         # Update fields
         update_data = config.dict(exclude_unset=True)
+        if update_data.get("notification_mode") not in (None, *NOTIFICATION_MODES):
+            raise HTTPException(
+                status_code=400,
+                detail=f"notification_mode must be one of: {', '.join(NOTIFICATION_MODES)}"
+            )
         for field, value in update_data.items():
             setattr(integration, field, value)
         
+        # The next scan does a full search with the new filters. It still only covers mail
+        # received since the last scan (after:last_scan_at); older mail is not searched again
+        if "job_ids" in update_data or "keywords" in update_data:
+            integration.history_id = None
+        
         integration.updated_at = datetime.utcnow()
         await integration.save()
         
+        await schedule_integration(integration)
+        
         return {
             "status": "success",
             "message": "Configuration updated successfully",
@@ -211,7 +317,8 @@ async def update_gmail_config(
                 "scan_time": integration.scan_time,
                 "is_active": integration.is_active,
                 "job_ids": integration.job_ids,
-                "keywords": integration.keywords
+                "keywords": integration.keywords,
+                "notification_mode": integration.notification_mode
             }
         }
     except HTTPException:
@@ -223,7 +330,6 @@ async def update_gmail_config(
 
 @router.post("/scan-now")
 async def trigger_manual_scan(
-    background_tasks: BackgroundTasks,
     request: ScanNowRequest,
     recruiter_id: str = Depends(get_current_recruiter)
 ):
@@ -239,22 +345,33 @@ async def trigger_manual_scan(
         if not integration.refresh_token:
             raise HTTPException(status_code=400, detail="No refresh token available. Please reconnect Gmail.")
         
-        # Import scan function to avoid circular imports
-        from app.services.scanner_service import perform_email_scan
-        
-        # Trigger scan in background
+        # A scan worker picks the scan up from the queue. If a scheduled or earlier
+        # manual scan is still queued or running, that scan is returned instead.
         job_ids = request.job_ids if request.job_ids else integration.job_ids
-        background_tasks.add_task(
-            perform_email_scan,
-            integration_id=str(integration.id),
-            job_ids=job_ids
-        )
+        try:
+            scan_job, created = await scan_queue.enqueue(
+                str(integration.id),
+                job_ids=job_ids,
+                trigger="manual",
+                max_queued=MAX_QUEUED_SCANS
+            )
+        except ScanQueueFull as e:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many scans are waiting. Please try again later.",
+                headers={"Retry-After": str(e.retry_after)}
+            )
         
         return {
             "status": "success",
-            "message": "Scan initiated. You will receive an email notification when complete.",
+            "message": (
+                "Scan initiated. You will receive an email notification when complete."
+                if created else "A scan is already in progress for this integration."
+            ),
             "data": {
-                "scan_initiated_at": datetime.utcnow().isoformat()
+                "scan_id": str(scan_job.id),
+                "already_running": not created,
+                "scan_initiated_at": scan_job.enqueued_at.isoformat()
             }
         }
     except HTTPException:
@@ -262,3 +379,92 @@ async def trigger_manual_scan(
     except Exception as e:
         logger.error(f"Error triggering scan: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/scans")
+async def list_scans(limit: int = 10, recruiter_id: str = Depends(get_current_recruiter)):
+    """Most recent scans of the recruiter's integration, newest first"""
+    try:
+        integration_id = await _get_integration_id(recruiter_id)
+        runs = await ScanRun.find(
+            {"integration_id": integration_id}
+        ).sort(-ScanRun.started_at).limit(min(max(limit, 1), 50)).project(ScanRunProgress).to_list()
+        
+        return {
+            "status": "success",
+            "data": [_scan_run_data(run) for run in runs]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing scans: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/scans/{scan_id}")
+async def get_scan_progress(scan_id: str, recruiter_id: str = Depends(get_current_recruiter)):
+    """Status and counters of one scan, by scan run id or by the id returned by /scan-now"""
+    try:
+        scan = await _find_scan(await _get_integration_id(recruiter_id), scan_id)
+        if scan is None:
+            raise HTTPException(status_code=404, detail="Scan not found")
+        return {
+            "status": "success",
+            "data": _scan_data(scan)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching scan progress: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/scans/{scan_id}/events")
+async def stream_scan_progress(
+    scan_id: str,
+    request: Request,
+    recruiter_id: str = Depends(get_current_recruiter)
+):
+    """
+    Server-sent events with the scan's progress
+
+    Sends a "progress" event whenever the scan's status or counters change, a
+    "retrying" event when a failed run is queued to be resumed (the stream stays open),
+    and a final "done" event once it has finished.
+    """
+    integration_id = await _get_integration_id(recruiter_id)
+    scan = await _find_scan(integration_id, scan_id)
+    if scan is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    
+    async def events():
+        current = scan
+        last_sent = None
+        idle = 0.0
+        while True:
+            data = _scan_data(current)
+            event = await _scan_event(current, data)
+            if (event, data) != last_sent:
+                last_sent = (event, data)
+                idle = 0.0
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                if event == "done":
+                    return
+            elif idle >= SCAN_EVENTS_KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            
+            await asyncio.sleep(SCAN_EVENTS_POLL_SECONDS)
+            idle += SCAN_EVENTS_POLL_SECONDS
+            if await request.is_disconnected():
+                return
+            
+            current = await _find_scan(integration_id, scan_id)
+            if current is None:
+                return
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
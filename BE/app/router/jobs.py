@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
 from app.core.security import get_current_user
 from app.database.models.job import Job
+from app.services.job_matcher import build_keyword_profile
 from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel
@@ -71,6 +72,9 @@ async def create_job(
             from app.database.models.common import Location
             new_job.location = Location(city=job_data.location)
         
+        # Keywords used by Gmail scans and resume routing
+        new_job.keyword_profile = build_keyword_profile(new_job)
+        
         result = await new_job.insert()
         print(f"Job inserted: {result}")
         
@@ -147,6 +151,11 @@ async def update_job(
             raise HTTPException(status_code=404, detail="Job not found")
         
         # Update fields
+        profile_stale = (
+            job.keyword_profile is None
+            or job.title != job_data.title
+            or job.description != (job_data.description or "")
+        )
         job.title = job_data.title
         job.description = job_data.description or ""
         job.type = job_data.type
@@ -156,6 +165,9 @@ async def update_job(
             from app.database.models.common import Location
             job.location = Location(city=job_data.location)
         
+        if profile_stale:
+            job.keyword_profile = build_keyword_profile(job)
+        
         await job.save()
         print(f"Job updated successfully: {job.id}")
         
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from app.core.security import get_metrics_viewer
+from app.utils.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("", status_code=200)
+async def get_metrics(viewer: str = Depends(get_metrics_viewer)):
+    """Operational metrics (Gmail quota budgets, scan counters) as JSON; admins or the metrics token only"""
+    return {
+        "status": "success",
+        "message": "Metrics retrieved successfully",
+        "data": metrics.snapshot()
+    }
+
+
+@router.get("/prometheus", response_class=PlainTextResponse)
+async def get_prometheus_metrics(viewer: str = Depends(get_metrics_viewer)):
+    """Operational metrics in the Prometheus text format; admins or the metrics token only"""
+    return metrics.render_prometheus()
@@ -2,8 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File,
 from fastapi.responses import FileResponse
 from app.core.security import get_current_user
 from app.services.analyze_service import ResumeAnalyzerService
+from app.services.extraction_service import resume_extraction_service
 from app.database.models.resume_analysis import ResumeAnalysis
 from app.utils.logger import get_logger
+from pydantic import BaseModel
 from typing import Optional, List
 import os
 import shutil
@@ -26,6 +28,15 @@ ALLOWED_EXTENSIONS = {".pdf", ".doc", ".docx"}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB in bytes
 
 
+class RescoreRequest(BaseModel):
+    """Re-score a previous analysis after a fix was applied"""
+    analysis_id: str
+    document_id: Optional[str] = None  # document_id returned by /apply-fix
+    modified_content: Optional[str] = None  # plain text, for clients without a document_id
+    section: Optional[str] = None  # canonical section the fix targeted, e.g. "experience"
+    fix_applied: Optional[str] = None
+
+
 def validate_file_extension(filename: str) -> bool:
     """Validate if the file extension is allowed."""
     file_ext = Path(filename).suffix.lower()
@@ -102,6 +113,11 @@ async def analyze_resume(
     try:
         temp_file_path = await save_upload_file_temp(file)
         
+        # Extract text and structure once per unique file
+        resume_document = await resume_extraction_service.get_or_extract(
+            file_content, file.filename, file.content_type, owner_id=current_user.get("user_id")
+        )
+        
         # Call Gemini AI service to analyze the resume
         analysis_result = await analyzer_service.analyze_resume(
             file_path=temp_file_path,
@@ -110,7 +126,8 @@ async def analyze_resume(
             file_size=file_size,
             file_type=file.content_type,
             job_title=job_title,
-            job_description=job_description
+            job_description=job_description,
+            resume_document=resume_document
         )
         
         # Cleanup: Delete the temporary file after analysis
@@ -237,6 +254,11 @@ async def analyze_bulk_resumes(
                 temp_file_path = await save_upload_file_temp(file)
                 temp_files.append(temp_file_path)
                 
+                # Extract text and structure once per unique file
+                resume_document = await resume_extraction_service.get_or_extract(
+                    file_content, file.filename, file.content_type, owner_id=current_user.get("user_id")
+                )
+                
                 # Analyze the resume
                 analysis_result = await analyzer_service.analyze_resume(
                     file_path=temp_file_path,
@@ -245,7 +267,8 @@ async def analyze_bulk_resumes(
                     file_size=file_size,
                     file_type=file.content_type,
                     job_title=job_title,
-                    job_description=job_description
+                    job_description=job_description,
+                    resume_document=resume_document
                 )
                 
                 result["status"] = "success"
@@ -437,6 +460,9 @@ async def get_analysis_detail(
             "status": "success",
             "analysis": {
                 "id": str(analysis.id),
+                "document_id": analysis.document_id,
+                "parent_analysis_id": analysis.parent_analysis_id,
+                "version": analysis.version,
                 "file_info": {
                     "name": analysis.file_name,
                     "size": analysis.file_size,
@@ -479,9 +505,10 @@ async def get_analysis_detail(
 
 @router.post("/apply-fix")
 async def apply_fix_to_resume(
-    cv_content: str = Form(...),
     fix_instruction: str = Form(...),
     category: str = Form(...),
+    cv_content: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
     original_filename: str = Form(default="resume.txt"),
     file: Optional[UploadFile] = File(None),
     current_user: dict = Depends(get_current_user)
@@ -490,6 +517,9 @@ async def apply_fix_to_resume(
     Apply an AI suggestion to the resume content.
     Saves the modified resume while preserving the original file structure.
     Returns the modified CV content and file paths.
+    
+    - document_id: ID of the stored extraction returned by /analyze (preferred over cv_content)
+    - cv_content: Plain text of the resume, for clients without a document_id
     """
     temp_file_path = None
     try:
@@ -497,6 +527,23 @@ async def apply_fix_to_resume(
         
         logger.info(f"Applying fix for user {user_id}, category: {category}")
         
+        # Read the resume text from the stored extraction instead of the request body
+        resume_document = None
+        if document_id:
+            resume_document = await resume_extraction_service.get_document(document_id, owner_id=user_id)
+            if not resume_document:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Resume document not found"
+                )
+            cv_content = resume_document.get_text()
+        
+        if not cv_content:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Either document_id or cv_content is required"
+            )
+        
         # Save uploaded file temporarily if provided
         if file:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -526,10 +573,19 @@ async def apply_fix_to_resume(
         
         logger.info(f"Modified CV saved - Original: {original_format_path}, PDF: {pdf_path}")
         
+        # Store the edited text so follow-up fixes and re-analysis don't need it posted back
+        modified_document = await resume_extraction_service.store_text(
+            text=modified_content,
+            file_name=original_filename,
+            parent_document_id=str(resume_document.id) if resume_document else None,
+            owner_id=user_id
+        )
+        
         return {
             "status": "success",
             "message": "Fix applied successfully and saved",
             "data": {
+                "document_id": str(modified_document.id),
                 "modified_content": modified_content,
                 "fix_applied": fix_instruction,
                 "category": category,
@@ -540,6 +596,8 @@ async def apply_fix_to_resume(
             }
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error applying fix: {str(e)}")
         raise HTTPException(
@@ -556,6 +614,98 @@ async def apply_fix_to_resume(
                 logger.warning(f"Failed to cleanup temp file: {str(e)}")
 
 
+@router.post("/rescore", status_code=status.HTTP_200_OK)
+async def rescore_resume(
+    request: RescoreRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Re-score a resume after a fix without a full re-analysis.
+    
+    - Recomputes local metrics for the patched resume
+    - Sends only the changed sections to the AI
+    - Saves the result as a new analysis version linked to the original
+    """
+    try:
+        user_id = current_user.get("user_id")
+        
+        previous = await ResumeAnalysis.get(request.analysis_id)
+        if not previous:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Analysis not found"
+            )
+        
+        if previous.user_id != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied"
+            )
+        
+        if not previous.document_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="This analysis has no stored resume text. Please run a full analysis."
+            )
+        
+        previous_document = await resume_extraction_service.get_document(previous.document_id)
+        if not previous_document:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Resume document not found"
+            )
+        
+        if request.document_id:
+            new_document = await resume_extraction_service.get_document(request.document_id, owner_id=user_id)
+            # Only the analysed resume or an edit of it (from /apply-fix) can be re-scored against it
+            if new_document and previous.document_id not in (str(new_document.id), new_document.parent_document_id):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="document_id is not the resume of this analysis or an edit of it"
+                )
+        elif request.modified_content:
+            new_document = await resume_extraction_service.store_text(
+                text=request.modified_content,
+                file_name=previous.file_name,
+                parent_document_id=previous.document_id,
+                owner_id=user_id
+            )
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Either document_id or modified_content is required"
+            )
+        
+        if not new_document:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Modified resume document not found"
+            )
+        
+        analysis_result = await analyzer_service.rescore_after_fix(
+            previous=previous,
+            previous_document=previous_document,
+            new_document=new_document,
+            section=request.section,
+            fix_applied=request.fix_applied
+        )
+        
+        return {
+            "status": "success",
+            "message": "Resume re-scored successfully",
+            "analysis": analysis_result
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error re-scoring resume: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error re-scoring resume: {str(e)}"
+        )
+
+
 @router.get("/download/{filename}")
 async def download_modified_resume(
     filename: str,
@@ -8,12 +8,17 @@ import json
 import re
 import uuid
 from datetime import datetime
+from beanie import PydanticObjectId
 from app.database.models.resume_analysis import (
     ResumeAnalysis, 
     AnalysisScores, 
     ImprovementSuggestion,
-    JobContext
+    JobContext,
+    LocalMetrics
 )
+from app.database.models.resume_document import ResumeDocument
+from app.services.scoring_service import compute_local_metrics, changed_sections
+from app.utils.document_renderer import render_docx, render_pdf
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -25,6 +30,10 @@ if not GEMINI_API_KEY:
 
 client = genai.Client(api_key=GEMINI_API_KEY)
 
+# Keys every full analysis response must contain
+ANALYSIS_REQUIRED_KEYS = ("score", "ats_score", "readability_score", "keyword_match",
+                          "strengths", "weaknesses", "suggestions")
+
 class ResumeAnalyzerService:
     """Service for analyzing resumes using Google Gemini AI with Google Search integration"""
     
@@ -74,22 +83,27 @@ If no links found, return an empty array: []
             
             links = json.loads(result_text)
             
-            # Filter for professional sites only
-            professional_domains = ['github.com', 'linkedin.com', 'gitlab.com', 'bitbucket.org', 
-                                   'stackoverflow.com', 'dev.to', 'medium.com']
-            filtered_links = [
-                link for link in links 
-                if any(domain in link.lower() for domain in professional_domains) or 
-                re.match(r'https?://[\w\-\.]+\.(io|dev|tech|me|com|net|org)', link.lower())
-            ]
+            filtered_links = self.filter_professional_links(links)
             
             logger.info(f"Extracted {len(filtered_links)} professional links")
-            return filtered_links[:5]  # Limit to top 5 links
+            return filtered_links
             
         except Exception as e:
             logger.warning(f"Failed to extract links: {str(e)}")
             return []
     
+    @staticmethod
+    def filter_professional_links(links: List[str]) -> List[str]:
+        """Keep only professional sites, limited to the top 5 links"""
+        professional_domains = ['github.com', 'linkedin.com', 'gitlab.com', 'bitbucket.org', 
+                               'stackoverflow.com', 'dev.to', 'medium.com']
+        filtered_links = [
+            link for link in links 
+            if any(domain in link.lower() for domain in professional_domains) or 
+            re.match(r'https?://[\w\-\.]+\.(io|dev|tech|me|com|net|org)', link.lower())
+        ]
+        return filtered_links[:5]
+    
     async def search_candidate_online(self, links: List[str], candidate_name: str = "") -> str:
         """Use Google Search to gather additional information about the candidate"""
         if not links and not candidate_name:
@@ -246,7 +260,8 @@ Return ONLY the JSON object, no additional text or markdown formatting.
         file_size: int,
         file_type: str,
         job_title: Optional[str] = None, 
-        job_description: Optional[str] = None
+        job_description: Optional[str] = None,
+        resume_document: Optional[ResumeDocument] = None
     ) -> Dict:
         """
         Main method to analyze a resume file using Gemini AI and save results to database
@@ -259,6 +274,7 @@ Return ONLY the JSON object, no additional text or markdown formatting.
             file_type: MIME type of the file
             job_title: Optional target job title
             job_description: Optional job description for targeted analysis
+            resume_document: Stored extraction of the file; its links replace the link-extraction call
             
         Returns:
             Dictionary containing analysis results
@@ -282,9 +298,12 @@ Return ONLY the JSON object, no additional text or markdown formatting.
             uploaded_file = self.client.files.upload(file=file_path)
             logger.info(f"File uploaded successfully to Gemini")
             
-            # 3. Extract professional links from resume
-            logger.info("Extracting professional links from resume...")
-            professional_links = await self.extract_professional_links(file_path)
+            # 3. Extract professional links from resume (reuse the stored extraction when available)
+            if resume_document is not None:
+                professional_links = self.filter_professional_links(resume_document.links)
+            else:
+                logger.info("Extracting professional links from resume...")
+                professional_links = await self.extract_professional_links(file_path)
             
             # 4. Search for additional information online if links found
             online_info = None
@@ -309,33 +328,19 @@ Return ONLY the JSON object, no additional text or markdown formatting.
                 ]
             )
             
-            # 7. Parse the response
-            result_text = response.text.strip()
+            # 7-9. Parse and validate the response
             logger.info("Received response from Gemini")
+            analysis_result, result_text = self._parse_analysis_response(response.text)
             
-            # Remove markdown code blocks if present
-            if result_text.startswith("```json"):
-                result_text = result_text[7:]
-            if result_text.startswith("```"):
-                result_text = result_text[3:]
-            if result_text.endswith("```"):
-                result_text = result_text[:-3]
-            
-            result_text = result_text.strip()
-            
-            # 8. Parse JSON response
-            analysis_result = json.loads(result_text)
-            
-            # 9. Validate the structure
-            required_keys = ["score", "ats_score", "readability_score", "keyword_match", 
-                           "strengths", "weaknesses", "suggestions"]
-            
-            for key in required_keys:
-                if key not in analysis_result:
-                    raise ValueError(f"Missing required key: {key}")
+            # 10. Compute local metrics from the stored extraction
+            local_metrics = None
+            if resume_document is not None:
+                local_metrics = compute_local_metrics(
+                    resume_document.get_text(), resume_document.sections, job_description
+                )
             
-            # 10. Save to database
-            await self._save_to_database(
+            # 11. Save to database
+            analysis_id = await self._save_to_database(
                 user_id=user_id,
                 file_name=file_name,
                 file_size=file_size,
@@ -345,12 +350,16 @@ Return ONLY the JSON object, no additional text or markdown formatting.
                 analysis_result=analysis_result,
                 raw_response=result_text,
                 professional_links=professional_links,
-                online_info=online_info
+                online_info=online_info,
+                document_id=str(resume_document.id) if resume_document else None,
+                local_metrics=local_metrics
             )
             
             # Add links and online info to response
             analysis_result["professional_links"] = professional_links or []
             analysis_result["online_info"] = online_info or None
+            analysis_result["analysis_id"] = analysis_id
+            analysis_result["document_id"] = str(resume_document.id) if resume_document else None
             
             return analysis_result
             
@@ -378,6 +387,185 @@ Return ONLY the JSON object, no additional text or markdown formatting.
                 except Exception as e:
                     logger.warning(f"Failed to delete file from Gemini: {str(e)}")
     
+    @staticmethod
+    def _parse_analysis_response(
+        response_text: str,
+        required_keys: Tuple[str, ...] = ANALYSIS_REQUIRED_KEYS
+    ) -> Tuple[Dict, str]:
+        """
+        Parse the JSON analysis returned by Gemini
+        
+        Args:
+            response_text: Raw model output, optionally wrapped in a markdown code block
+            required_keys: Keys the JSON object must contain
+        
+        Returns:
+            (analysis_result, cleaned JSON text)
+        
+        Raises:
+            json.JSONDecodeError: If the response is not JSON
+            ValueError: If the response is not an object or a required key is missing
+        """
+        result_text = response_text.strip()
+        
+        # Remove markdown code blocks if present
+        if result_text.startswith("```json"):
+            result_text = result_text[7:]
+        if result_text.startswith("```"):
+            result_text = result_text[3:]
+        if result_text.endswith("```"):
+            result_text = result_text[:-3]
+        
+        result_text = result_text.strip()
+        
+        analysis_result = json.loads(result_text)
+        if not isinstance(analysis_result, dict):
+            raise ValueError("Expected a JSON object")
+        
+        for key in required_keys:
+            if key not in analysis_result:
+                raise ValueError(f"Missing required key: {key}")
+        
+        return analysis_result, result_text
+    
+    async def analyze_resume_text(
+        self,
+        resume_text: str,
+        job_title: Optional[str] = None,
+        job_description: Optional[str] = None,
+        links: Optional[List[str]] = None,
+        candidate_name: str = ""
+    ) -> Dict:
+        """
+        Analyze already-extracted resume text (no file upload)
+        
+        Used by the Gmail scanner, whose attachments are extracted once and stored as
+        ResumeDocuments. Nothing is saved here; see build_analysis_document and
+        save_analyses.
+        
+        Args:
+            resume_text: Normalized resume text
+            job_title: Optional target job title
+            job_description: Optional job description for targeted analysis
+            links: Links detected in the resume text
+            candidate_name: Optional name used for the online search
+        
+        Returns:
+            Analysis result with "professional_links", "online_info" and "raw_response" added
+        
+        Raises:
+            json.JSONDecodeError, ValueError: If Gemini returned an unusable response
+        """
+        professional_links = self.filter_professional_links(links or [])
+        
+        online_info = None
+        if professional_links:
+            online_info = await self.search_candidate_online(professional_links, candidate_name)
+        
+        prompt = self.create_analysis_prompt(job_title, job_description, online_info, professional_links)
+        
+        # Async client so concurrent scan workers don't block the event loop
+        response = await self.client.aio.models.generate_content(
+            model='gemini-2.5-flash',
+            contents=[
+                prompt,
+                f"RESUME TEXT:\n{resume_text}"
+            ]
+        )
+        
+        analysis_result, result_text = self._parse_analysis_response(response.text)
+        analysis_result["professional_links"] = professional_links
+        analysis_result["online_info"] = online_info or None
+        analysis_result["raw_response"] = result_text
+        return analysis_result
+    
+    def build_analysis_document(
+        self,
+        user_id: str,
+        file_name: str,
+        file_size: int,
+        file_type: str,
+        job_title: Optional[str],
+        job_description: Optional[str],
+        analysis_result: Dict,
+        raw_response: str,
+        professional_links: Optional[List[str]] = None,
+        online_info: Optional[str] = None,
+        document_id: Optional[str] = None,
+        local_metrics: Optional[LocalMetrics] = None,
+        job_id: Optional[str] = None,
+        source: str = "upload",
+        candidate_email: Optional[str] = None,
+        source_metadata: Optional[Dict] = None
+    ) -> ResumeAnalysis:
+        """Build an unsaved ResumeAnalysis document from a parsed AI analysis result"""
+        # Create JobContext if job details provided
+        job_context = None
+        if job_title or job_description:
+            job_context = JobContext(
+                job_title=job_title,
+                job_description=job_description
+            )
+        
+        # Create AnalysisScores
+        scores = AnalysisScores(
+            overall_score=float(analysis_result["score"]),
+            formatting_score=float(analysis_result["readability_score"]),
+            content_quality_score=float(analysis_result["score"]),  # Using overall score
+            keyword_optimization_score=float(analysis_result["keyword_match"]),
+            ats_compatibility_score=float(analysis_result["ats_score"])
+        )
+        
+        # Convert suggestions to ImprovementSuggestion objects
+        suggestions = [
+            ImprovementSuggestion(
+                category=s.get("category", "general"),
+                suggestion=f"{s.get('issue', '')}: {s.get('fix', '')}",
+                priority=s.get("priority", "medium")
+            )
+            for s in analysis_result.get("suggestions", [])
+        ]
+        
+        return ResumeAnalysis(
+            user_id=user_id,
+            job_id=job_id,
+            document_id=document_id,
+            source=source,
+            candidate_email=candidate_email,
+            source_metadata=source_metadata,
+            file_name=file_name,
+            file_size=file_size,
+            file_type=file_type,
+            job_context=job_context,
+            scores=scores,
+            local_metrics=local_metrics,
+            strengths=analysis_result.get("strengths", []),
+            weaknesses=analysis_result.get("weaknesses", []),
+            improvement_suggestions=suggestions,
+            professional_links=professional_links,
+            online_info=online_info,
+            raw_analysis=raw_response
+        )
+    
+    async def save_analyses(self, analyses: List[ResumeAnalysis]) -> List[str]:
+        """
+        Insert many analyses in one round trip
+        
+        Returns:
+            IDs of the saved analyses, in order
+        """
+        if not analyses:
+            return []
+        
+        # Assign ids up front so callers can reference the saved documents
+        for analysis in analyses:
+            if analysis.id is None:
+                analysis.id = PydanticObjectId()
+        
+        await ResumeAnalysis.insert_many(analyses)
+        logger.info(f"Saved {len(analyses)} analyses to database")
+        return [str(analysis.id) for analysis in analyses]
+    
     async def _save_to_database(
         self,
         user_id: str,
@@ -389,8 +577,10 @@ Return ONLY the JSON object, no additional text or markdown formatting.
         analysis_result: Dict,
         raw_response: str,
         professional_links: Optional[List[str]] = None,
-        online_info: Optional[str] = None
-    ) -> None:
+        online_info: Optional[str] = None,
+        document_id: Optional[str] = None,
+        local_metrics: Optional[LocalMetrics] = None
+    ) -> Optional[str]:
         """
         Save analysis results to MongoDB
         
@@ -403,60 +593,281 @@ Return ONLY the JSON object, no additional text or markdown formatting.
             job_description: Optional job description
             analysis_result: Parsed AI analysis result
             raw_response: Raw JSON string from AI
+            document_id: Optional ResumeDocument ID of the extracted resume
+            local_metrics: Optional deterministic metrics computed from the extracted text
+        
+        Returns:
+            ID of the saved analysis, or None if saving failed
+        """
+        try:
+            resume_analysis = self.build_analysis_document(
+                user_id=user_id,
+                file_name=file_name,
+                file_size=file_size,
+                file_type=file_type,
+                job_title=job_title,
+                job_description=job_description,
+                analysis_result=analysis_result,
+                raw_response=raw_response,
+                professional_links=professional_links,
+                online_info=online_info,
+                document_id=document_id,
+                local_metrics=local_metrics
+            )
+            
+            # Save to database
+            await resume_analysis.insert()
+            logger.info("Successfully saved analysis to database")
+            return str(resume_analysis.id)
+            
+        except Exception as e:
+            # Log error but don't fail the request
+            logger.error(f"Error saving to database: {str(e)}")
+            # We don't raise exception here because the analysis was successful
+            # Database save is supplementary
+            return None
+    
+    async def rescore_after_fix(
+        self,
+        previous: ResumeAnalysis,
+        previous_document: ResumeDocument,
+        new_document: ResumeDocument,
+        section: Optional[str] = None,
+        fix_applied: Optional[str] = None
+    ) -> Dict:
+        """
+        Re-score a resume after a fix without re-running the full analysis.
+        
+        Local metrics are recomputed for the whole text; only the changed sections are
+        sent to Gemini, and the result is merged into a new analysis version linked to
+        the previous one.
+        
+        Args:
+            previous: The analysis the fix was based on
+            previous_document: Extracted resume the previous analysis was run on
+            new_document: Extracted resume after the fix was applied
+            section: Optional canonical section name the fix targeted
+            fix_applied: Optional text of the applied suggestion
+            
+        Returns:
+            Dictionary in the same shape as analyze_resume plus version information
         """
         try:
-            # Create JobContext if job details provided
-            job_context = None
-            if job_title or job_description:
-                job_context = JobContext(
+            job_title = previous.job_context.job_title if previous.job_context else None
+            job_description = previous.job_context.job_description if previous.job_context else None
+            
+            old_text = previous_document.get_text()
+            new_text = new_document.get_text()
+            
+            # 1. Find which sections changed
+            changes = changed_sections(old_text, previous_document.sections, new_text, new_document.sections)
+            if section and section in changes:
+                changes = {section: changes[section]}
+            
+            # 2. Recompute local metrics for both versions
+            old_metrics = previous.local_metrics or compute_local_metrics(
+                old_text, previous_document.sections, job_description
+            )
+            new_metrics = compute_local_metrics(new_text, new_document.sections, job_description)
+            
+            # 3. Re-evaluate only the changed sections with the LLM
+            section_review = {}
+            if changes:
+                section_review = await self._review_changed_sections(
+                    changes=changes,
+                    previous=previous,
                     job_title=job_title,
-                    job_description=job_description
+                    job_description=job_description,
+                    fix_applied=fix_applied
                 )
             
-            # Create AnalysisScores
+            # 4. Merge deltas into the previous scores
+            def clamp(value: float) -> float:
+                return round(max(0.0, min(100.0, value)), 1)
+            
+            def llm_delta(key: str) -> float:
+                try:
+                    return max(-20.0, min(20.0, float(section_review.get(key, 0))))
+                except (TypeError, ValueError):
+                    return 0.0
+            
+            previous_scores = previous.scores
+            keyword_delta = llm_delta("keyword_delta")
+            if old_metrics.keyword_match is not None and new_metrics.keyword_match is not None:
+                keyword_delta = new_metrics.keyword_match - old_metrics.keyword_match
+            
             scores = AnalysisScores(
-                overall_score=float(analysis_result["score"]),
-                formatting_score=float(analysis_result["readability_score"]),
-                content_quality_score=float(analysis_result["score"]),  # Using overall score
-                keyword_optimization_score=float(analysis_result["keyword_match"]),
-                ats_compatibility_score=float(analysis_result["ats_score"])
+                overall_score=clamp(previous_scores.overall_score + llm_delta("overall_delta")),
+                formatting_score=clamp(
+                    previous_scores.formatting_score + llm_delta("readability_delta")
+                    + (new_metrics.readability_score - old_metrics.readability_score) * 0.5
+                ),
+                content_quality_score=clamp(previous_scores.content_quality_score + llm_delta("overall_delta")),
+                keyword_optimization_score=clamp(previous_scores.keyword_optimization_score + keyword_delta),
+                ats_compatibility_score=clamp(
+                    previous_scores.ats_compatibility_score + llm_delta("ats_delta")
+                    + (new_metrics.ats_score - old_metrics.ats_score) * 0.5
+                )
             )
             
-            # Convert suggestions to ImprovementSuggestion objects
+            resolved = set(section_review.get("resolved_weaknesses", []))
+            weaknesses = [w for w in previous.weaknesses if w not in resolved]
+            weaknesses.extend(w for w in section_review.get("new_weaknesses", []) if w not in weaknesses)
+            strengths = list(previous.strengths)
+            strengths.extend(s for s in section_review.get("new_strengths", []) if s not in strengths)
+            
             suggestions = [
+                suggestion for suggestion in previous.improvement_suggestions
+                if not (fix_applied and fix_applied in suggestion.suggestion)
+            ]
+            suggestions.extend(
                 ImprovementSuggestion(
-                    category=s.get("category", "general"),
+                    category=str(s.get("category", "general")),
                     suggestion=f"{s.get('issue', '')}: {s.get('fix', '')}",
-                    priority=s.get("priority", "medium")
+                    priority=str(s.get("priority", "medium"))
                 )
-                for s in analysis_result.get("suggestions", [])
-            ]
+                for s in section_review.get("suggestions", [])
+            )
             
-            # Create ResumeAnalysis document
+            # 5. Save as a new version linked to the original
             resume_analysis = ResumeAnalysis(
-                user_id=user_id,
-                file_name=file_name,
-                file_size=file_size,
-                file_type=file_type,
-                job_context=job_context,
+                user_id=previous.user_id,
+                job_id=previous.job_id,
+                document_id=str(new_document.id),
+                file_name=previous.file_name,
+                file_size=new_document.file_size,
+                file_type=previous.file_type,
+                job_context=previous.job_context,
                 scores=scores,
-                strengths=analysis_result.get("strengths", []),
-                weaknesses=analysis_result.get("weaknesses", []),
+                local_metrics=new_metrics,
+                strengths=strengths,
+                weaknesses=weaknesses,
                 improvement_suggestions=suggestions,
-                professional_links=professional_links,
-                online_info=online_info,
-                raw_analysis=raw_response
+                professional_links=previous.professional_links,
+                online_info=previous.online_info,
+                raw_analysis=json.dumps(section_review) if section_review else None,
+                parent_analysis_id=str(previous.id),
+                version=previous.version + 1,
+                changed_sections=list(changes.keys())
             )
-            
-            # Save to database
             await resume_analysis.insert()
-            logger.info("Successfully saved analysis to database")
+            logger.info(f"Saved re-scored analysis version {resume_analysis.version}")
             
+            return {
+                "analysis_id": str(resume_analysis.id),
+                "parent_analysis_id": str(previous.id),
+                "version": resume_analysis.version,
+                "document_id": str(new_document.id),
+                "changed_sections": list(changes.keys()),
+                "score": scores.overall_score,
+                "ats_score": scores.ats_compatibility_score,
+                "readability_score": scores.formatting_score,
+                "keyword_match": scores.keyword_optimization_score,
+                "score_change": round(scores.overall_score - previous_scores.overall_score, 1),
+                "ats_score_change": round(scores.ats_compatibility_score - previous_scores.ats_compatibility_score, 1),
+                "strengths": strengths,
+                "weaknesses": weaknesses,
+                "suggestions": [
+                    {
+                        "category": suggestion.category,
+                        "suggestion": suggestion.suggestion,
+                        "priority": suggestion.priority
+                    }
+                    for suggestion in suggestions
+                ],
+                "local_metrics": new_metrics.model_dump()
+            }
+            
+        except HTTPException:
+            raise
         except Exception as e:
-            # Log error but don't fail the request
-            logger.error(f"Error saving to database: {str(e)}")
-            # We don't raise exception here because the analysis was successful
-            # Database save is supplementary
+            logger.error(f"Error re-scoring resume: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error re-scoring resume: {str(e)}"
+            )
+    
+    async def _review_changed_sections(
+        self,
+        changes: Dict[str, Dict[str, str]],
+        previous: ResumeAnalysis,
+        job_title: Optional[str],
+        job_description: Optional[str],
+        fix_applied: Optional[str]
+    ) -> Dict:
+        """Ask Gemini to evaluate only the edited sections against the previous analysis"""
+        prompt = "You are an expert resume analyzer. A candidate edited part of their resume after a previous review.\n\n"
+        
+        if job_title or job_description:
+            prompt += "**TARGET JOB CONTEXT:**\n"
+            if job_title:
+                prompt += f"- Target Role: {job_title}\n"
+            if job_description:
+                prompt += f"- Job Description:\n{job_description}\n"
+            prompt += "\n"
+        
+        prompt += "**PREVIOUS SCORES:**\n"
+        prompt += f"- Overall: {previous.scores.overall_score}\n"
+        prompt += f"- ATS: {previous.scores.ats_compatibility_score}\n"
+        prompt += f"- Readability: {previous.scores.formatting_score}\n"
+        prompt += f"- Keyword match: {previous.scores.keyword_optimization_score}\n\n"
+        
+        if previous.weaknesses:
+            prompt += "**PREVIOUS WEAKNESSES:**\n"
+            prompt += "\n".join(f"- {w}" for w in previous.weaknesses) + "\n\n"
+        
+        if fix_applied:
+            prompt += f"**FIX APPLIED:** {fix_applied}\n\n"
+        
+        for name, change in changes.items():
+            prompt += f"**SECTION '{name}' BEFORE:**\n{change['before'] or '(empty)'}\n\n"
+            prompt += f"**SECTION '{name}' AFTER:**\n{change['after'] or '(removed)'}\n\n"
+        
+        prompt += """Evaluate ONLY the effect of these edits and respond in the following JSON format:
+
+{
+  "overall_delta": <change to the overall score, -20 to 20>,
+  "ats_delta": <change to the ATS score, -20 to 20>,
+  "readability_delta": <change to the readability score, -20 to 20>,
+  "keyword_delta": <change to the keyword match, -20 to 20>,
+  "resolved_weaknesses": ["previous weakness text that is now fixed, copied exactly"],
+  "new_weaknesses": ["weakness introduced by the edit"],
+  "new_strengths": ["strength added by the edit"],
+  "suggestions": [
+    {
+      "category": "category name",
+      "issue": "specific issue in the edited sections",
+      "fix": "actionable recommendation",
+      "priority": "high|medium|low"
+    }
+  ]
+}
+
+Return ONLY the JSON object, no additional text or markdown formatting.
+"""
+        
+        response = await self.client.aio.models.generate_content(
+            model='gemini-2.5-flash',
+            contents=prompt
+        )
+        
+        try:
+            review, _ = self._parse_analysis_response(response.text, required_keys=())
+        except ValueError as e:
+            # Local metrics still produce a useful re-score without the section review
+            # (json.JSONDecodeError is a ValueError)
+            logger.warning(f"Failed to parse section review: {str(e)}")
+            return {}
+        
+        # The model's output shape isn't guaranteed; keep only well-formed fields
+        for key in ("resolved_weaknesses", "new_weaknesses", "new_strengths"):
+            value = review.get(key)
+            review[key] = [item for item in value if isinstance(item, str)] if isinstance(value, list) else []
+        suggestions = review.get("suggestions")
+        review["suggestions"] = (
+            [item for item in suggestions if isinstance(item, dict)] if isinstance(suggestions, list) else []
+        )
+        return review
     
     @staticmethod
     async def cleanup_temp_file(file_path: str) -> None:
@@ -675,48 +1086,13 @@ Return the complete improved resume:"""
             # If original file provided and is DOCX, preserve its structure
             if original_file_path and original_ext == '.docx':
                 try:
-                    from docx import Document
-                    from docx.shared import Pt, RGBColor
-                    
                     logger.info("Preserving original DOCX structure...")
-                    
-                    # Load the original document to preserve styles
-                    doc = Document(original_file_path)
-                    
-                    # Clear existing content but keep styles
-                    for element in doc.element.body:
-                        doc.element.body.remove(element)
-                    
-                    # Parse modified content and apply to document
-                    paragraphs = modified_content.split('\n\n')
-                    
-                    for para_text in paragraphs:
-                        if not para_text.strip():
-                            continue
-                            
-                        # Add paragraph with original document's default style
-                        p = doc.add_paragraph(para_text.strip())
-                        
-                        # Try to detect and apply basic formatting hints from text
-                        # Headers (ALL CAPS or starts with common header keywords)
-                        if para_text.strip().isupper() or any(para_text.strip().startswith(kw) for kw in ['EXPERIENCE', 'EDUCATION', 'SKILLS', 'SUMMARY', 'CONTACT']):
-                            p.style = 'Heading 1' if 'Heading 1' in [s.name for s in doc.styles] else 'Normal'
-                            for run in p.runs:
-                                run.bold = True
-                                run.font.size = Pt(14)
-                        # Bullet points
-                        elif para_text.strip().startswith(('•', '-', '*', '▪')):
-                            p.style = 'List Bullet' if 'List Bullet' in [s.name for s in doc.styles] else 'Normal'
-                        # Regular content
-                        else:
-                            for run in p.runs:
-                                run.font.size = Pt(11)
-                    
-                    docx_path = output_dir / f"{base_name}.docx"
-                    doc.save(str(docx_path))
-                    original_format_path = str(docx_path)
-                    logger.info(f"Saved DOCX with preserved structure: {docx_path}")
-                    
+                    original_format_path = render_docx(
+                        modified_content,
+                        output_dir / f"{base_name}.docx",
+                        base_document_path=original_file_path
+                    )
+                    logger.info(f"Saved DOCX with preserved structure: {original_format_path}")
                 except ImportError:
                     logger.warning("python-docx not installed. Cannot preserve DOCX structure.")
                 except Exception as e:
@@ -725,34 +1101,8 @@ Return the complete improved resume:"""
             # If DOCX creation failed or wasn't applicable, create new document
             if not original_format_path and original_ext in ['.docx', '.doc']:
                 try:
-                    from docx import Document
-                    from docx.shared import Pt, RGBColor
-                    
-                    doc = Document()
-                    
-                    # Add content with smart formatting
-                    for para_text in modified_content.split('\n\n'):
-                        if not para_text.strip():
-                            continue
-                            
-                        p = doc.add_paragraph(para_text.strip())
-                        
-                        # Apply formatting based on content analysis
-                        if para_text.strip().isupper() or any(para_text.strip().startswith(kw) for kw in ['EXPERIENCE', 'EDUCATION', 'SKILLS', 'SUMMARY', 'CONTACT']):
-                            for run in p.runs:
-                                run.bold = True
-                                run.font.size = Pt(14)
-                        elif para_text.strip().startswith(('•', '-', '*', '▪')):
-                            p.style = 'List Bullet'
-                        else:
-                            for run in p.runs:
-                                run.font.size = Pt(11)
-                    
-                    docx_path = output_dir / f"{base_name}.docx"
-                    doc.save(str(docx_path))
-                    original_format_path = str(docx_path)
-                    logger.info(f"Saved new DOCX: {docx_path}")
-                    
+                    original_format_path = render_docx(modified_content, output_dir / f"{base_name}.docx")
+                    logger.info(f"Saved new DOCX: {original_format_path}")
                 except ImportError:
                     logger.warning("python-docx not installed.")
                 except Exception as e:
@@ -760,99 +1110,8 @@ Return the complete improved resume:"""
             
             # Convert to PDF
             try:
-                from reportlab.lib.pagesizes import letter
-                from reportlab.pdfgen import canvas
-                from reportlab.lib.units import inch
-                from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-                from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-                from reportlab.lib.enums import TA_LEFT, TA_CENTER
-                
-                pdf_file = output_dir / f"{base_name}.pdf"
-                doc = SimpleDocTemplate(str(pdf_file), pagesize=letter)
-                story = []
-                styles = getSampleStyleSheet()
-                
-                # Create custom styles
-                header_style = ParagraphStyle(
-                    'CustomHeader',
-                    parent=styles['Heading1'],
-                    fontSize=14,
-                    textColor='#1a1a1a',
-                    spaceAfter=12,
-                    bold=True
-                )
-                
-                normal_style = ParagraphStyle(
-                    'CustomNormal',
-                    parent=styles['Normal'],
-                    fontSize=11,
-                    textColor='#333333',
-                    spaceAfter=8
-                )
-                
-                # Parse and add content
-                for para_text in modified_content.split('\n\n'):
-                    if not para_text.strip():
-                        continue
-                    
-                    # Detect headers
-                    if para_text.strip().isupper() or any(para_text.strip().startswith(kw) for kw in ['EXPERIENCE', 'EDUCATION', 'SKILLS', 'SUMMARY', 'CONTACT']):
-                        story.append(Paragraph(para_text.strip(), header_style))
-                    else:
-                        story.append(Paragraph(para_text.strip(), normal_style))
-                    
-                    story.append(Spacer(1, 0.1 * inch))
-                
-                doc.build(story)
-                pdf_path = str(pdf_file)
-                logger.info(f"Saved PDF with formatting: {pdf_file}")
-                
-            except ImportError:
-                logger.warning("reportlab not fully installed. Using basic PDF generation.")
-                # Fallback to basic PDF
-                try:
-                    from reportlab.pdfgen import canvas
-                    from reportlab.lib.pagesizes import letter
-                    from reportlab.lib.units import inch
-                    
-                    pdf_file = output_dir / f"{base_name}.pdf"
-                    c = canvas.Canvas(str(pdf_file), pagesize=letter)
-                    width, height = letter
-                    y_position = height - 1 * inch
-                    c.setFont("Helvetica", 11)
-                    
-                    for line in modified_content.split('\n'):
-                        if y_position < 1 * inch:
-                            c.showPage()
-                            y_position = height - 1 * inch
-                            c.setFont("Helvetica", 11)
-                        
-                        if len(line) > 90:
-                            words = line.split()
-                            current_line = ""
-                            for word in words:
-                                if len(current_line + " " + word) < 90:
-                                    current_line += " " + word if current_line else word
-                                else:
-                                    c.drawString(1 * inch, y_position, current_line)
-                                    y_position -= 15
-                                    current_line = word
-                                    if y_position < 1 * inch:
-                                        c.showPage()
-                                        y_position = height - 1 * inch
-                                        c.setFont("Helvetica", 11)
-                            if current_line:
-                                c.drawString(1 * inch, y_position, current_line)
-                                y_position -= 15
-                        else:
-                            c.drawString(1 * inch, y_position, line)
-                            y_position -= 15
-                    
-                    c.save()
-                    pdf_path = str(pdf_file)
-                    logger.info(f"Saved basic PDF: {pdf_file}")
-                except Exception as e:
-                    logger.error(f"Error creating PDF: {str(e)}")
+                pdf_path = render_pdf(modified_content, output_dir / f"{base_name}.pdf")
+                logger.info(f"Saved PDF with formatting: {pdf_path}")
             except Exception as e:
                 logger.error(f"Error creating formatted PDF: {str(e)}")
             
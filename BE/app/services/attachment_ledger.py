@@ -0,0 +1,147 @@
+"""
+Processed-attachment ledger - makes Gmail scans idempotent per
+(integration, message, attachment content hash)
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+
+from beanie import BulkWriter
+from pymongo.errors import DuplicateKeyError
+
+from app.database.models.processed_attachment import ProcessedAttachment
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# A "processing" claim older than this belongs to a scan that died; it can be taken over
+CLAIM_TTL = timedelta(hours=1)
+
+
+class AttachmentLedger:
+    """Claims attachments before analysis and records them once analyzed"""
+
+    async def processed_parts(self, integration_id: str, message_ids: List[str]) -> Set[Tuple[str, str]]:
+        """
+        (message_id, part_id) pairs already handled for these messages, in one query.
+        Includes fresh claims held by a scan that is still running.
+        """
+        if not message_ids:
+            return set()
+
+        entries = await ProcessedAttachment.find({
+            "integration_id": integration_id,
+            "message_id": {"$in": message_ids},
+            "$or": [
+                {"status": "done"},
+                {"claimed_at": {"$gt": datetime.utcnow() - CLAIM_TTL}},
+            ]
+        }).to_list()
+        return {(entry.message_id, entry.part_id) for entry in entries}
+
+    async def claim(
+        self,
+        integration_id: str,
+        message_id: str,
+        part_id: str,
+        content_hash: str,
+        filename: Optional[str] = None
+    ) -> bool:
+        """
+        Claim an attachment for analysis
+
+        Returns:
+            True if this scan should analyze it, False if it was already processed
+            or is being processed by another scan
+        """
+        entry = ProcessedAttachment(
+            integration_id=integration_id,
+            message_id=message_id,
+            part_id=part_id,
+            content_hash=content_hash,
+            filename=filename
+        )
+        try:
+            await entry.insert()
+            return True
+        except DuplicateKeyError:
+            pass
+
+        # Take over a claim left behind by a scan that never finished
+        now = datetime.utcnow()
+        result = await ProcessedAttachment.find({
+            "integration_id": integration_id,
+            "message_id": message_id,
+            "content_hash": content_hash,
+            "status": "processing",
+            "claimed_at": {"$lte": now - CLAIM_TTL},
+        }).update({"$set": {"claimed_at": now, "part_id": part_id}})
+        return bool(result and result.modified_count == 1)
+
+    async def complete(
+        self,
+        integration_id: str,
+        message_id: str,
+        content_hash: str,
+        analysis_id: Optional[str] = None
+    ) -> None:
+        """Mark a claimed attachment as analyzed"""
+        await ProcessedAttachment.find({
+            "integration_id": integration_id,
+            "message_id": message_id,
+            "content_hash": content_hash,
+        }).update({"$set": {"status": "done", "analysis_id": analysis_id, "processed_at": datetime.utcnow()}})
+
+    async def complete_many(self, integration_id: str, entries: List[Tuple[str, str, Optional[str]]]) -> None:
+        """Mark many claimed attachments as analyzed in one bulk write
+
+        Args:
+            entries: (message_id, content_hash, analysis_id) tuples
+        """
+        if not entries:
+            return
+        now = datetime.utcnow()
+        async with BulkWriter() as bulk_writer:
+            for message_id, content_hash, analysis_id in entries:
+                await ProcessedAttachment.find({
+                    "integration_id": integration_id,
+                    "message_id": message_id,
+                    "content_hash": content_hash,
+                }).update(
+                    {"$set": {"status": "done", "analysis_id": analysis_id, "processed_at": now}},
+                    bulk_writer=bulk_writer
+                )
+
+    async def release(self, integration_id: str, message_id: str, content_hash: str) -> None:
+        """Drop a claim after a failed analysis so the next scan retries it"""
+        await ProcessedAttachment.find({
+            "integration_id": integration_id,
+            "message_id": message_id,
+            "content_hash": content_hash,
+            "status": "processing",
+        }).delete()
+
+    async def release_abandoned(self, integration_id: str) -> Set[str]:
+        """
+        Drop every open claim of an integration, left behind by a scan that died.
+        Only call this while holding the integration's scan lock.
+
+        Returns:
+            Ids of the messages whose claims were dropped
+        """
+        entries = await ProcessedAttachment.find({
+            "integration_id": integration_id,
+            "status": "processing",
+        }).to_list()
+        if not entries:
+            return set()
+
+        await ProcessedAttachment.find({
+            "_id": {"$in": [entry.id for entry in entries]},
+            "status": "processing",
+        }).delete()
+        logger.info(f"Released {len(entries)} abandoned attachment claims for integration {integration_id}")
+        return {entry.message_id for entry in entries}
+
+
+# Singleton instance
+attachment_ledger = AttachmentLedger()
@@ -1,16 +1,314 @@
 """
 Email notification service
+
+Emails are written to a Mongo outbox and sent by a background sender that keeps
+authenticated SMTP connections open, sends in batches and retries with backoff.
+For local testing point it at any SMTP stand-in, e.g.
+SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=false (no credentials needed).
 """
+import asyncio
 import os
+import random
 import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from typing import List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
 
+from app.database.models.outbox_email import OutboxEmail
+from app.services.lease_service import PROCESS_ID
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+DEFAULT_FROM_NAME = "ZUME Resume Analyzer"
+# Sender when neither SMTP_FROM_EMAIL nor SMTP_USERNAME is set, e.g. with a local relay
+DEFAULT_FROM_EMAIL = "noreply@localhost"
+
+# SMTP sessions kept open (and sending in parallel) per process
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+# Emails claimed from the outbox per round
+SMTP_BATCH_SIZE = int(os.getenv("SMTP_BATCH_SIZE", "20"))
+# A session idle for longer is reopened instead of reused (servers drop idle clients)
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+SMTP_MAX_ATTEMPTS = int(os.getenv("SMTP_MAX_ATTEMPTS", "6"))
+# Delay before the first retry; doubled for each further attempt, up to an hour
+SMTP_RETRY_BASE_SECONDS = float(os.getenv("SMTP_RETRY_BASE_SECONDS", "30"))
+SMTP_RETRY_MAX_SECONDS = 3600
+# How often an idle sender checks the outbox for emails queued by other processes
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+# An email claimed for longer than this by a sender that died is sent again
+OUTBOX_CLAIM_TTL = timedelta(minutes=5)
+
+
+@dataclass
+class SMTPSettings:
+    host: str
+    port: int
+    username: Optional[str]
+    password: Optional[str]
+    starttls: bool
+    from_email: str
+
+    @classmethod
+    def from_env(cls) -> "SMTPSettings":
+        username = os.getenv("SMTP_USERNAME")
+        return cls(
+            host=os.getenv("SMTP_HOST", "smtp.gmail.com"),
+            port=int(os.getenv("SMTP_PORT", "587")),
+            username=username,
+            password=os.getenv("SMTP_PASSWORD"),
+            starttls=os.getenv("SMTP_STARTTLS", "true").lower() == "true",
+            from_email=os.getenv("SMTP_FROM_EMAIL") or username or DEFAULT_FROM_EMAIL
+        )
+
+    @property
+    def configured(self) -> bool:
+        """Credentials are set, or an explicit host (e.g. a local relay) that needs none"""
+        return bool(self.username and self.password) or "SMTP_HOST" in os.environ
+
+
+class SMTPConnection:
+    """An SMTP session reused across messages; used by one thread at a time"""
+
+    def __init__(self, settings: SMTPSettings):
+        self.settings = settings
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _connect(self) -> None:
+        smtp = smtplib.SMTP(self.settings.host, self.settings.port, timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            smtp.ehlo()
+            if self.settings.starttls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.settings.username and self.settings.password:
+                smtp.login(self.settings.username, self.settings.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
+
+    def send(self, message: MIMEMultipart) -> None:
+        if self._smtp is not None and time.monotonic() - self._last_used > SMTP_IDLE_SECONDS:
+            self.close()
+        if self._smtp is None:
+            self._connect()
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # The server closed the session since the last message; reconnect once
+            self._smtp = None
+            self._connect()
+            self._smtp.send_message(message)
+        self._last_used = time.monotonic()
+
+    def send_many(self, messages: List[MIMEMultipart]) -> List[Optional[Exception]]:
+        """Send messages in order over this session; returns the error of each, or None"""
+        results: List[Optional[Exception]] = []
+        for message in messages:
+            try:
+                self.send(message)
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+                # SMTP errors leave the session usable; socket errors don't
+                if isinstance(e, smtplib.SMTPServerDisconnected) or not isinstance(e, smtplib.SMTPException):
+                    self.close()
+        return results
+
+
+def _is_permanent(error: Exception) -> bool:
+    """Errors retrying won't fix, e.g. a rejected recipient"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        # A configuration problem; the email goes out once it is fixed
+        return False
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def build_message(email: OutboxEmail, settings: SMTPSettings) -> MIMEMultipart:
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = email.subject
+    msg['From'] = f"{email.from_name or DEFAULT_FROM_NAME} <{email.from_email or settings.from_email}>"
+    msg['To'] = email.to_email
+    msg.attach(MIMEText(email.html_content, 'html'))
+    return msg
+
+
+class EmailOutbox:
+    """Queues emails in Mongo and sends them from a background task"""
+
+    def __init__(self, pool_size: int = SMTP_POOL_SIZE):
+        self.pool_size = pool_size
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._connections: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def enqueue(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        from_email: Optional[str] = None,
+        from_name: Optional[str] = None
+    ) -> OutboxEmail:
+        email = OutboxEmail(
+            to_email=to_email,
+            subject=subject,
+            html_content=html_content,
+            from_email=from_email,
+            from_name=from_name
+        )
+        await email.insert()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return email
+
+    def start(self):
+        """Start sending queued emails from this process"""
+        if self._task is not None:
+            return
+        settings = SMTPSettings.from_env()
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="smtp")
+        self._connections = asyncio.Queue()
+        for _ in range(self.pool_size):
+            self._connections.put_nowait(SMTPConnection(settings))
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Email outbox sender started with {self.pool_size} SMTP connections")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        connections = []
+        while not self._connections.empty():
+            connections.append(self._connections.get_nowait())
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self._executor, connection.close) for connection in connections),
+            return_exceptions=True
+        )
+        self._executor.shutdown(wait=False)
+        self._executor = None
+        logger.info("Email outbox sender stopped")
+
+    async def _run(self):
+        while True:
+            try:
+                batch = await self._claim_batch()
+                if batch:
+                    await self._send_batch(batch)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in email outbox sender: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim_batch(self) -> List[OutboxEmail]:
+        """Claim due emails, including ones left behind by a sender that died"""
+        collection = OutboxEmail.get_pymongo_collection()
+        batch = []
+        for _ in range(SMTP_BATCH_SIZE):
+            now = datetime.utcnow()
+            document = await collection.find_one_and_update(
+                {"$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {"status": "sending", "claimed_until": {"$lte": now}},
+                ]},
+                {
+                    "$set": {"status": "sending", "claimed_by": PROCESS_ID, "claimed_until": now + OUTBOX_CLAIM_TTL},
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("next_attempt_at", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if document is None:
+                break
+            batch.append(OutboxEmail.model_validate(document))
+        return batch
+
+    async def _send_batch(self, batch: List[OutboxEmail]):
+        settings = SMTPSettings.from_env()
+        # Spread the batch over the pooled sessions
+        chunks = [batch[index::self.pool_size] for index in range(self.pool_size)]
+        results = await asyncio.gather(*(self._send_chunk(chunk, settings) for chunk in chunks if chunk))
+
+        now = datetime.utcnow()
+        updates = []
+        for chunk, errors in zip((chunk for chunk in chunks if chunk), results):
+            for email, error in zip(chunk, errors):
+                updates.append(UpdateOne(
+                    {"_id": email.id, "claimed_by": PROCESS_ID},
+                    {"$set": self._result_update(email, error, now)}
+                ))
+        await OutboxEmail.get_pymongo_collection().bulk_write(updates, ordered=False)
+
+    async def _send_chunk(self, chunk: List[OutboxEmail], settings: SMTPSettings) -> List[Optional[Exception]]:
+        connection: SMTPConnection = await self._connections.get()
+        try:
+            messages = [build_message(email, settings) for email in chunk]
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, connection.send_many, messages)
+        except Exception as e:
+            return [e] * len(chunk)
+        finally:
+            self._connections.put_nowait(connection)
+
+    @staticmethod
+    def _result_update(email: OutboxEmail, error: Optional[Exception], now: datetime) -> dict:
+        if error is None:
+            logger.info(f"Email sent successfully to {email.to_email}")
+            return {"status": "sent", "sent_at": now, "claimed_until": None, "last_error": None}
+
+        if _is_permanent(error) or email.attempts >= SMTP_MAX_ATTEMPTS:
+            logger.error(f"Giving up on email to {email.to_email} after {email.attempts} attempts: {error}")
+            return {"status": "failed", "claimed_until": None, "last_error": str(error)}
+
+        delay = min(SMTP_RETRY_BASE_SECONDS * 2 ** (email.attempts - 1), SMTP_RETRY_MAX_SECONDS)
+        delay *= random.uniform(0.8, 1.2)
+        logger.warning(f"Error sending email to {email.to_email}, retrying in {delay:.0f}s: {error}")
+        return {
+            "status": "pending",
+            "next_attempt_at": now + timedelta(seconds=delay),
+            "claimed_until": None,
+            "last_error": str(error),
+        }
+
+
+# Singleton instance
+email_outbox = EmailOutbox()
+
 
 async def send_email(
     to_email: str,
@@ -20,47 +318,26 @@ async def send_email(
     from_name: Optional[str] = None
 ):
     """
-    Send email notification
-    
+    Queue an email notification; the outbox sender delivers it
+
     Args:
         to_email: Recipient email address
         subject: Email subject
         html_content: HTML email body
         from_email: Sender email (defaults to SMTP_FROM_EMAIL env var)
         from_name: Sender name (defaults to "ZUME Resume Analyzer")
+
+    Returns:
+        True if the email was queued
     """
+    if not SMTPSettings.from_env().configured:
+        logger.warning("SMTP credentials not configured. Email not sent.")
+        return False
+
     try:
-        # Get SMTP configuration from environment
-        smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
-        smtp_port = int(os.getenv("SMTP_PORT", "587"))
-        smtp_username = os.getenv("SMTP_USERNAME")
-        smtp_password = os.getenv("SMTP_PASSWORD")
-        from_email = from_email or os.getenv("SMTP_FROM_EMAIL", smtp_username)
-        from_name = from_name or "ZUME Resume Analyzer"
-        
-        if not smtp_username or not smtp_password:
-            logger.warning("SMTP credentials not configured. Email not sent.")
-            return False
-        
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = f"{from_name} <{from_email}>"
-        msg['To'] = to_email
-        
-        # Attach HTML content
-        html_part = MIMEText(html_content, 'html')
-        msg.attach(html_part)
-        
-        # Send email
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_username, smtp_password)
-            server.send_message(msg)
-        
-        logger.info(f"Email sent successfully to {to_email}")
+        await email_outbox.enqueue(to_email, subject, html_content, from_email, from_name)
+        logger.info(f"Email to {to_email} queued")
         return True
-        
     except Exception as e:
-        logger.error(f"Error sending email to {to_email}: {e}")
+        logger.error(f"Error queueing email to {to_email}: {e}")
         return False
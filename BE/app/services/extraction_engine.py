@@ -0,0 +1,172 @@
+"""
+Process-pool text extraction engine - runs PyPDF2/python-docx parsing off the event loop
+with per-document timeouts, page limits and a memory cap per worker process
+"""
+import asyncio
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from app.services.extraction_service import ExtractedResume, extract_resume
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ExtractionTimeout(BaseException):
+    """
+    Raised inside a worker when a document takes longer than its time budget.
+    Derives from BaseException so parser-level `except Exception` blocks don't swallow it.
+    """
+
+
+def _init_worker(memory_limit_mb: int) -> None:
+    """Process pool initializer: cap the address space of the worker"""
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        # resource is unavailable on Windows; run without a cap there
+        logger.warning(f"Could not set extraction worker memory limit: {e}")
+
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+
+def _extract_in_worker(
+    file_data: bytes,
+    filename: str,
+    max_pages: int,
+    timeout_seconds: float,
+    backend: Optional[str] = None
+) -> Optional[ExtractedResume]:
+    """Run one extraction in a worker process under a wall-clock alarm"""
+    use_alarm = hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout_seconds)
+
+    try:
+        return extract_resume(file_data, filename, max_pages=max_pages, backend=backend)
+    except ExtractionTimeout:
+        logger.warning(f"Extraction of {filename} exceeded {timeout_seconds}s")
+        return None
+    except MemoryError:
+        logger.warning(f"Extraction of {filename} exceeded the worker memory limit")
+        return None
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class ExtractionEngine:
+    """Shared process pool for resume text extraction"""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        timeout_seconds: float = 20.0,
+        max_pages: int = 10,
+        memory_limit_mb: int = 1024,
+        max_tasks_per_child: int = 200,
+        backend: Optional[str] = None
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout_seconds = timeout_seconds
+        self.max_pages = max_pages
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_child = max_tasks_per_child
+        self.backend = backend  # None uses EXTRACTION_BACKEND / the PyPDF2 default
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # One in-flight document per worker, so the outer timeout never counts queueing
+        self._slots = asyncio.Semaphore(self.max_workers)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb,),
+                max_tasks_per_child=self.max_tasks_per_child
+            )
+            logger.info(f"Extraction engine started with {self.max_workers} workers")
+        return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor) -> None:
+        """
+        Discard a broken or stuck pool; the next call starts a fresh one.
+        Tasks that were running on the same pool fail with BrokenProcessPool and call
+        this too, so only the pool they ran on is discarded, never its replacement.
+        """
+        if self._pool is not pool:
+            return
+        self._pool = None
+        try:
+            if hasattr(pool, "kill_workers"):
+                pool.kill_workers()
+            else:
+                # Before Python 3.14 the executor can't kill its workers itself
+                for process in list((getattr(pool, "_processes", None) or {}).values()):
+                    process.terminate()
+        except Exception as e:
+            logger.warning(f"Error killing extraction workers: {e}")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def extract(self, file_data: bytes, filename: str) -> Optional[ExtractedResume]:
+        """
+        Extract a resume in the process pool.
+
+        Returns:
+            ExtractedResume, or None if parsing failed, timed out or hit the memory cap
+        """
+        loop = asyncio.get_running_loop()
+        pool = None
+
+        try:
+            async with self._slots:
+                pool = self._get_pool()
+                future = loop.run_in_executor(
+                    pool,
+                    _extract_in_worker,
+                    file_data,
+                    filename,
+                    self.max_pages,
+                    self.timeout_seconds,
+                    self.backend
+                )
+                # The worker enforces the per-document budget itself; this outer bound
+                # catches a worker stuck in native code where the alarm can't fire
+                return await asyncio.wait_for(future, timeout=self.timeout_seconds * 2)
+        except asyncio.TimeoutError:
+            logger.error(f"Extraction of {filename} did not return, restarting worker pool")
+            self._reset_pool(pool)
+        except BrokenProcessPool:
+            logger.error(f"Extraction worker crashed on {filename}, restarting worker pool")
+            self._reset_pool(pool)
+        except Exception as e:
+            logger.error(f"Error extracting {filename}: {e}")
+
+        return None
+
+    def shutdown(self) -> None:
+        """Stop worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+            logger.info("Extraction engine stopped")
+
+
+# Singleton instance
+extraction_engine = ExtractionEngine(
+    max_workers=int(os.getenv("EXTRACTION_WORKERS", "0")) or None,
+    timeout_seconds=float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "20")),
+    max_pages=int(os.getenv("EXTRACTION_MAX_PAGES", "10")),
+    memory_limit_mb=int(os.getenv("EXTRACTION_MEMORY_LIMIT_MB", "1024"))
+)
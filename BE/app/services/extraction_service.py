@@ -0,0 +1,381 @@
+"""
+Resume extraction service - parses an uploaded resume once per content hash and
+persists the normalized text, section boundaries, page count and detected links
+"""
+import hashlib
+import importlib
+import io
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Optional, List, Tuple, Dict, Type
+
+import PyPDF2
+from docx import Document as DocxDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.database.models.resume_analysis import ResumeAnalysis
+from app.database.models.resume_document import ResumeDocument, ResumeSection
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# Canonical section names and the headings that map to them
+SECTION_HEADINGS = {
+    "summary": ["summary", "professional summary", "profile", "about me", "objective", "career objective"],
+    "experience": ["experience", "work experience", "professional experience", "employment history",
+                   "work history", "employment"],
+    "education": ["education", "academic background", "qualifications", "academic qualifications"],
+    "skills": ["skills", "technical skills", "core competencies", "competencies", "key skills"],
+    "projects": ["projects", "personal projects", "key projects"],
+    "certifications": ["certifications", "certificates", "licenses", "licenses and certifications"],
+    "awards": ["awards", "achievements", "honors", "honours"],
+    "publications": ["publications", "research"],
+    "languages": ["languages"],
+    "interests": ["interests", "hobbies"],
+    "contact": ["contact", "contact information", "personal details"],
+}
+
+_HEADING_LOOKUP = {
+    heading: name
+    for name, headings in SECTION_HEADINGS.items()
+    for heading in headings
+}
+
+_LINK_PATTERN = re.compile(
+    r"(?:https?://|www\.)[^\s<>\"')\]]+"
+    r"|(?:linkedin\.com|github\.com|gitlab\.com|bitbucket\.org|stackoverflow\.com|medium\.com|dev\.to)/[^\s<>\"')\]]+",
+    re.IGNORECASE
+)
+
+
+@dataclass
+class ExtractedResume:
+    """Result of parsing a resume file, before it is persisted"""
+    text: str
+    page_count: int = 0
+    sections: List[ResumeSection] = field(default_factory=list)
+    links: List[str] = field(default_factory=list)
+
+
+def compute_content_hash(data: bytes) -> str:
+    """SHA-256 hex digest used as the dedupe key for resume documents"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    """Normalize unicode, whitespace and blank lines of extracted text"""
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\x00", "")
+
+    lines = [re.sub(r"[ \t\f\v]+", " ", line).strip() for line in text.split("\n")]
+
+    # Collapse runs of blank lines into a single paragraph break
+    normalized = []
+    for line in lines:
+        if not line and (not normalized or not normalized[-1]):
+            continue
+        normalized.append(line)
+
+    return "\n".join(normalized).strip()
+
+
+def detect_sections(text: str) -> List[ResumeSection]:
+    """Find section headings in normalized text and compute their boundaries"""
+    headings: List[Tuple[str, str, int, int]] = []
+    offset = 0
+
+    for line in text.split("\n"):
+        line_start = offset
+        offset += len(line) + 1
+
+        candidate = line.strip().rstrip(":").strip().lower()
+        if not candidate or len(candidate) > 40:
+            continue
+
+        name = _HEADING_LOOKUP.get(candidate)
+        if name:
+            headings.append((name, line.strip(), line_start, min(offset, len(text))))
+
+    sections = []
+    for index, (name, heading, _, body_start) in enumerate(headings):
+        end = headings[index + 1][2] if index + 1 < len(headings) else len(text)
+        sections.append(ResumeSection(name=name, heading=heading, start=body_start, end=end))
+
+    return sections
+
+
+def detect_links(text: str) -> List[str]:
+    """Find URLs and professional profile links in the text"""
+    links = []
+    for match in _LINK_PATTERN.findall(text):
+        link = match.rstrip(".,;:")
+        if not link.lower().startswith("http"):
+            link = f"https://{link}"
+        if link not in links:
+            links.append(link)
+    return links
+
+
+class ExtractorBackend:
+    """
+    Parser backend interface. Subclasses turn raw file bytes into (raw_text, page_count);
+    normalization and section detection are shared by all backends.
+    """
+    name = "base"
+
+    def extract_pdf(self, file_data: bytes, max_pages: Optional[int] = None) -> Tuple[str, int]:
+        raise NotImplementedError
+
+    def extract_docx(self, file_data: bytes) -> Tuple[str, int]:
+        raise NotImplementedError
+
+
+class PyPDF2DocxBackend(ExtractorBackend):
+    """Default backend: PyPDF2 for PDF and python-docx for DOCX"""
+    name = "pypdf2"
+
+    def extract_pdf(self, file_data: bytes, max_pages: Optional[int] = None) -> Tuple[str, int]:
+        """Extract raw text and page count from a PDF, stopping after max_pages"""
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_data))
+
+        text = []
+        for index, page in enumerate(pdf_reader.pages):
+            if max_pages and index >= max_pages:
+                break
+            text.append(page.extract_text() or "")
+
+        return "\n".join(text), len(pdf_reader.pages)
+
+    def extract_docx(self, file_data: bytes) -> Tuple[str, int]:
+        """Extract raw text and an estimated page count from a DOCX"""
+        doc = DocxDocument(io.BytesIO(file_data))
+
+        text = [paragraph.text for paragraph in doc.paragraphs]
+
+        # Table cells are commonly used for two-column layouts
+        for table in doc.tables:
+            for row in table.rows:
+                text.append(" | ".join(cell.text.strip() for cell in row.cells if cell.text.strip()))
+
+        # DOCX has no fixed pagination; count explicit page breaks instead
+        page_breaks = doc.element.body.xpath('.//w:br[@w:type="page"]')
+        return "\n".join(text), len(page_breaks) + 1
+
+
+EXTRACTOR_BACKENDS: Dict[str, Type[ExtractorBackend]] = {
+    PyPDF2DocxBackend.name: PyPDF2DocxBackend,
+}
+
+DEFAULT_BACKEND = os.getenv("EXTRACTION_BACKEND", PyPDF2DocxBackend.name)
+
+_backend_instances: Dict[str, ExtractorBackend] = {}
+
+
+def register_backend(backend_class: Type[ExtractorBackend]) -> Type[ExtractorBackend]:
+    """Register an extractor backend under its name (usable as a class decorator)"""
+    EXTRACTOR_BACKENDS[backend_class.name] = backend_class
+    return backend_class
+
+
+def load_backend(spec: str) -> Type[ExtractorBackend]:
+    """Resolve a backend by registered name or by a 'package.module:ClassName' path"""
+    if spec in EXTRACTOR_BACKENDS:
+        return EXTRACTOR_BACKENDS[spec]
+
+    if ":" not in spec:
+        raise ValueError(f"Unknown extractor backend: {spec}")
+
+    module_name, class_name = spec.split(":", 1)
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    return register_backend(backend_class)
+
+
+def get_backend(name: Optional[str] = None) -> ExtractorBackend:
+    """Return a (cached) backend instance"""
+    name = name or DEFAULT_BACKEND
+    if name not in _backend_instances:
+        _backend_instances[name] = load_backend(name)()
+    return _backend_instances[name]
+
+
+def extract_resume(
+    file_data: bytes,
+    filename: str,
+    max_pages: Optional[int] = None,
+    backend: Optional[str] = None
+) -> Optional[ExtractedResume]:
+    """
+    Parse a PDF or DOCX resume into normalized text and structure.
+    Synchronous and CPU bound - async callers go through the extraction engine.
+    """
+    ext = filename.lower().split('.')[-1]
+
+    try:
+        parser = get_backend(backend)
+        if ext == 'pdf':
+            raw_text, page_count = parser.extract_pdf(file_data, max_pages)
+        elif ext in ['doc', 'docx']:
+            raw_text, page_count = parser.extract_docx(file_data)
+        else:
+            logger.warning(f"Unsupported resume format: {ext}")
+            return None
+    except Exception as e:
+        logger.error(f"Error extracting text from {filename}: {e}")
+        return None
+
+    return build_extracted_resume(raw_text, page_count)
+
+
+def build_extracted_resume(raw_text: str, page_count: int = 0) -> ExtractedResume:
+    """Normalize text and detect its sections and links"""
+    text = normalize_text(raw_text)
+    return ExtractedResume(
+        text=text,
+        page_count=page_count,
+        sections=detect_sections(text),
+        links=detect_links(text)
+    )
+
+
+class ResumeExtractionService:
+    """Extracts resumes once per content hash and serves the stored result"""
+
+    async def get_or_extract(
+        self,
+        file_data: bytes,
+        file_name: str,
+        file_type: Optional[str] = None,
+        owner_id: Optional[str] = None
+    ) -> Optional[ResumeDocument]:
+        """
+        Return the stored document for these bytes, extracting and saving it on first sight.
+        owner_id is recorded as an owner of the document.
+
+        Returns:
+            ResumeDocument, or None if the file could not be parsed
+        """
+        content_hash = compute_content_hash(file_data)
+
+        existing = await ResumeDocument.find_one(ResumeDocument.content_hash == content_hash)
+        if existing:
+            logger.info(f"Reusing extracted resume {existing.id} for {file_name}")
+            return await self._add_owner(existing, owner_id)
+
+        # Imported here because the engine's worker processes import this module
+        from app.services.extraction_engine import extraction_engine
+
+        extracted = await extraction_engine.extract(file_data, file_name)
+        if not extracted or not extracted.text:
+            return None
+
+        return await self._store(
+            extracted=extracted,
+            content_hash=content_hash,
+            file_name=file_name,
+            file_type=file_type,
+            file_size=len(file_data),
+            owner_id=owner_id
+        )
+
+    async def store_text(
+        self,
+        text: str,
+        file_name: str,
+        file_type: Optional[str] = "text/plain",
+        parent_document_id: Optional[str] = None,
+        owner_id: Optional[str] = None
+    ) -> ResumeDocument:
+        """Store already-available text (e.g. an edited resume) as a document"""
+        extracted = build_extracted_resume(text)
+        content_hash = compute_content_hash(extracted.text.encode("utf-8"))
+
+        existing = await ResumeDocument.find_one(ResumeDocument.content_hash == content_hash)
+        if existing:
+            return await self._add_owner(existing, owner_id)
+
+        if parent_document_id:
+            parent = await self.get_document(parent_document_id)
+            if parent:
+                extracted.page_count = parent.page_count
+
+        return await self._store(
+            extracted=extracted,
+            content_hash=content_hash,
+            file_name=file_name,
+            file_type=file_type,
+            file_size=len(extracted.text.encode("utf-8")),
+            parent_document_id=parent_document_id,
+            owner_id=owner_id
+        )
+
+    async def get_document(self, document_id: str, owner_id: Optional[str] = None) -> Optional[ResumeDocument]:
+        """
+        Fetch a stored document by id.
+        With owner_id, only a document that user owns or has an analysis of is returned.
+        """
+        try:
+            document = await ResumeDocument.get(document_id)
+        except Exception as e:
+            logger.warning(f"Invalid resume document id {document_id}: {e}")
+            return None
+
+        if not document or owner_id is None or owner_id in document.owner_ids:
+            return document
+
+        # Documents stored before owners were recorded, and Gmail-scanned CVs, are
+        # reachable through the user's analyses
+        analysis = await ResumeAnalysis.find_one(
+            ResumeAnalysis.user_id == owner_id,
+            ResumeAnalysis.document_id == str(document.id)
+        )
+        if analysis:
+            return await self._add_owner(document, owner_id)
+
+        logger.warning(f"User {owner_id} requested resume document {document_id} they don't own")
+        return None
+
+    async def _add_owner(self, document: ResumeDocument, owner_id: Optional[str]) -> ResumeDocument:
+        if owner_id and owner_id not in document.owner_ids:
+            await document.update({"$addToSet": {"owner_ids": owner_id}})
+            document.owner_ids.append(owner_id)
+        return document
+
+    async def _store(
+        self,
+        extracted: ExtractedResume,
+        content_hash: str,
+        file_name: str,
+        file_type: Optional[str],
+        file_size: int,
+        parent_document_id: Optional[str] = None,
+        owner_id: Optional[str] = None
+    ) -> ResumeDocument:
+        document = ResumeDocument(
+            content_hash=content_hash,
+            file_name=file_name,
+            file_type=file_type,
+            file_size=file_size,
+            text_compressed=ResumeDocument.compress_text(extracted.text),
+            text_length=len(extracted.text),
+            sections=extracted.sections,
+            page_count=extracted.page_count,
+            links=extracted.links,
+            parent_document_id=parent_document_id,
+            owner_ids=[owner_id] if owner_id else []
+        )
+
+        try:
+            await document.insert()
+            logger.info(f"Stored extracted resume {document.id} ({len(extracted.sections)} sections)")
+            return document
+        except DuplicateKeyError:
+            # Another request extracted the same file concurrently
+            existing = await ResumeDocument.find_one(ResumeDocument.content_hash == content_hash)
+            return await self._add_owner(existing, owner_id)
+
+
+# Singleton instance
+resume_extraction_service = ResumeExtractionService()
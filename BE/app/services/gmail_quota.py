@@ -0,0 +1,142 @@
+"""
+Gmail quota limiter - token buckets in Gmail quota units, per mailbox and per project
+"""
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.logger import get_logger
+from app.utils.metrics import metrics
+
+logger = get_logger(__name__)
+
+# Quota units per call (https://developers.google.com/gmail/api/reference/quota);
+# calls inside a batch request are charged individually
+METHOD_UNITS = {
+    "users.getProfile": 1,
+    "users.history.list": 2,
+    "users.messages.list": 5,
+    "users.messages.get": 5,
+    "users.messages.attachments.get": 5,
+}
+DEFAULT_METHOD_UNITS = 5
+
+# Gmail allows 15,000 units per user per minute and 1,200,000 per project per minute.
+# The project budget is shared by every process, so lower it when running several.
+USER_UNITS_PER_SECOND = float(os.getenv("GMAIL_USER_QUOTA_UNITS_PER_SECOND", "250"))
+PROJECT_UNITS_PER_SECOND = float(os.getenv("GMAIL_PROJECT_QUOTA_UNITS_PER_SECOND", "20000"))
+# Idle per-user buckets are dropped after this long
+USER_BUCKET_IDLE_SECONDS = 600
+
+
+class TokenBucket:
+    """Async token bucket; waiters are served in arrival order"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._last_used = self._updated
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def remaining(self) -> float:
+        self._refill()
+        return self._tokens
+
+    @property
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self._last_used
+
+    async def acquire(self, units: float) -> float:
+        """
+        Take units from the bucket, waiting for them to accumulate if needed
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        self._last_used = time.monotonic()
+        async with self._lock:
+            while units > 0:
+                # Requests larger than the bucket are paid for in bucket-sized parts
+                portion = min(units, self.capacity)
+                self._refill()
+                if self._tokens < portion:
+                    delay = (portion - self._tokens) / self.rate
+                    await asyncio.sleep(delay)
+                    waited += delay
+                    self._refill()
+                self._tokens -= portion
+                units -= portion
+        return waited
+
+
+class GmailQuotaLimiter:
+    """Paces Gmail API calls so scans stay inside the per-user and per-project quotas"""
+
+    def __init__(self, user_rate: float = USER_UNITS_PER_SECOND, project_rate: float = PROJECT_UNITS_PER_SECOND):
+        self.user_rate = user_rate
+        self._project = TokenBucket(project_rate, project_rate)
+        self._users: Dict[str, TokenBucket] = {}
+        metrics.describe("gmail_quota_units_total", "Gmail quota units spent, by method")
+        metrics.describe("gmail_quota_wait_seconds_total", "Time spent waiting for Gmail quota")
+        metrics.describe("gmail_rate_limited_total", "Gmail calls rejected with a rate-limit error")
+        metrics.describe("gmail_quota_project_remaining_units", "Units left in the project bucket")
+        metrics.describe("gmail_quota_user_remaining_units", "Units left in each mailbox bucket")
+        metrics.register_callback(self._budget_samples)
+
+    def _user_bucket(self, user_key: str) -> TokenBucket:
+        bucket = self._users.get(user_key)
+        if bucket is None:
+            self._drop_idle_buckets()
+            bucket = self._users[user_key] = TokenBucket(self.user_rate, self.user_rate)
+        return bucket
+
+    def _drop_idle_buckets(self) -> None:
+        for key in [key for key, bucket in self._users.items() if bucket.idle_seconds > USER_BUCKET_IDLE_SECONDS]:
+            del self._users[key]
+
+    async def acquire(self, user_key: Optional[str], method: str, count: int = 1) -> None:
+        """
+        Wait until `count` calls of `method` fit in the budgets
+
+        Args:
+            user_key: Mailbox the calls are made for (the integration id); None charges
+                      the project budget only
+            method: Gmail method name, e.g. "users.messages.get"
+            count: Number of calls (e.g. the size of a batch request)
+        """
+        if count <= 0:
+            return
+        units = METHOD_UNITS.get(method, DEFAULT_METHOD_UNITS) * count
+
+        waited = 0.0
+        if user_key:
+            waited += await self._user_bucket(user_key).acquire(units)
+        waited += await self._project.acquire(units)
+
+        metrics.inc("gmail_quota_units_total", units, {"method": method})
+        if waited:
+            metrics.inc("gmail_quota_wait_seconds_total", waited)
+            logger.debug(f"Waited {waited:.2f}s for {units} Gmail quota units ({method})")
+
+    def record_rate_limited(self, method: str, count: int = 1) -> None:
+        metrics.inc("gmail_rate_limited_total", count, {"method": method})
+
+    def _budget_samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = [("gmail_quota_project_remaining_units", {}, round(self._project.remaining, 1))]
+        for key, bucket in list(self._users.items()):
+            samples.append(("gmail_quota_user_remaining_units", {"integration_id": key}, round(bucket.remaining, 1)))
+        return samples
+
+
+# Singleton instance
+gmail_quota = GmailQuotaLimiter()
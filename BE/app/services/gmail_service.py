@@ -1,28 +1,279 @@
+import asyncio
 import base64
-import io
+import functools
+import json
 import os
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+import random
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, AsyncIterator, Awaitable, Callable, Set, Tuple, TypeVar
+import httplib2
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
-import PyPDF2
-from docx import Document as DocxDocument
+from app.services.attachment_ledger import attachment_ledger
+from app.services.extraction_service import compute_content_hash, resume_extraction_service
+from app.services.gmail_quota import gmail_quota
+from app.services.job_matcher import PHRASE_STOP_WORDS
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+T = TypeVar("T")
+
+# Gmail/OAuth calls are blocking HTTP; they run on a dedicated, bounded thread pool
+GMAIL_IO_WORKERS = int(os.getenv("GMAIL_IO_WORKERS", "8"))
+# Upper bound on a single API call (a batch counts as one call)
+GMAIL_CALL_TIMEOUT_SECONDS = float(os.getenv("GMAIL_CALL_TIMEOUT_SECONDS", "60"))
+# Socket timeout so a timed-out call also frees its worker thread
+GMAIL_HTTP_TIMEOUT_SECONDS = float(os.getenv("GMAIL_HTTP_TIMEOUT_SECONDS", "30"))
+# Gmail clients kept for reuse across scans (one per integration)
+GMAIL_SERVICE_CACHE_SIZE = int(os.getenv("GMAIL_SERVICE_CACHE_SIZE", "100"))
+
+# Words as Gmail's subject: operator matches them
+_SUBJECT_WORD = re.compile(r"[a-z0-9]+")
+
+
+@functools.lru_cache(maxsize=1)
+def _gmail_discovery_document() -> Dict[str, Any]:
+    """Gmail v1 discovery document from the copy bundled with google-api-python-client"""
+    document = get_static_doc('gmail', 'v1')
+    if document is None:
+        raise RuntimeError("Bundled Gmail discovery document not found; upgrade google-api-python-client")
+    return json.loads(document)
+
+
+def _message_structure_fields(depth: int) -> str:
+    """Partial-response mask for the MIME tree without inline body data"""
+    part_fields = "partId,mimeType,filename,body(attachmentId,size)"
+    nested = part_fields
+    for _ in range(depth):
+        nested = f"{part_fields},parts({nested})"
+    return f"id,threadId,labelIds,payload(headers,{nested})"
+
+
+@dataclass
+class GmailScanState:
+    """
+    Progress of a streaming scan, filled in by GmailService.iter_resumes_for_scan
+
+    A state restored from a checkpoint resumes the scan: the original history id is
+    kept, a single-query search lists its current page (page_token) again, and processed
+    messages are not fetched again.
+    """
+    mode: Optional[str] = None  # "incremental" or "full"
+    history_id: Optional[str] = None  # Mailbox position to store for the next scan
+    search_query: Optional[str] = None  # Single search query being paged; None for id lists
+    page_token: Optional[str] = None  # Token of the search page being processed
+    processed_message_ids: Set[str] = field(default_factory=set)
+    # Processed ids not yet written to a checkpoint, and those of the current search page
+    unsaved_message_ids: List[str] = field(default_factory=list)
+    page_message_ids: List[str] = field(default_factory=list)
+    messages_seen: int = 0
+    attachments_fetched: int = 0
+    attachments_skipped: int = 0  # Already in the processed-attachment ledger
+    attachments_failed: int = 0  # Could not be extracted
+    resumes_extracted: int = 0
+
+    def mark_processed(self, message_ids: List[str]) -> None:
+        self.processed_message_ids.update(message_ids)
+        self.unsaved_message_ids.extend(message_ids)
+        self.page_message_ids.extend(message_ids)
+
+
+class GmailCallTimeout(Exception):
+    """A Gmail or OAuth call did not finish within GMAIL_CALL_TIMEOUT_SECONDS"""
+
+
+class GmailScanIncomplete(Exception):
+    """Messages of a scan page still failed after retries; the scan must not be treated as complete"""
+
 
 class GmailService:
-    """Service for Gmail API operations"""
+    """
+    Service for Gmail API operations
+    
+    googleapiclient and google-auth are synchronous, so every network call goes through
+    _run, which executes it on a bounded thread pool with a timeout. The event loop keeps
+    serving API requests while scans and OAuth exchanges are in flight.
+    """
     
     SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
     
+    # Gmail recommends at most 50 requests per batch; one search page fills one batch
+    BATCH_SIZE = 50
+    PAGE_SIZE = 50
+    # Attachments can be up to MAX_ATTACHMENT_SIZE each, so keep attachment batches small
+    ATTACHMENT_BATCH_SIZE = 10
+    MAX_ATTACHMENT_SIZE = 5 * 1024 * 1024  # Same limit as direct uploads
+    RESUME_MIME_TYPES = {
+        'application/pdf',
+        'application/msword',
+        'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        'application/octet-stream',  # Many mail clients send attachments untyped
+    }
+    # Keep each search query well inside Gmail's query length limit
+    MAX_QUERY_KEYWORDS = 15
+    MAX_QUERY_KEYWORD_CHARS = 500
+    MAX_CONCURRENT_QUERIES = 4
+    # Retries of a request (or of the failed requests of a batch) rejected with a rate-limit error
+    MAX_RATE_LIMIT_RETRIES = 3
+    # Message structure (headers and MIME tree) without inline body data
+    MESSAGE_STRUCTURE_FIELDS = _message_structure_fields(depth=5)
+    
     def __init__(self):
         self.client_id = os.getenv("GOOGLE_CLIENT_ID")
         self.client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
         self.redirect_uri = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:3000/zume/settings/gmail/callback")
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # cache key -> (credential fingerprint, Gmail client)
+        self._services: "OrderedDict[str, tuple]" = OrderedDict()
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=GMAIL_IO_WORKERS,
+                thread_name_prefix="gmail-io"
+            )
+        return self._executor
+    
+    async def _run(self, func: Callable[..., T], *args, timeout: Optional[float] = None, **kwargs) -> T:
+        """
+        Run a blocking Gmail/OAuth call on the Gmail thread pool
+        
+        Raises:
+            GmailCallTimeout: If the call takes longer than the timeout
+        """
+        loop = asyncio.get_running_loop()
+        timeout = timeout or GMAIL_CALL_TIMEOUT_SECONDS
+        future = loop.run_in_executor(self._get_executor(), functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            name = getattr(func, "__qualname__", repr(func))
+            logger.error(f"Gmail call {name} timed out after {timeout}s")
+            raise GmailCallTimeout(f"Gmail call timed out after {timeout}s")
+    
+    async def _execute(self, request: Any, method: str, quota_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Execute one API request once its quota units are available
+        
+        Rate-limit errors are retried with exponential backoff.
+        
+        Args:
+            request: googleapiclient HttpRequest
+            method: Gmail method name used for quota accounting, e.g. "users.messages.list"
+            quota_key: Mailbox the call is made for (the integration id)
+        """
+        for attempt in range(self.MAX_RATE_LIMIT_RETRIES + 1):
+            await gmail_quota.acquire(quota_key, method)
+            try:
+                return await self._run(request.execute)
+            except HttpError as error:
+                if not self._is_rate_limited(error) or attempt == self.MAX_RATE_LIMIT_RETRIES:
+                    raise
+                gmail_quota.record_rate_limited(method)
+                delay = 2 ** attempt + random.random()
+                logger.warning(f"Gmail rate limit hit on {method}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    
+    async def _execute_batch(
+        self,
+        batch_func: Callable[[Any, List[Any]], Tuple[Dict[Any, Any], List[Any]]],
+        service: Any,
+        items: List[Any],
+        method: str,
+        quota_key: Optional[str] = None
+    ) -> Tuple[Dict[Any, Any], List[Any]]:
+        """
+        Run a batch function, retrying its failed sub-requests with the same backoff as _execute
+        
+        Args:
+            batch_func: Blocking function returning (results by item, items that failed
+                        with a retryable error)
+            items: Sub-requests, one quota unit cost of method each
+        
+        Returns:
+            (results, items that still failed after the last retry)
+        """
+        results: Dict[Any, Any] = {}
+        pending = items
+        for attempt in range(self.MAX_RATE_LIMIT_RETRIES + 1):
+            await gmail_quota.acquire(quota_key, method, len(pending))
+            batch_results, pending = await self._run(batch_func, service, pending)
+            results.update(batch_results)
+            if not pending or attempt == self.MAX_RATE_LIMIT_RETRIES:
+                break
+            delay = 2 ** attempt + random.random()
+            logger.warning(f"{len(pending)} {method} batch requests failed, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        return results, pending
+    
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Rate-limit and server errors; anything else fails the same way on retry"""
+        if GmailService._is_rate_limited(error):
+            return True
+        return isinstance(error, HttpError) and error.resp.status >= 500
+    
+    @staticmethod
+    def _is_rate_limited(error: Exception) -> bool:
+        """429s and the 403 rateLimitExceeded/userRateLimitExceeded errors"""
+        if not isinstance(error, HttpError):
+            return False
+        if error.resp.status == 429:
+            return True
+        return error.resp.status == 403 and b"ateLimitExceeded" in (error.content or b"")
+    
+    def shutdown(self) -> None:
+        """Stop the Gmail thread pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def _build_service(self, credentials: Credentials) -> Any:
+        """
+        Build a Gmail client from the bundled discovery document (no network access).
+        
+        The client owns one httplib2 transport, which keeps its HTTPS connections open
+        between calls and has a socket timeout.
+        """
+        http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=GMAIL_HTTP_TIMEOUT_SECONDS))
+        return build_from_document(_gmail_discovery_document(), http=http)
+    
+    async def get_service(self, credentials: Credentials, cache_key: Optional[str] = None) -> Any:
+        """
+        Return a Gmail client for these credentials
+        
+        With a cache_key (the integration id) the client and its pooled connections are
+        reused across scans until the access or refresh token changes. httplib2 transports
+        are not thread safe, so a cached client must only be used by one scan at a time.
+        """
+        if cache_key is None:
+            return await self._run(self._build_service, credentials)
+        
+        fingerprint = (credentials.token, credentials.refresh_token)
+        cached = self._services.get(cache_key)
+        if cached and cached[0] == fingerprint:
+            self._services.move_to_end(cache_key)
+            return cached[1]
+        
+        service = await self._run(self._build_service, credentials)
+        self._services[cache_key] = (fingerprint, service)
+        self._services.move_to_end(cache_key)
+        while len(self._services) > GMAIL_SERVICE_CACHE_SIZE:
+            self._services.popitem(last=False)
+        return service
+    
+    def evict_service(self, cache_key: str) -> None:
+        """Drop a cached client (e.g. when the integration is disconnected)"""
+        self._services.pop(cache_key, None)
     
     def get_oauth_url(self, state: str) -> str:
         """Generate OAuth2 authorization URL"""
@@ -51,7 +302,7 @@ class GmailService:
         
         return auth_url
     
-    def exchange_code_for_tokens(self, code: str) -> Dict[str, Any]:
+    async def exchange_code_for_tokens(self, code: str) -> Dict[str, Any]:
         """Exchange authorization code for access and refresh tokens"""
         from google_auth_oauthlib.flow import Flow
         
@@ -69,27 +320,27 @@ class GmailService:
             redirect_uri=self.redirect_uri
         )
         
-        flow.fetch_token(code=code)
+        await self._run(flow.fetch_token, code=code)
         credentials = flow.credentials
         
         return {
             "access_token": credentials.token,
             "refresh_token": credentials.refresh_token,
             "token_expiry": credentials.expiry,
-            "email": self._get_user_email(credentials)
+            "email": await self._get_user_email(credentials)
         }
     
-    def _get_user_email(self, credentials: Credentials) -> str:
+    async def _get_user_email(self, credentials: Credentials) -> str:
         """Get user's email address from Gmail API"""
         try:
-            service = build('gmail', 'v1', credentials=credentials)
-            profile = service.users().getProfile(userId='me').execute()
+            service = await self.get_service(credentials)
+            profile = await self._execute(service.users().getProfile(userId='me'), "users.getProfile")
             return profile.get('emailAddress', '')
-        except HttpError as error:
+        except (HttpError, GmailCallTimeout) as error:
             logger.error(f"Error fetching user profile: {error}")
             return ""
     
-    def refresh_access_token(self, refresh_token: str) -> Optional[Credentials]:
+    async def refresh_access_token(self, refresh_token: str) -> Optional[Credentials]:
         """Refresh expired access token"""
         try:
             credentials = Credentials(
@@ -101,14 +352,14 @@ class GmailService:
                 scopes=self.SCOPES
             )
             
-            credentials.refresh(Request())
+            await self._run(credentials.refresh, Request())
             return credentials
         except Exception as error:
             logger.error(f"Error refreshing token: {error}")
             return None
     
-    def get_credentials(self, access_token: str, refresh_token: str, token_expiry: Optional[datetime] = None) -> Credentials:
-        """Create credentials object"""
+    def build_credentials(self, access_token: str, refresh_token: str, token_expiry: Optional[datetime] = None) -> Credentials:
+        """Create a credentials object from stored tokens without refreshing it"""
         credentials = Credentials(
             token=access_token,
             refresh_token=refresh_token,
@@ -121,117 +372,444 @@ class GmailService:
         if token_expiry:
             credentials.expiry = token_expiry
         
+        return credentials
+    
+    async def get_credentials(self, access_token: str, refresh_token: str, token_expiry: Optional[datetime] = None) -> Credentials:
+        """Create credentials object, refreshing it if expired"""
+        credentials = self.build_credentials(access_token, refresh_token, token_expiry)
+        
         # Refresh if expired
         if credentials.expired and credentials.refresh_token:
-            credentials.refresh(Request())
+            await self._run(credentials.refresh, Request())
         
         return credentials
     
-    async def scan_emails_for_resumes(
+    async def iter_resumes_for_scan(
         self,
         credentials: Credentials,
         job_keywords: List[str],
+        state: GmailScanState,
         last_scan: Optional[datetime] = None,
-        max_results: int = 50
-    ) -> List[Dict[str, Any]]:
+        start_history_id: Optional[str] = None,
+        max_messages: Optional[int] = None,
+        integration_id: Optional[str] = None,
+        on_page: Optional[Callable[[], Awaitable[None]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
-        Scan Gmail for emails with resume attachments
+        Page through all emails with resume attachments, yielding resumes as they are extracted
+        
+        When start_history_id is given, only messages added since that mailbox history
+        point are fetched (incremental sync). A full search is used on the first scan or
+        when the history id has expired. Only one page of message structure and one
+        attachment batch are held in memory at a time.
+        
+        With an integration_id, attachments recorded in the processed-attachment ledger
+        are skipped before download, and each yielded resume has been claimed in the
+        ledger; the caller must complete or release the claim.
         
         Args:
             credentials: Google OAuth2 credentials
             job_keywords: Keywords to filter emails (job titles, skills, etc.)
-            last_scan: Only fetch emails after this datetime
-            max_results: Maximum number of emails to process
+            state: Filled in with the sync mode, counters and the history id to store
+                   for the next scan
+            last_scan: Only fetch emails after this datetime (full search only)
+            start_history_id: historyId stored after the previous successful scan
+            max_messages: Optional safety cap on the number of emails considered
+            integration_id: Integration being scanned; enables the ledger and
+                            reuses its cached Gmail client
+            on_page: Awaited after each page of messages is done, with the state
+                     ready to be checkpointed
         
-        Returns:
-            List of dictionaries with resume data
+        Yields:
+            Dictionaries with resume data
         """
         try:
-            service = build('gmail', 'v1', credentials=credentials)
+            service = await self.get_service(credentials, cache_key=integration_id)
             
-            # Build search query
-            query_parts = ["has:attachment"]
+            # Record the mailbox position before listing so messages arriving
+            # during this scan are picked up by the next one. A resumed scan keeps
+            # the position from when it first started.
+            if state.history_id is None:
+                profile = await self._execute(
+                    service.users().getProfile(userId='me'), "users.getProfile", integration_id
+                )
+                state.history_id = profile.get('historyId')
             
-            # Add date filter
-            if last_scan:
-                date_str = last_scan.strftime("%Y/%m/%d")
-                query_parts.append(f"after:{date_str}")
+            message_ids = None
+            if start_history_id:
+                message_ids = await self._list_added_message_ids(service, start_history_id, integration_id)
             
-            # Add keywords (OR condition)
-            if job_keywords:
-                keyword_query = " OR ".join([f"subject:({kw})" for kw in job_keywords])
-                query_parts.append(f"({keyword_query})")
+            if message_ids is not None:
+                state.mode = "incremental"
+                state.search_query, state.page_token = None, None
+                logger.info(f"Incremental sync found {len(message_ids)} new messages")
+                pages = self._iter_id_pages(message_ids)
+            else:
+                state.mode = "full"
+                queries = self._build_search_queries(job_keywords, last_scan)
+                if len(queries) == 1:
+                    logger.info(f"Gmail search query: {queries[0]}")
+                    if state.search_query != queries[0]:
+                        state.search_query, state.page_token, state.page_message_ids = queries[0], None, []
+                    pages = self._iter_search_pages(service, queries[0], integration_id, state)
+                else:
+                    logger.info(f"Gmail search split into {len(queries)} queries")
+                    state.search_query, state.page_token = None, None
+                    pages = self._iter_id_pages(
+                        await self._search_message_ids(credentials, queries, integration_id)
+                    )
             
-            # Add filename filters for common resume formats
-            query_parts.append("(filename:pdf OR filename:doc OR filename:docx)")
+            async for page in pages:
+                page = [message_id for message_id in page if message_id not in state.processed_message_ids]
+                if max_messages is not None:
+                    page = page[:max(max_messages - state.messages_seen, 0)]
+                    if not page and max_messages <= state.messages_seen:
+                        break
+                if not page:
+                    continue
+                state.messages_seen += len(page)
+                
+                failed: Set[str] = set()
+                async for resume in self._iter_page_resumes(
+                    service, page, job_keywords, state, integration_id, failed
+                ):
+                    yield resume
+                
+                # Messages that could not be fetched stay unprocessed for the next attempt
+                state.mark_processed([message_id for message_id in page if message_id not in failed])
+                if on_page is not None:
+                    await on_page()
+                if failed:
+                    # Stop before the caller stores a history id past these messages
+                    raise GmailScanIncomplete(
+                        f"{len(failed)} messages could not be fetched from Gmail after retries"
+                    )
+            
+            logger.info(
+                f"Scan finished ({state.mode} sync): {state.messages_seen} emails, "
+                f"{state.attachments_fetched} attachments ({state.attachments_skipped} already processed), "
+                f"{state.resumes_extracted} resumes"
+            )
+        
+        except HttpError as error:
+            logger.error(f"Gmail API error: {error}")
+            raise Exception(f"Failed to scan emails: {str(error)}")
+    
+    async def _iter_id_pages(self, message_ids: List[str]) -> AsyncIterator[List[str]]:
+        """Split already-known message ids into pages"""
+        for start in range(0, len(message_ids), self.PAGE_SIZE):
+            yield message_ids[start:start + self.PAGE_SIZE]
+    
+    async def _iter_search_pages(
+        self,
+        service: Any,
+        query: str,
+        quota_key: Optional[str] = None,
+        state: Optional[GmailScanState] = None
+    ) -> AsyncIterator[List[str]]:
+        """
+        Yield pages of message ids for a search query, following nextPageToken
+
+        With a state, starts from state.page_token and keeps it pointing at the page
+        being yielded, so a scan that stops mid-page lists that page again when resumed.
+        """
+        page_token = state.page_token if state else None
+        resumed_token = page_token
+        while True:
+            try:
+                results = await self._execute(service.users().messages().list(
+                    userId='me',
+                    q=query,
+                    maxResults=self.PAGE_SIZE,
+                    pageToken=page_token
+                ), "users.messages.list", quota_key)
+            except HttpError as error:
+                # A checkpointed token may have expired; list from the start instead
+                # (attachments already processed are skipped by the ledger)
+                if page_token is None or page_token != resumed_token or error.resp.status != 400:
+                    raise
+                logger.info("Checkpointed search page token rejected, restarting the listing")
+                page_token = resumed_token = None
+                continue
             
-            query = " ".join(query_parts)
-            logger.info(f"Gmail search query: {query}")
+            message_ids = [message['id'] for message in results.get('messages', [])]
+            if state and state.page_token != page_token:
+                state.page_token, state.page_message_ids = page_token, []
+            if message_ids:
+                yield message_ids
             
-            # Search for messages
-            results = service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=max_results
-            ).execute()
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+    
+    async def _iter_page_resumes(
+        self,
+        service: Any,
+        message_ids: List[str],
+        job_keywords: List[str],
+        state: GmailScanState,
+        integration_id: Optional[str] = None,
+        failed: Optional[Set[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Fetch one page of messages and yield the resumes found in it
+        
+        Ids of messages whose metadata or attachments still failed to download after
+        retries are added to failed.
+        """
+        failed = failed if failed is not None else set()
+        
+        # Phase 1: batched metadata fetch to find resume attachments anywhere in the MIME tree
+        messages, failed_ids = await self._execute_batch(
+            self._fetch_messages_batch, service, message_ids, "users.messages.get", integration_id
+        )
+        failed.update(failed_ids)
+        
+        candidates = []
+        for message_id in message_ids:
+            msg = messages.get(message_id)
+            if not msg:
+                continue
             
-            messages = results.get('messages', [])
-            logger.info(f"Found {len(messages)} matching emails")
+            # Extract email metadata
+            headers = {h['name']: h['value'] for h in msg.get('payload', {}).get('headers', [])}
+            subject = headers.get('Subject', 'No Subject')
             
-            resumes = []
+            # History results are not filtered by the search query, so apply the
+            # subject keyword filter locally
+            if state.mode == "incremental" and not self._subject_matches(subject, job_keywords):
+                continue
             
-            for message in messages:
-                try:
-                    # Get full message details
-                    msg = service.users().messages().get(
-                        userId='me',
-                        id=message['id'],
-                        format='full'
-                    ).execute()
-                    
-                    # Extract email metadata
-                    headers = {h['name']: h['value'] for h in msg['payload']['headers']}
-                    subject = headers.get('Subject', 'No Subject')
-                    from_email = headers.get('From', 'Unknown')
-                    date = headers.get('Date', '')
-                    
-                    # Process attachments
-                    if 'parts' in msg['payload']:
-                        for part in msg['payload']['parts']:
-                            if part.get('filename') and self._is_resume_file(part['filename']):
-                                attachment_data = await self._download_attachment(
-                                    service,
-                                    message['id'],
-                                    part
-                                )
-                                
-                                if attachment_data:
-                                    resume_text = self._extract_text_from_file(
-                                        attachment_data,
-                                        part['filename']
-                                    )
-                                    
-                                    if resume_text:
-                                        resumes.append({
-                                            "email_id": message['id'],
-                                            "subject": subject,
-                                            "from": from_email,
-                                            "date": date,
-                                            "filename": part['filename'],
-                                            "content": resume_text,
-                                            "mime_type": part.get('mimeType', '')
-                                        })
+            for part in self._walk_parts(msg.get('payload', {})):
+                if self._is_resume_attachment(part):
+                    candidates.append({
+                        "email_id": message_id,
+                        "subject": subject,
+                        "from": headers.get('From', 'Unknown'),
+                        "date": headers.get('Date', ''),
+                        "part": part
+                    })
+        
+        # Skip attachments earlier scans already handled, with one ledger query per page
+        if integration_id and candidates:
+            processed = await attachment_ledger.processed_parts(
+                integration_id,
+                list({c["email_id"] for c in candidates})
+            )
+            remaining = [c for c in candidates if (c["email_id"], self._part_key(c["part"])) not in processed]
+            state.attachments_skipped += len(candidates) - len(remaining)
+            candidates = remaining
+        
+        # Phase 2: download only the attachments that passed the filter, one batch at a time
+        for start in range(0, len(candidates), self.ATTACHMENT_BATCH_SIZE):
+            chunk = candidates[start:start + self.ATTACHMENT_BATCH_SIZE]
+            attachments, failed_keys = await self._execute_batch(
+                self._download_attachments_batch,
+                service,
+                [(c["email_id"], c["part"]['body']['attachmentId']) for c in chunk],
+                "users.messages.attachments.get",
+                integration_id
+            )
+            failed.update(message_id for message_id, _ in failed_keys)
+            state.attachments_fetched += len(attachments)
+            
+            for candidate in chunk:
+                part = candidate["part"]
+                attachment_data = attachments.pop((candidate["email_id"], part['body']['attachmentId']), None)
+                if not attachment_data:
+                    continue
+                
+                content_hash = compute_content_hash(attachment_data)
+                if integration_id and not await attachment_ledger.claim(
+                    integration_id,
+                    candidate["email_id"],
+                    self._part_key(part),
+                    content_hash,
+                    part['filename']
+                ):
+                    state.attachments_skipped += 1
+                    continue
                 
+                try:
+                    resume_document = await resume_extraction_service.get_or_extract(
+                        attachment_data,
+                        part['filename'],
+                        part.get('mimeType')
+                    )
                 except Exception as e:
-                    logger.error(f"Error processing message {message['id']}: {e}")
+                    logger.error(f"Error processing attachment in message {candidate['email_id']}: {e}")
+                    state.attachments_failed += 1
+                    if integration_id:
+                        # Possibly transient; let the next scan retry it
+                        await attachment_ledger.release(integration_id, candidate["email_id"], content_hash)
                     continue
-            
-            logger.info(f"Successfully extracted {len(resumes)} resumes")
-            return resumes
+                
+                if not resume_document or not resume_document.text_length:
+                    if integration_id:
+                        # Unparseable files stay unparseable; don't download them again
+                        await attachment_ledger.complete(integration_id, candidate["email_id"], content_hash)
+                    continue
+                
+                state.resumes_extracted += 1
+                yield {
+                    "email_id": candidate["email_id"],
+                    "subject": candidate["subject"],
+                    "from": candidate["from"],
+                    "date": candidate["date"],
+                    "filename": part['filename'],
+                    "content": resume_document.get_text(),
+                    "document_id": str(resume_document.id),
+                    "mime_type": part.get('mimeType', ''),
+                    "file_size": resume_document.file_size,
+                    "sections": resume_document.sections,
+                    "links": resume_document.links,
+                    "part_id": self._part_key(part),
+                    "content_hash": content_hash
+                }
+    
+    def _build_search_queries(self, job_keywords: List[str], last_scan: Optional[datetime]) -> List[str]:
+        """
+        Build the Gmail search queries used for full scans
+        
+        Keywords are reduced to single subject terms (see _subject_terms) and split across
+        several queries so that no single query grows past MAX_QUERY_KEYWORDS terms or
+        MAX_QUERY_KEYWORD_CHARS characters of keyword clauses.
+        """
+        query_parts = ["has:attachment"]
+        
+        # Add date filter
+        if last_scan:
+            date_str = last_scan.strftime("%Y/%m/%d")
+            query_parts.append(f"after:{date_str}")
+        
+        # Add filename filters for common resume formats
+        query_parts.append("(filename:pdf OR filename:doc OR filename:docx)")
+        base_query = " ".join(query_parts)
+        
+        terms = self._subject_terms(job_keywords)
+        if not terms:
+            return [base_query]
+        
+        # Group keyword clauses (OR condition within a query)
+        groups: List[List[str]] = [[]]
+        group_chars = 0
+        for term in terms:
+            clause = f"subject:{term}"
+            if groups[-1] and (
+                len(groups[-1]) >= self.MAX_QUERY_KEYWORDS
+                or group_chars + len(clause) + 4 > self.MAX_QUERY_KEYWORD_CHARS
+            ):
+                groups.append([])
+                group_chars = 0
+            groups[-1].append(clause)
+            group_chars += len(clause) + 4  # " OR "
+        
+        return [f"{base_query} ({' OR '.join(group)})" for group in groups]
+    
+    async def _search_message_ids(
+        self,
+        credentials: Credentials,
+        queries: List[str],
+        quota_key: Optional[str] = None
+    ) -> List[str]:
+        """
+        Run several search queries concurrently and merge their results
+        
+        Each query gets its own client because httplib2 transports are not thread safe.
+        
+        Returns:
+            Message ids without duplicates, in the order they were first returned
+        """
+        slots = asyncio.Semaphore(self.MAX_CONCURRENT_QUERIES)
+        
+        async def list_query(query: str) -> List[str]:
+            async with slots:
+                service = await self.get_service(credentials)
+                message_ids = []
+                async for page in self._iter_search_pages(service, query, quota_key):
+                    message_ids.extend(page)
+                return message_ids
+        
+        results = await asyncio.gather(*(list_query(query) for query in queries))
+        
+        merged = list(dict.fromkeys(message_id for message_ids in results for message_id in message_ids))
+        logger.info(
+            f"Merged {sum(len(ids) for ids in results)} search results into {len(merged)} unique messages"
+        )
+        return merged
+    
+    async def _list_added_message_ids(
+        self,
+        service: Any,
+        start_history_id: str,
+        quota_key: Optional[str] = None
+    ) -> Optional[List[str]]:
+        """
+        List ids of messages added to the mailbox since start_history_id.
+        
+        Returns:
+            Message ids in arrival order, or None if the history id has expired
+            and a full search is required
+        """
+        message_ids = []
+        seen = set()
+        page_token = None
+        
+        try:
+            while True:
+                response = await self._execute(service.users().history().list(
+                    userId='me',
+                    startHistoryId=start_history_id,
+                    historyTypes=['messageAdded'],
+                    pageToken=page_token
+                ), "users.history.list", quota_key)
+                
+                for record in response.get('history', []):
+                    for added in record.get('messagesAdded', []):
+                        message = added.get('message', {})
+                        labels = message.get('labelIds', [])
+                        # Skip the recruiter's own outgoing mail and drafts
+                        if 'SENT' in labels or 'DRAFT' in labels:
+                            continue
+                        if message.get('id') and message['id'] not in seen:
+                            seen.add(message['id'])
+                            message_ids.append(message['id'])
+                
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    return message_ids
         
         except HttpError as error:
-            logger.error(f"Gmail API error: {error}")
-            raise Exception(f"Failed to scan emails: {str(error)}")
+            if error.resp.status == 404:
+                logger.info(f"History id {start_history_id} expired, falling back to full search")
+                return None
+            raise
+    
+    @staticmethod
+    def _subject_terms(job_keywords: List[str]) -> List[str]:
+        """
+        Single-word subject filter terms for the keywords
+        
+        Multi-word phrases from job descriptions rarely appear in subjects as a whole, so
+        each keyword contributes its content words; a subject matches if it contains any
+        of them as a word. Full searches (subject:term) and incremental syncs
+        (_subject_matches) use the same terms.
+        """
+        terms = []
+        for keyword in job_keywords:
+            for word in _SUBJECT_WORD.findall(keyword.lower()):
+                if len(word) > 2 and word not in PHRASE_STOP_WORDS:
+                    terms.append(word)
+        return list(dict.fromkeys(terms))
+    
+    @staticmethod
+    def _subject_matches(subject: str, job_keywords: List[str]) -> bool:
+        """Case-insensitive word match of the subject terms (no terms matches everything)"""
+        terms = GmailService._subject_terms(job_keywords)
+        if not terms:
+            return True
+        subject_words = set(_SUBJECT_WORD.findall(subject.lower()))
+        return any(term in subject_words for term in terms)
     
     def _is_resume_file(self, filename: str) -> bool:
         """Check if file is likely a resume"""
@@ -246,72 +824,128 @@ class GmailService:
         filename_lower = filename.lower()
         return any(keyword in filename_lower for keyword in resume_keywords)
     
-    async def _download_attachment(
+    def _is_resume_attachment(self, part: Dict[str, Any]) -> bool:
+        """Filter MIME parts by filename, size and MIME type before downloading"""
+        filename = part.get('filename')
+        body = part.get('body', {})
+        
+        if not filename or 'attachmentId' not in body:
+            return False
+        if not self._is_resume_file(filename):
+            return False
+        if body.get('size', 0) > self.MAX_ATTACHMENT_SIZE:
+            logger.info(f"Skipping oversized attachment {filename} ({body.get('size')} bytes)")
+            return False
+        return part.get('mimeType', '').lower() in self.RESUME_MIME_TYPES
+    
+    @staticmethod
+    def _part_key(part: Dict[str, Any]) -> str:
+        """Stable identifier of an attachment within its message"""
+        return part.get('partId') or part.get('filename', '')
+    
+    def _walk_parts(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Flatten the MIME tree (forwarded and nested multipart messages included)"""
+        parts = []
+        stack = [payload]
+        while stack:
+            part = stack.pop()
+            parts.append(part)
+            # Reverse so parts come out in document order
+            stack.extend(reversed(part.get('parts', [])))
+        return parts
+    
+    def _fetch_messages_batch(
         self,
         service: Any,
-        message_id: str,
-        part: Dict[str, Any]
-    ) -> Optional[bytes]:
-        """Download email attachment"""
-        try:
-            if 'body' in part and 'attachmentId' in part['body']:
-                attachment = service.users().messages().attachments().get(
-                    userId='me',
-                    messageId=message_id,
-                    id=part['body']['attachmentId']
-                ).execute()
-                
-                data = attachment.get('data')
-                if data:
-                    return base64.urlsafe_b64decode(data)
-        except Exception as e:
-            logger.error(f"Error downloading attachment: {e}")
+        message_ids: List[str]
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Fetch message structure (headers and MIME tree, no body data) using batch requests.
         
-        return None
-    
-    def _extract_text_from_file(self, file_data: bytes, filename: str) -> Optional[str]:
-        """Extract text from PDF or DOCX file"""
-        try:
-            ext = filename.lower().split('.')[-1]
-            
-            if ext == 'pdf':
-                return self._extract_text_from_pdf(file_data)
-            elif ext in ['doc', 'docx']:
-                return self._extract_text_from_docx(file_data)
-        except Exception as e:
-            logger.error(f"Error extracting text from {filename}: {e}")
+        Returns:
+            (mapping of message id to message resource, ids that failed with a retryable
+            error); messages that failed otherwise (e.g. deleted) are omitted from both
+        """
+        messages: Dict[str, Dict[str, Any]] = {}
+        retry_ids: List[str] = []
         
-        return None
-    
-    def _extract_text_from_pdf(self, file_data: bytes) -> str:
-        """Extract text from PDF"""
-        try:
-            pdf_file = io.BytesIO(file_data)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            text = []
-            for page in pdf_reader.pages:
-                text.append(page.extract_text())
-            
-            return "\n".join(text)
-        except Exception as e:
-            logger.error(f"Error parsing PDF: {e}")
-            return ""
+        def callback(request_id, response, exception):
+            if exception is not None:
+                if self._is_rate_limited(exception):
+                    gmail_quota.record_rate_limited("users.messages.get")
+                if self._is_retryable(exception):
+                    retry_ids.append(request_id)
+                    logger.warning(f"Retryable error fetching message {request_id}: {exception}")
+                else:
+                    logger.error(f"Error fetching message {request_id}: {exception}")
+            else:
+                messages[request_id] = response
+        
+        for start in range(0, len(message_ids), self.BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=callback)
+            for message_id in message_ids[start:start + self.BATCH_SIZE]:
+                batch.add(
+                    service.users().messages().get(
+                        userId='me',
+                        id=message_id,
+                        format='full',
+                        fields=self.MESSAGE_STRUCTURE_FIELDS
+                    ),
+                    request_id=message_id
+                )
+            batch.execute()
+        
+        return messages, retry_ids
     
-    def _extract_text_from_docx(self, file_data: bytes) -> str:
-        """Extract text from DOCX"""
-        try:
-            docx_file = io.BytesIO(file_data)
-            doc = DocxDocument(docx_file)
-            
-            text = []
-            for paragraph in doc.paragraphs:
-                text.append(paragraph.text)
-            
-            return "\n".join(text)
-        except Exception as e:
-            logger.error(f"Error parsing DOCX: {e}")
-            return ""
+    def _download_attachments_batch(
+        self,
+        service: Any,
+        attachments: List[tuple]
+    ) -> Tuple[Dict[tuple, bytes], List[tuple]]:
+        """
+        Download attachments using batch requests, capping bytes per batch.
+        
+        Args:
+            attachments: List of (message_id, attachment_id)
+        
+        Returns:
+            (mapping of (message_id, attachment_id) to decoded bytes, keys that failed
+            with a retryable error)
+        """
+        results: Dict[tuple, bytes] = {}
+        keys: Dict[str, tuple] = {}
+        retry_keys: List[tuple] = []
+        
+        def callback(request_id, response, exception):
+            if exception is not None:
+                if self._is_rate_limited(exception):
+                    gmail_quota.record_rate_limited("users.messages.attachments.get")
+                if self._is_retryable(exception):
+                    retry_keys.append(keys[request_id])
+                    logger.warning(f"Retryable error downloading attachment: {exception}")
+                else:
+                    logger.error(f"Error downloading attachment: {exception}")
+                return
+            data = response.get('data')
+            if data:
+                results[keys[request_id]] = base64.urlsafe_b64decode(data)
+        
+        for start in range(0, len(attachments), self.ATTACHMENT_BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=callback)
+            for index, (message_id, attachment_id) in enumerate(attachments[start:start + self.ATTACHMENT_BATCH_SIZE]):
+                request_id = str(start + index)
+                keys[request_id] = (message_id, attachment_id)
+                batch.add(
+                    service.users().messages().attachments().get(
+                        userId='me',
+                        messageId=message_id,
+                        id=attachment_id
+                    ),
+                    request_id=request_id
+                )
+            batch.execute()
+        
+        return results, retry_keys
 
 
 # Singleton instance
@@ -0,0 +1,225 @@
+"""
+Local resume-to-job matching - job keyword profiles (computed when a job is saved) and
+routing of each scanned resume to its best job(s) with TF-IDF vectors before any LLM call
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.database.models.job import Job, JobKeywordProfile
+from app.services.scoring_service import STOP_WORDS, tokenize
+
+# Title terms count this many times as often as description terms
+TITLE_WEIGHT = 3
+# Bump when build_keyword_profile changes so stored profiles are recomputed
+PROFILE_VERSION = 1
+# Search keywords kept per job (the title is always the first)
+MAX_PROFILE_KEYWORDS = 8
+MAX_PHRASE_WORDS = 3
+
+# Job-ad filler that ends a phrase but isn't in the general stop list
+PHRASE_STOP_WORDS = STOP_WORDS | {
+    "looking", "seeking", "join", "own", "owning", "design", "build", "building", "develop",
+    "developing", "help", "lead", "leading", "work", "working", "plus", "bonus", "ideal",
+    "candidate", "required", "requirements", "preferred", "responsibilities", "responsible",
+    "opportunity", "company", "senior", "junior", "new", "great", "excellent", "etc",
+}
+
+# Phrases never span punctuation or line breaks
+_PHRASE_SPLIT = re.compile(r"[,;:.!?()\[\]{}/|\n\r\t•▪●◦–—\"']+")
+_WORD = re.compile(r"[a-zA-Z][a-zA-Z0-9+#.\-]*[a-zA-Z0-9+#]|[a-zA-Z]")
+
+
+@dataclass
+class JobMatch:
+    """A job and how well a resume matches it (cosine similarity, 0-1)"""
+    job: Job
+    score: float
+
+
+def _compute_term_counts(job: Job) -> Counter:
+    counts = Counter(tokenize(job.description or ""))
+    for term in tokenize(job.title or ""):
+        counts[term] += TITLE_WEIGHT
+    return counts
+
+
+def job_term_counts(job: Job) -> Counter:
+    """Term frequencies of a job's title and description (from its stored profile when current)"""
+    profile = job.keyword_profile
+    if profile and profile.version == PROFILE_VERSION:
+        return Counter(profile.term_counts)
+    return _compute_term_counts(job)
+
+
+def _candidate_phrases(text: str) -> List[List[str]]:
+    """Runs of content words between stop words and punctuation (a cheap noun-phrase proxy)"""
+    phrases = []
+    for chunk in _PHRASE_SPLIT.split(text):
+        current: List[str] = []
+        for match in _WORD.findall(chunk):
+            word = match.lower().strip(".-")
+            if len(word) > 2 and word not in PHRASE_STOP_WORDS:
+                current.append(word)
+                continue
+            if current:
+                phrases.append(current)
+            current = []
+        if current:
+            phrases.append(current)
+
+    # Long runs are usually lists of skills; split them into bounded phrases
+    bounded = []
+    for phrase in phrases:
+        for start in range(0, len(phrase), MAX_PHRASE_WORDS):
+            bounded.append(phrase[start:start + MAX_PHRASE_WORDS])
+    return bounded
+
+
+def extract_keywords(title: str, description: str, limit: int = MAX_PROFILE_KEYWORDS) -> List[str]:
+    """
+    Ranked search keywords for a job
+
+    Candidate phrases are scored RAKE-style: a word scores its degree (how many words it
+    co-occurs with in phrases) over its frequency, and a phrase sums its words' scores.
+    Phrases that repeat or overlap the title rank higher.
+    """
+    title = (title or "").strip()
+    phrases = _candidate_phrases(description or "")
+    if not phrases:
+        return [title] if title else []
+
+    frequency: Counter = Counter()
+    degree: Counter = Counter()
+    for phrase in phrases:
+        for word in phrase:
+            frequency[word] += 1
+            degree[word] += len(phrase)
+
+    title_terms = set(tokenize(title))
+    scores: Dict[str, float] = {}
+    for phrase in phrases:
+        key = " ".join(phrase)
+        score = sum(degree[word] / frequency[word] for word in phrase)
+        score *= 1 + 0.5 * len(title_terms & set(phrase))
+        # Repeated phrases accumulate
+        scores[key] = scores.get(key, 0.0) + score
+
+    keywords = [title] if title else []
+    for phrase, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+        if len(keywords) >= limit:
+            break
+        # The title already covers phrases made only of title words
+        if not set(phrase.split()) <= title_terms:
+            keywords.append(phrase)
+    return keywords
+
+
+def build_keyword_profile(job: Job) -> JobKeywordProfile:
+    """Profile stored on the job whenever its title or description changes"""
+    return JobKeywordProfile(
+        keywords=extract_keywords(job.title, job.description),
+        term_counts=dict(_compute_term_counts(job)),
+        version=PROFILE_VERSION
+    )
+
+
+async def ensure_keyword_profile(job: Job) -> JobKeywordProfile:
+    """Return the job's profile, computing and storing it for jobs saved before profiles existed"""
+    if job.keyword_profile is None or job.keyword_profile.version != PROFILE_VERSION:
+        job.keyword_profile = build_keyword_profile(job)
+        await job.set({Job.keyword_profile: job.keyword_profile})
+    return job.keyword_profile
+
+
+def _sublinear_tf(count: float) -> float:
+    return 1.0 + math.log(count) if count > 0 else 0.0
+
+
+class JobMatcher:
+    """
+    Scores resumes against a fixed set of jobs
+
+    Job vectors are built once; resumes are scored with one pass over an inverted
+    index (term -> [(job, weight)]), i.e. a sparse resume x job matrix product, so the
+    cost per resume grows with its distinct terms rather than with the number of jobs.
+    """
+
+    def __init__(self, jobs: List[Job], term_counts: Optional[List[Counter]] = None):
+        self.jobs = jobs
+        term_counts = term_counts or [job_term_counts(job) for job in jobs]
+
+        # Smoothed inverse document frequency over this job set
+        document_frequency: Counter = Counter()
+        for counts in term_counts:
+            document_frequency.update(counts.keys())
+        total = len(jobs)
+        self._idf: Dict[str, float] = {
+            term: math.log((1 + total) / (1 + df)) + 1.0
+            for term, df in document_frequency.items()
+        }
+        self._unseen_idf = math.log(1 + total) + 1.0
+
+        self._index: Dict[str, List[Tuple[int, float]]] = {}
+        for job_index, counts in enumerate(term_counts):
+            weights = {term: _sublinear_tf(count) * self._idf[term] for term, count in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term, weight in weights.items():
+                self._index.setdefault(term, []).append((job_index, weight / norm))
+
+    def _resume_vector(self, text: str) -> Dict[str, float]:
+        weights = {
+            term: _sublinear_tf(count) * self._idf.get(term, self._unseen_idf)
+            for term, count in Counter(tokenize(text)).items()
+        }
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        # Terms no job uses can't contribute to a score; drop them after normalizing
+        return {term: weight / norm for term, weight in weights.items() if term in self._index}
+
+    def score_many(self, texts: List[str]) -> List[List[float]]:
+        """Cosine similarity of every resume against every job (rows follow texts, columns follow jobs)"""
+        matrix = []
+        for text in texts:
+            scores = [0.0] * len(self.jobs)
+            for term, weight in self._resume_vector(text).items():
+                for job_index, job_weight in self._index[term]:
+                    scores[job_index] += weight * job_weight
+            matrix.append(scores)
+        return matrix
+
+    def match_many(self, texts: List[str]) -> List[List[JobMatch]]:
+        """Jobs ranked by score for every resume"""
+        return [
+            sorted(
+                (JobMatch(job=job, score=round(score, 4)) for job, score in zip(self.jobs, scores)),
+                key=lambda match: match.score,
+                reverse=True
+            )
+            for scores in self.score_many(texts)
+        ]
+
+    def select(self, text: str, max_jobs: int = 2, runner_up_ratio: float = 0.85) -> List[JobMatch]:
+        """
+        Jobs a resume should be analyzed against
+
+        Always returns the best job; the runner-up is included only when it scores
+        within runner_up_ratio of the best, so clear-cut resumes cost one LLM call.
+        """
+        return self.select_many([text], max_jobs, runner_up_ratio)[0]
+
+    def select_many(self, texts: List[str], max_jobs: int = 2, runner_up_ratio: float = 0.85) -> List[List[JobMatch]]:
+        """select() for a batch of resumes, scored in one pass"""
+        if not self.jobs:
+            return [[] for _ in texts]
+
+        selections = []
+        for ranked in self.match_many(texts):
+            best = ranked[0]
+            selected = [best]
+            for match in ranked[1:max_jobs]:
+                if match.score > 0 and match.score >= best.score * runner_up_ratio:
+                    selected.append(match)
+            selections.append(selected)
+        return selections
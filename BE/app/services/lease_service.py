@@ -0,0 +1,65 @@
+"""
+Mongo-backed leases - named locks with an expiry, safe across processes and hosts
+"""
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+from app.database.models.lease import Lease
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Identifies this process as a lease holder
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaseService:
+    """Acquire, renew and release leases stored in the leases collection"""
+
+    async def acquire(self, name: str, holder: str, ttl: timedelta) -> bool:
+        """
+        Take the lease if it is free or expired, or extend it if `holder` already has it
+
+        Returns:
+            True if `holder` owns the lease until now + ttl
+        """
+        now = datetime.utcnow()
+        try:
+            await Lease.get_pymongo_collection().find_one_and_update(
+                {"name": name, "$or": [{"expires_at": {"$lte": now}}, {"holder": holder}]},
+                {"$set": {"holder": holder, "expires_at": now + ttl, "renewed_at": now}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # The lease exists, is live and belongs to someone else
+            return False
+
+    async def release(self, name: str, holder: str) -> None:
+        """Give up the lease if `holder` still owns it"""
+        await Lease.get_pymongo_collection().delete_one({"name": name, "holder": holder})
+
+    async def is_held(self, name: str) -> bool:
+        """Whether anyone currently holds the lease"""
+        lease = await Lease.find_one({"name": name, "expires_at": {"$gt": datetime.utcnow()}})
+        return lease is not None
+
+    async def keep_alive(self, name: str, holder: str, ttl: timedelta) -> None:
+        """Renew the lease every third of its ttl until cancelled"""
+        while True:
+            await asyncio.sleep(ttl.total_seconds() / 3)
+            try:
+                if not await self.acquire(name, holder, ttl):
+                    logger.warning(f"Lost lease {name} held by {holder}")
+                    return
+            except Exception as e:
+                logger.error(f"Error renewing lease {name}: {e}")
+
+
+# Singleton instance
+lease_service = LeaseService()
@@ -0,0 +1,234 @@
+"""
+Scan notifications - per-run summaries sent right away or aggregated into hourly or
+daily digests, one email per recipient
+"""
+import html
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from app.database.models.gmail_integration import GmailIntegration
+from app.database.models.job import Job
+from app.database.models.resume_analysis import ResumeAnalysis
+from app.database.models.scan_run import CandidateSummary, ScanRun, ScanSummary
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+NOTIFICATION_MODES = ("immediate", "hourly", "daily")
+DIGEST_WINDOWS = {
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+}
+# Candidates listed per scan summary and per digest
+TOP_CANDIDATES = int(os.getenv("NOTIFICATION_TOP_CANDIDATES", "5"))
+# A digest claimed for longer than this by a process that died is sent again
+DIGEST_CLAIM_TTL = timedelta(minutes=10)
+# Runs whose notification could not be queued this many times are marked failed
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+
+RESULTS_URL = "http://localhost:3000/zume/resume/analyze"
+
+
+async def build_scan_summary(run: ScanRun, jobs: List[Job]) -> ScanSummary:
+    """Summarize a finished run: analysis count and its best candidates"""
+    rows = await ResumeAnalysis.get_pymongo_collection().find(
+        {"source_metadata.scan_run_id": str(run.id)},
+        {"file_name": 1, "candidate_email": 1, "job_context.job_title": 1, "scores.overall_score": 1}
+    ).sort("scores.overall_score", -1).limit(TOP_CANDIDATES).to_list(TOP_CANDIDATES)
+
+    return ScanSummary(
+        analyzed=run.counters.analyzed,
+        job_titles=[job.title for job in jobs],
+        top_candidates=[
+            CandidateSummary(
+                analysis_id=str(row["_id"]),
+                file_name=row.get("file_name", ""),
+                candidate_email=row.get("candidate_email"),
+                job_title=(row.get("job_context") or {}).get("job_title"),
+                score=row.get("scores", {}).get("overall_score", 0)
+            )
+            for row in rows
+        ]
+    )
+
+
+async def notify_scan_complete(integration: GmailIntegration, run: ScanRun, jobs: List[Job]) -> None:
+    """
+    Record the run's summary for notification and send it now in immediate mode.
+    Runs that analyzed nothing, or finished while SMTP is not configured, are not notified.
+    """
+    from app.services.email_service import SMTPSettings
+
+    if run.counters.analyzed == 0:
+        await run.set({ScanRun.notification_status: "skipped"})
+        return
+    if not SMTPSettings.from_env().configured:
+        logger.warning(f"SMTP not configured, skipping notification for scan run {run.id}")
+        await run.set({ScanRun.notification_status: "skipped"})
+        return
+
+    mode = integration.notification_mode if integration.notification_mode in NOTIFICATION_MODES else "immediate"
+    run.summary = await build_scan_summary(run, jobs)
+    run.notification_status = "pending"
+    run.notification_recipient = integration.notification_email or integration.email
+    run.notification_mode = mode
+    await run.set({
+        ScanRun.summary: run.summary,
+        ScanRun.notification_status: run.notification_status,
+        ScanRun.notification_recipient: run.notification_recipient,
+        ScanRun.notification_mode: run.notification_mode,
+    })
+
+    if mode == "immediate":
+        await _send_notification([run.id])
+
+
+async def send_due_digests() -> None:
+    """Send each recipient whose digest window has passed one email with all their pending runs"""
+    try:
+        now = datetime.utcnow()
+        pending = await ScanRun.find(
+            {"notification_status": "pending"}
+        ).sort(+ScanRun.finished_at).to_list()
+        # Runs whose digest send died midway
+        pending += await ScanRun.find({
+            "notification_status": "sending",
+            "updated_at": {"$lte": now - DIGEST_CLAIM_TTL},
+        }).to_list()
+
+        by_recipient: Dict[str, List[ScanRun]] = {}
+        for run in pending:
+            by_recipient.setdefault(run.notification_recipient, []).append(run)
+
+        for recipient, runs in by_recipient.items():
+            # The shortest window among the recipient's runs applies
+            windows = [DIGEST_WINDOWS.get(run.notification_mode, timedelta(0)) for run in runs]
+            oldest = min(run.finished_at or run.updated_at for run in runs)
+            if now - oldest >= min(windows):
+                await _send_notification([run.id for run in runs])
+
+    except Exception as e:
+        logger.error(f"Error sending notification digests: {e}")
+
+
+async def _send_notification(run_ids: List) -> None:
+    """
+    Claim the runs, send them as one email and mark them sent. Runs that could not be
+    queued go back to pending until NOTIFICATION_MAX_ATTEMPTS, then are marked failed;
+    all are skipped if SMTP is no longer configured.
+    """
+    claim = uuid.uuid4().hex
+    await ScanRun.find({
+        "_id": {"$in": run_ids},
+        "$or": [
+            {"notification_status": "pending"},
+            {"notification_status": "sending", "updated_at": {"$lte": datetime.utcnow() - DIGEST_CLAIM_TTL}},
+        ],
+    }).update({
+        "$set": {
+            "notification_status": "sending",
+            "notification_claim": claim,
+            "updated_at": datetime.utcnow(),
+        },
+        "$inc": {"notification_attempts": 1},
+    })
+    runs = await ScanRun.find({"notification_claim": claim}).sort(+ScanRun.finished_at).to_list()
+    if not runs:
+        return
+
+    from app.services.email_service import SMTPSettings, send_email
+
+    recipient = runs[0].notification_recipient
+    subject, body = render_notification(runs)
+    sent = await send_email(to_email=recipient, subject=subject, html_content=body)
+
+    if sent or not SMTPSettings.from_env().configured:
+        await ScanRun.find({"notification_claim": claim}).update({"$set": {
+            "notification_status": "sent" if sent else "skipped",
+            "notification_claim": None,
+        }})
+        if sent:
+            logger.info(f"Notification for {len(runs)} scan(s) queued for {recipient}")
+        else:
+            logger.warning(f"SMTP not configured, skipping notification for {len(runs)} scan(s)")
+        return
+
+    await ScanRun.find({
+        "notification_claim": claim,
+        "notification_attempts": {"$gte": NOTIFICATION_MAX_ATTEMPTS},
+    }).update({"$set": {"notification_status": "failed", "notification_claim": None}})
+    await ScanRun.find({"notification_claim": claim}).update({"$set": {
+        "notification_status": "pending",
+        "notification_claim": None,
+    }})
+    if any(run.notification_attempts >= NOTIFICATION_MAX_ATTEMPTS for run in runs):
+        logger.error(f"Giving up on notification to {recipient} after {NOTIFICATION_MAX_ATTEMPTS} attempts")
+
+
+def render_notification(runs: List[ScanRun]) -> tuple:
+    """Subject and HTML body for one or more summarized runs"""
+    total = sum(run.summary.analyzed for run in runs)
+    job_titles = list(dict.fromkeys(title for run in runs for title in run.summary.job_titles))
+    jobs_text = ", ".join(job_titles[:3])
+    if len(job_titles) > 3:
+        jobs_text += f" and {len(job_titles) - 3} more"
+
+    candidates = sorted(
+        (candidate for run in runs for candidate in run.summary.top_candidates),
+        key=lambda candidate: candidate.score,
+        reverse=True
+    )[:TOP_CANDIDATES]
+    candidate_rows = "".join(
+        f"<li><strong>{html.escape(candidate.candidate_email or candidate.file_name)}</strong>"
+        f" - {candidate.score:.0f}/100"
+        f"{' for ' + html.escape(candidate.job_title) if candidate.job_title else ''}</li>"
+        for candidate in candidates
+    )
+
+    if len(runs) == 1:
+        subject = f"Resume Scan Complete - {total} CVs Analyzed"
+        heading = "Gmail Resume Scan Complete"
+        intro = "Your scheduled email scan has been completed."
+        period = f"<li><strong>Scan Time:</strong> {(runs[0].finished_at or runs[0].updated_at).strftime('%Y-%m-%d %H:%M UTC')}</li>"
+    else:
+        subject = f"Resume Scan Digest - {total} CVs Analyzed in {len(runs)} Scans"
+        heading = "Gmail Resume Scan Digest"
+        intro = f"{len(runs)} email scans found new resumes since your last update."
+        first = runs[0].finished_at or runs[0].updated_at
+        last = runs[-1].finished_at or runs[-1].updated_at
+        period = (
+            f"<li><strong>Period:</strong> {first.strftime('%Y-%m-%d %H:%M')} - "
+            f"{last.strftime('%Y-%m-%d %H:%M UTC')}</li>"
+        )
+
+    body = f"""
+        <html>
+        <body>
+            <h2>{heading}</h2>
+            <p>{intro}</p>
+
+            <h3>Scan Summary:</h3>
+            <ul>
+                <li><strong>CVs Analyzed:</strong> {total}</li>
+                <li><strong>Jobs:</strong> {html.escape(jobs_text)}</li>
+                {period}
+            </ul>
+
+            <h3>Top Candidates:</h3>
+            <ul>{candidate_rows}</ul>
+
+            <p>
+                <a href="{RESULTS_URL}"
+                   style="background-color: #4F46E5; color: white; padding: 10px 20px;
+                          text-decoration: none; border-radius: 5px; display: inline-block;">
+                    View Analysis Results
+                </a>
+            </p>
+
+            <p>Thank you for using our service!</p>
+        </body>
+        </html>
+        """
+    return subject, body
@@ -0,0 +1,233 @@
+"""
+Mongo-backed scan queue - the API and the scheduler enqueue scans, scan workers claim and run them
+"""
+import asyncio
+import math
+import os
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.database.models.scan_job import ScanJob
+from app.services.lease_service import lease_service
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# A running job is retried by another worker if its worker stops renewing it for this long
+QUEUE_LEASE_TTL = timedelta(minutes=5)
+MAX_SCAN_ATTEMPTS = int(os.getenv("SCAN_MAX_ATTEMPTS", "3"))
+# Scans running at once across every worker process; the rest wait in the queue
+MAX_CONCURRENT_SCANS = int(os.getenv("MAX_CONCURRENT_SCANS", "4"))
+# Delay before the first retry; doubled for each further attempt
+RETRY_BACKOFF = timedelta(seconds=int(os.getenv("SCAN_RETRY_BACKOFF_SECONDS", "60")))
+# Manual scans are refused while this many scans are waiting for a worker
+MAX_QUEUED_SCANS = int(os.getenv("SCAN_MAX_QUEUED", "100"))
+# Bounds of the Retry-After estimate given when the queue is full
+MIN_RETRY_AFTER_SECONDS = 10
+MAX_RETRY_AFTER_SECONDS = 900
+
+
+class ScanQueueFull(Exception):
+    """The scan queue is at MAX_QUEUED_SCANS"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Scan queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ScanQueue:
+    """Enqueue, claim, renew and finish queued scans"""
+
+    async def enqueue(
+        self,
+        integration_id: str,
+        job_ids: Optional[List[str]] = None,
+        trigger: str = "manual",
+        scheduled_for: Optional[datetime] = None,
+        max_queued: Optional[int] = None
+    ) -> Tuple[ScanJob, bool]:
+        """
+        Queue a scan unless one of this integration is already queued or running
+
+        Args:
+            max_queued: Refuse new scans once this many are waiting (None = no limit)
+
+        Returns:
+            The integration's active scan, and whether it was created by this call
+
+        Raises:
+            ScanQueueFull: The queue is at max_queued
+        """
+        existing = await self.get_active(integration_id)
+        if existing:
+            return existing, False
+
+        if max_queued is not None:
+            queued = await ScanJob.find({"status": "queued"}).count()
+            if queued >= max_queued:
+                raise ScanQueueFull(await self.estimate_retry_after(queued, max_queued))
+
+        # Two concurrent enqueues (e.g. a double click) race on the active_key index
+        for _ in range(3):
+            job = ScanJob(
+                integration_id=integration_id,
+                job_ids=job_ids or None,
+                trigger=trigger,
+                scheduled_for=scheduled_for,
+                active_key=integration_id
+            )
+            try:
+                await job.insert()
+            except DuplicateKeyError:
+                existing = await self.get_active(integration_id)
+                if existing:
+                    return existing, False
+                # The other scan finished in between; try again
+                continue
+            logger.info(f"Queued {trigger} scan {job.id} for integration {integration_id}")
+            return job, True
+        raise RuntimeError(f"Could not queue a scan for integration {integration_id}")
+
+    async def get_active(self, integration_id: str) -> Optional[ScanJob]:
+        """The integration's queued or running scan, if any"""
+        return await ScanJob.find_one({"active_key": integration_id})
+
+    async def estimate_retry_after(self, queued: int, max_queued: int = MAX_QUEUED_SCANS) -> int:
+        """Seconds until the queue has likely drained enough to accept another scan"""
+        recent = await ScanJob.find(
+            {"status": "done", "started_at": {"$ne": None}, "finished_at": {"$ne": None}}
+        ).sort(-ScanJob.finished_at).limit(20).to_list()
+        durations = [(job.finished_at - job.started_at).total_seconds() for job in recent]
+        average = sum(durations) / len(durations) if durations else 60.0
+
+        # Scans running now approximate how many worker slots are serving the queue
+        running = await ScanJob.find({"status": "running"}).count()
+        estimate = average * (queued - max_queued + 1) / max(running, 1)
+        return int(min(max(math.ceil(estimate), MIN_RETRY_AFTER_SECONDS), MAX_RETRY_AFTER_SECONDS))
+
+    async def acquire_slot(self, holder: str) -> Optional[str]:
+        """
+        Take one of the MAX_CONCURRENT_SCANS slot leases shared by all workers; a slot
+        must be held while claiming and running a scan
+
+        Returns:
+            The slot's lease name, or None if every slot is taken
+        """
+        # Start at a random slot so idle workers don't all contend for the first one
+        start = random.randrange(MAX_CONCURRENT_SCANS)
+        for offset in range(MAX_CONCURRENT_SCANS):
+            name = f"scan-slot:{(start + offset) % MAX_CONCURRENT_SCANS}"
+            if await lease_service.acquire(name, holder, QUEUE_LEASE_TTL):
+                return name
+        return None
+
+    async def keep_slot_alive(self, name: str, holder: str) -> None:
+        """Renew a slot lease until cancelled; a worker that dies frees it after QUEUE_LEASE_TTL"""
+        await lease_service.keep_alive(name, holder, QUEUE_LEASE_TTL)
+
+    async def release_slot(self, name: str, holder: str) -> None:
+        await lease_service.release(name, holder)
+
+    async def claim(self, worker_id: str) -> Optional[ScanJob]:
+        """
+        Take the oldest runnable scan, including one abandoned by a dead worker
+
+        Returns:
+            The claimed job, or None if the queue is empty
+        """
+        now = datetime.utcnow()
+        collection = ScanJob.get_pymongo_collection()
+
+        # Abandoned jobs that used up their attempts are not picked up again
+        await collection.update_many(
+            {"status": "running", "lease_until": {"$lte": now}, "attempts": {"$gte": MAX_SCAN_ATTEMPTS}},
+            {"$set": {"status": "failed", "error": "Worker stopped responding", "finished_at": now, "active_key": None}}
+        )
+
+        document = await collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "available_at": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lte": now}},
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": worker_id,
+                    "started_at": now,
+                    "lease_until": now + QUEUE_LEASE_TTL,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("enqueued_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        return ScanJob.model_validate(document) if document else None
+
+    async def renew(self, job: ScanJob, worker_id: str) -> bool:
+        """Extend the worker's claim on a running job"""
+        result = await ScanJob.get_pymongo_collection().update_one(
+            {"_id": job.id, "worker_id": worker_id, "status": "running"},
+            {"$set": {"lease_until": datetime.utcnow() + QUEUE_LEASE_TTL}}
+        )
+        return result.modified_count == 1
+
+    async def keep_alive(self, job: ScanJob, worker_id: str) -> None:
+        """Renew the claim every third of its ttl until cancelled"""
+        while True:
+            await asyncio.sleep(QUEUE_LEASE_TTL.total_seconds() / 3)
+            try:
+                if not await self.renew(job, worker_id):
+                    logger.warning(f"Lost claim on scan {job.id}")
+                    return
+            except Exception as e:
+                logger.error(f"Error renewing claim on scan {job.id}: {e}")
+
+    async def complete(self, job: ScanJob, worker_id: str) -> None:
+        await ScanJob.get_pymongo_collection().update_one(
+            {"_id": job.id, "worker_id": worker_id},
+            {"$set": {
+                "status": "done",
+                "finished_at": datetime.utcnow(),
+                "lease_until": None,
+                "error": None,
+                "active_key": None,
+            }}
+        )
+
+    async def fail(self, job: ScanJob, worker_id: str, error: str) -> None:
+        """Retry the job with backoff, or mark it failed once it has used its attempts"""
+        now = datetime.utcnow()
+        if job.attempts < MAX_SCAN_ATTEMPTS:
+            update = {
+                "status": "queued",
+                "available_at": now + RETRY_BACKOFF * 2 ** (job.attempts - 1),
+                "lease_until": None,
+                "error": error,
+            }
+        else:
+            update = {"status": "failed", "finished_at": now, "lease_until": None, "error": error, "active_key": None}
+        await ScanJob.get_pymongo_collection().update_one(
+            {"_id": job.id, "worker_id": worker_id},
+            {"$set": update}
+        )
+
+    async def requeue(self, job: ScanJob, worker_id: str, delay: timedelta = timedelta(0)) -> None:
+        """
+        Hand a job back without using up an attempt, e.g. when its worker shuts down
+        mid-scan; it can be claimed again after delay
+        """
+        await ScanJob.get_pymongo_collection().update_one(
+            {"_id": job.id, "worker_id": worker_id, "status": "running"},
+            {
+                "$set": {"status": "queued", "available_at": datetime.utcnow() + delay, "lease_until": None},
+                "$inc": {"attempts": -1},
+            }
+        )
+
+
+# Singleton instance
+scan_queue = ScanQueue()
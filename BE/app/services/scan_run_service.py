@@ -0,0 +1,182 @@
+"""
+Scan runs - checkpoint Gmail scans so an interrupted scan resumes where it stopped,
+and record the counters shown by the scan progress endpoints
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from app.database.models.scan_run import ScanCheckpoint, ScanCounters, ScanRun
+from app.services.attachment_ledger import attachment_ledger
+from app.services.gmail_service import GmailScanState
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Interrupted runs older than this start over instead of resuming
+RESUME_MAX_AGE = timedelta(hours=int(os.getenv("SCAN_RESUME_MAX_AGE_HOURS", "24")))
+
+
+class ScanRunService:
+    """Creates, resumes, checkpoints and finishes ScanRun documents"""
+
+    async def start(
+        self,
+        integration_id: str,
+        trigger: str = "manual",
+        scan_job_id: Optional[str] = None
+    ) -> Tuple[ScanRun, GmailScanState]:
+        """
+        Resume the integration's latest run if it died or failed, or start a new one.
+        Must be called while holding the integration's scan lock, so any run still
+        marked "running" belongs to a scan that died.
+
+        Returns:
+            The run and the Gmail scan state to continue from
+        """
+        # Claims of a dead scan would hide their attachments from every later scan
+        released_messages = await attachment_ledger.release_abandoned(integration_id)
+
+        latest = await ScanRun.find(
+            {"integration_id": integration_id}
+        ).sort(-ScanRun.started_at).first_or_none()
+
+        run = None
+        if (
+            latest is not None
+            and latest.status in ("running", "error")
+            and datetime.utcnow() - latest.started_at <= RESUME_MAX_AGE
+        ):
+            run = latest
+
+        # Dead runs that won't be resumed
+        await ScanRun.find({
+            "integration_id": integration_id,
+            "status": "running",
+            "_id": {"$ne": run.id if run else None},
+        }).update({"$set": {"status": "interrupted", "finished_at": datetime.utcnow()}})
+
+        if run is None:
+            run = ScanRun(
+                integration_id=integration_id,
+                trigger=trigger,
+                scan_job_ids=[scan_job_id] if scan_job_id else []
+            )
+            await run.insert()
+            return run, GmailScanState()
+
+        run.resumed_count += 1
+        run.status = "running"
+        run.error = None
+        if scan_job_id:
+            run.scan_job_ids.append(scan_job_id)
+        await run.set({
+            ScanRun.resumed_count: run.resumed_count,
+            ScanRun.scan_job_ids: run.scan_job_ids,
+            ScanRun.status: run.status,
+            ScanRun.error: None,
+            ScanRun.finished_at: None,
+            ScanRun.updated_at: datetime.utcnow(),
+        })
+
+        checkpoint = run.checkpoint
+        counters = run.counters
+        state = GmailScanState(
+            mode=checkpoint.mode,
+            history_id=checkpoint.history_id,
+            search_query=checkpoint.search_query,
+            page_token=checkpoint.page_token,
+            # Messages whose attachments were released must be fetched again
+            processed_message_ids=set(checkpoint.processed_message_ids) - released_messages,
+            page_message_ids=[
+                message_id for message_id in checkpoint.processed_message_ids
+                if message_id not in released_messages
+            ] if checkpoint.search_query else [],
+            messages_seen=counters.emails_seen,
+            attachments_fetched=counters.attachments_fetched,
+            attachments_skipped=counters.attachments_skipped,
+            resumes_extracted=counters.resumes_extracted
+        )
+        logger.info(
+            f"Resuming scan run {run.id} for integration {integration_id} "
+            f"after {len(state.processed_message_ids)} processed emails"
+        )
+        return run, state
+
+    @staticmethod
+    def _snapshot(run: ScanRun, state: GmailScanState, analyzed: int, failed: int) -> dict:
+        """
+        Update the run's counters and return the Mongo update that saves them with the
+        scan position. processed_message_ids is only written incrementally: a search
+        resumes by listing its current page again, so only that page's ids are kept;
+        other scans add the ids processed since the last checkpoint.
+        """
+        run.counters = ScanCounters(
+            emails_seen=state.messages_seen,
+            attachments_fetched=state.attachments_fetched,
+            attachments_skipped=state.attachments_skipped,
+            resumes_extracted=state.resumes_extracted,
+            analyzed=analyzed,
+            failed=state.attachments_failed + failed
+        )
+        run.updated_at = datetime.utcnow()
+        run.checkpoint.mode = state.mode
+        run.checkpoint.history_id = state.history_id
+        run.checkpoint.search_query = state.search_query
+        run.checkpoint.page_token = state.page_token
+
+        update = {"$set": {
+            "checkpoint.mode": state.mode,
+            "checkpoint.history_id": state.history_id,
+            "checkpoint.search_query": state.search_query,
+            "checkpoint.page_token": state.page_token,
+            "counters": run.counters.model_dump(),
+            "updated_at": run.updated_at,
+        }}
+        if state.search_query is not None:
+            update["$set"]["checkpoint.processed_message_ids"] = list(state.page_message_ids)
+        elif state.unsaved_message_ids:
+            update["$addToSet"] = {"checkpoint.processed_message_ids": {"$each": state.unsaved_message_ids}}
+        return update
+
+    async def checkpoint(self, run: ScanRun, state: GmailScanState, analyzed: int = 0, failed: int = 0) -> None:
+        """Save the scan position and counters"""
+        update = self._snapshot(run, state, analyzed, failed)
+        await ScanRun.get_pymongo_collection().update_one({"_id": run.id}, update)
+        state.unsaved_message_ids = []
+
+    async def finish(
+        self,
+        run: ScanRun,
+        state: GmailScanState,
+        analyzed: int = 0,
+        failed: int = 0,
+        error: Optional[str] = None
+    ) -> None:
+        """
+        Record the final counters. A failed run keeps its checkpoint and is resumed by
+        the next scan; a successful one no longer needs it.
+        """
+        update = self._snapshot(run, state, analyzed, failed)
+        if not error:
+            run.checkpoint = ScanCheckpoint(mode=state.mode, history_id=state.history_id)
+            update.pop("$addToSet", None)
+            update["$set"] = {
+                "checkpoint": run.checkpoint.model_dump(),
+                "counters": update["$set"]["counters"],
+                "updated_at": run.updated_at,
+            }
+        run.status = "error" if error else "success"
+        run.error = error
+        run.finished_at = run.updated_at
+        update["$set"].update({
+            "status": run.status,
+            "error": run.error,
+            "finished_at": run.finished_at,
+        })
+        await ScanRun.get_pymongo_collection().update_one({"_id": run.id}, update)
+        state.unsaved_message_ids = []
+
+
+# Singleton instance
+scan_run_service = ScanRunService()
@@ -0,0 +1,140 @@
+"""
+Scan worker - claims queued Gmail scans and runs them, a few at a time per process and
+at most MAX_CONCURRENT_SCANS across all processes
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from app.database.models.scan_job import ScanJob
+from app.services.lease_service import PROCESS_ID
+from app.services.scan_queue import MAX_CONCURRENT_SCANS, RETRY_BACKOFF, scan_queue
+from app.services.scanner_service import perform_email_scan
+from app.utils.logger import get_logger
+from app.utils.metrics import metrics
+
+logger = get_logger(__name__)
+
+# Scans this process runs at once, within the global MAX_CONCURRENT_SCANS cap
+WORKER_CONCURRENCY = int(os.getenv("SCAN_WORKER_SLOTS", str(MAX_CONCURRENT_SCANS)))
+# How often an idle worker checks the queue
+POLL_INTERVAL = float(os.getenv("SCAN_WORKER_POLL_SECONDS", "2"))
+
+
+class ScanWorker:
+    """
+    Runs WORKER_CONCURRENCY claim-and-scan loops. Each loop takes a global scan slot
+    before claiming, so scans beyond MAX_CONCURRENT_SCANS stay queued.
+    """
+
+    def __init__(self, worker_id: str = PROCESS_ID, concurrency: int = WORKER_CONCURRENCY):
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self._tasks: List[asyncio.Task] = []
+        self._stopping: Optional[asyncio.Event] = None
+        self._running = 0
+        metrics.describe("scan_start_lag_seconds", "Delay between a scheduled scan's fire time and its start")
+        metrics.describe("scan_queue_wait_seconds", "Time a scan waited in the queue before a worker took it")
+        metrics.describe("scans_running", "Scans currently running in this process")
+        metrics.register_callback(lambda: [("scans_running", {}, self._running)])
+
+    def start(self):
+        if self._tasks:
+            return
+        self._stopping = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run_slot(slot)) for slot in range(self.concurrency)]
+        logger.info(f"Scan worker {self.worker_id} started with {self.concurrency} slots")
+
+    async def stop(self):
+        """Stop claiming scans; scans in progress are handed back to the queue"""
+        if not self._tasks:
+            return
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info(f"Scan worker {self.worker_id} stopped")
+
+    async def _run_slot(self, slot: int):
+        holder = f"{self.worker_id}:{slot}"
+        while not self._stopping.is_set():
+            slot_name = None
+            job = None
+            try:
+                slot_name = await scan_queue.acquire_slot(holder)
+                if slot_name is not None:
+                    job = await scan_queue.claim(self.worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error claiming a scan: {e}")
+
+            if job is None:
+                if slot_name is not None:
+                    await self._release_slot(slot_name, holder)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            slot_heartbeat = asyncio.create_task(scan_queue.keep_slot_alive(slot_name, holder))
+            try:
+                await self._run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Queue bookkeeping failed; the claim expires and the scan is retried
+                logger.error(f"Error finishing scan {job.id}: {e}")
+            finally:
+                slot_heartbeat.cancel()
+                await asyncio.shield(self._release_slot(slot_name, holder))
+
+    @staticmethod
+    async def _release_slot(slot_name: str, holder: str):
+        try:
+            await scan_queue.release_slot(slot_name, holder)
+        except Exception as e:
+            # The slot frees itself once its lease expires
+            logger.error(f"Error releasing {slot_name}: {e}")
+
+    async def _run_job(self, job: ScanJob):
+        started_at = datetime.utcnow()
+        metrics.observe("scan_queue_wait_seconds", (started_at - job.enqueued_at).total_seconds())
+        if job.scheduled_for is not None:
+            lag = (started_at - job.scheduled_for).total_seconds()
+            metrics.observe("scan_start_lag_seconds", max(lag, 0.0))
+
+        logger.info(f"Running {job.trigger} scan {job.id} for integration {job.integration_id} (attempt {job.attempts})")
+        heartbeat = asyncio.create_task(scan_queue.keep_alive(job, self.worker_id))
+        self._running += 1
+        try:
+            ran = await perform_email_scan(
+                integration_id=job.integration_id,
+                job_ids=job.job_ids,
+                trigger=job.trigger,
+                scan_job_id=str(job.id)
+            )
+            if ran:
+                await scan_queue.complete(job, self.worker_id)
+            else:
+                # Another scan of the integration (or the lock of one that died) is in
+                # the way; try again once it has had time to finish or expire
+                logger.info(f"Scan {job.id} for integration {job.integration_id} is locked, requeued")
+                await scan_queue.requeue(job, self.worker_id, delay=RETRY_BACKOFF)
+        except asyncio.CancelledError:
+            # Shutting down: let another worker pick the scan up right away
+            await asyncio.shield(scan_queue.requeue(job, self.worker_id))
+            raise
+        except Exception as e:
+            logger.error(f"Scan {job.id} for integration {job.integration_id} failed: {e}")
+            await scan_queue.fail(job, self.worker_id, str(e))
+        finally:
+            self._running -= 1
+            heartbeat.cancel()
+
+
+# Singleton instance
+scan_worker = ScanWorker()
@@ -1,27 +1,103 @@
 """
 Email scanner service - performs email scanning and resume analysis
 """
-from datetime import datetime
-from typing import List, Optional
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from email.utils import parseaddr
+from typing import List, Optional, Tuple, TYPE_CHECKING
 from bson import ObjectId
 
 from app.database.models.gmail_integration import GmailIntegration
 from app.database.models.job import Job
 from app.database.models.resume_analysis import ResumeAnalysis
-from app.services.gmail_service import gmail_service
+from app.database.models.scan_run import ScanRun
+from app.services.attachment_ledger import attachment_ledger
+from app.services.gmail_service import gmail_service, GmailScanState
+from app.services.job_matcher import JobMatch, JobMatcher, ensure_keyword_profile
+from app.services.lease_service import lease_service
+from app.services.scan_run_service import scan_run_service
+from app.services.scoring_service import compute_local_metrics
+from app.services.token_manager import gmail_token_manager
 from app.utils.logger import get_logger
 
+if TYPE_CHECKING:
+    from app.services.analyze_service import ResumeAnalyzerService
+
 logger = get_logger(__name__)
 
+# Scan lock lifetime; renewed while the scan runs, so it only matters if the process dies
+SCAN_LOCK_TTL = timedelta(minutes=5)
+# Extracted resumes waiting for analysis; bounds memory during large scans
+SCAN_QUEUE_SIZE = int(os.getenv("SCAN_QUEUE_SIZE", "10"))
+# Resumes analyzed concurrently within one scan
+ANALYSIS_CONCURRENCY = int(os.getenv("SCAN_ANALYSIS_CONCURRENCY", "2"))
+# A resume is analyzed against its best job, plus a close runner-up
+MAX_JOBS_PER_RESUME = int(os.getenv("SCAN_MAX_JOBS_PER_RESUME", "2"))
+# Analyses saved per bulk insert
+ANALYSIS_WRITE_BATCH = int(os.getenv("SCAN_ANALYSIS_WRITE_BATCH", "50"))
+
+
+def scan_lock_name(integration_id: str) -> str:
+    """Lease name that serializes scans of one integration"""
+    return f"scan:{integration_id}"
+
 
-async def perform_email_scan(integration_id: str, job_ids: Optional[List[str]] = None):
+async def perform_email_scan(
+    integration_id: str,
+    job_ids: Optional[List[str]] = None,
+    trigger: str = "manual",
+    scan_job_id: Optional[str] = None
+) -> bool:
     """
-    Perform email scan and analysis
+    Perform email scan and analysis, unless a scan of this integration is already running
+    
+    Manual and scheduled scans share a per-integration lease, so they never overlap
+    even when started from different processes.
     
     Args:
         integration_id: GmailIntegration document ID
         job_ids: Optional list of specific job IDs to scan for
+        trigger: "manual" or "scheduled", recorded on the scan run
+        scan_job_id: Queued scan being executed, recorded on the scan run
+    
+    Returns:
+        False if the scan was skipped because another one holds the lock
+    
+    Raises:
+        Exception: If the scan failed; its error is recorded on the run and integration first
     """
+    lock_name = scan_lock_name(integration_id)
+    run_id = uuid.uuid4().hex
+    
+    if not await lease_service.acquire(lock_name, run_id, SCAN_LOCK_TTL):
+        logger.info(f"Scan already running for integration {integration_id}, skipping")
+        return False
+    
+    heartbeat = asyncio.create_task(lease_service.keep_alive(lock_name, run_id, SCAN_LOCK_TTL))
+    try:
+        await _perform_email_scan(integration_id, job_ids, trigger, scan_job_id)
+        return True
+    finally:
+        heartbeat.cancel()
+        try:
+            await lease_service.release(lock_name, run_id)
+        except Exception as e:
+            logger.warning(f"Error releasing scan lock for integration {integration_id}: {e}")
+
+
+async def _perform_email_scan(
+    integration_id: str,
+    job_ids: Optional[List[str]] = None,
+    trigger: str = "manual",
+    scan_job_id: Optional[str] = None
+):
+    """Scan one integration's mailbox and analyze the resumes found"""
+    run = None
+    scan_state = GmailScanState()
+    analyzed_count = 0
+    failed_count = 0
     try:
         logger.info(f"Starting email scan for integration {integration_id}")
         
@@ -31,22 +107,17 @@ async def perform_email_scan(integration_id: str, job_ids: Optional[List[str]] =
             logger.error(f"Integration {integration_id} not found")
             return
         
-        # Update scan status
-        integration.last_scan_status = "running"
-        await integration.save()
+        # Update scan status; only the scan fields are written so a token refreshed
+        # by the token manager during the scan is not overwritten
+        await integration.set({GmailIntegration.last_scan_status: "running"})
         
-        # Refresh access token if needed
-        credentials = gmail_service.get_credentials(
-            access_token=integration.access_token or "",
-            refresh_token=integration.refresh_token or "",
-            token_expiry=integration.token_expiry
-        )
+        # Continue an interrupted run from its checkpoint, or start a new one
+        run, scan_state = await scan_run_service.start(integration_id, trigger, scan_job_id)
+        analyzed_count = run.counters.analyzed
+        failed_count = run.counters.failed - scan_state.attachments_failed
         
-        # Update tokens if refreshed
-        if credentials.token != integration.access_token:
-            integration.access_token = credentials.token
-            integration.token_expiry = credentials.expiry
-            await integration.save()
+        # Tokens are normally refreshed ahead of time by the token manager
+        credentials = await gmail_token_manager.get_credentials(integration)
         
         # Get jobs to scan for
         if job_ids:
@@ -62,186 +133,240 @@ async def perform_email_scan(integration_id: str, job_ids: Optional[List[str]] =
         
         if not jobs:
             logger.warning(f"No jobs found for scanning (integration {integration_id})")
-            integration.last_scan_status = "success"
-            integration.last_scan_at = datetime.utcnow()
-            integration.last_scan_count = 0
-            await integration.save()
+            await scan_run_service.finish(run, scan_state)
+            await integration.set({
+                GmailIntegration.last_scan_status: "success",
+                GmailIntegration.last_scan_at: datetime.utcnow(),
+                GmailIntegration.last_scan_count: 0,
+            })
             return
         
-        # Build keywords from jobs and custom keywords
+        # Build keywords from the jobs' stored keyword profiles and custom keywords
         job_keywords = []
         for job in jobs:
-            job_keywords.append(job.title)
-            if job.description:
-                # Extract key terms from description (simple approach)
-                words = job.description.split()
-                job_keywords.extend([w for w in words if len(w) > 5][:5])
+            profile = await ensure_keyword_profile(job)
+            job_keywords.extend(profile.keywords)
         
         # Add custom keywords
         job_keywords.extend(integration.keywords)
         
-        # Remove duplicates
-        job_keywords = list(set(job_keywords))
+        # Remove duplicates, keeping each job's most important keywords first
+        job_keywords = list(dict.fromkeys(kw.strip() for kw in job_keywords if kw.strip()))
         
         logger.info(f"Scanning with keywords: {job_keywords}")
         
-        # Scan emails
-        resumes = await gmail_service.scan_emails_for_resumes(
-            credentials=credentials,
-            job_keywords=job_keywords,
-            last_scan=integration.last_scan_at,
-            max_results=50
-        )
+        # Stream resumes from Gmail into a bounded queue so analysis overlaps with
+        # fetching and memory stays flat regardless of mailbox size
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SCAN_QUEUE_SIZE)
+        
+        # Import here to avoid circular dependency
+        from app.services.analyze_service import ResumeAnalyzerService
+        analyzer = ResumeAnalyzerService()
+        
+        # Route every resume to its best job(s) locally so each LLM call has the right context
+        matcher = JobMatcher(jobs)
         
-        logger.info(f"Found {len(resumes)} resumes to analyze")
+        # Analyses waiting to be written with one bulk insert
+        pending: List[Tuple[dict, ResumeAnalysis]] = []
         
-        # Analyze each resume
-        analyzed_count = 0
-        for resume_data in resumes:
+        async def flush():
+            nonlocal analyzed_count, failed_count
+            batch = pending[:]
+            pending.clear()
+            if not batch:
+                return
             try:
-                # Import here to avoid circular dependency
-                from app.services.create_service import analyze_resume_with_ai
-                
-                # Analyze resume with AI (you'll need to adapt this to your existing AI service)
-                analysis_result = await analyze_resume_with_ai(
-                    resume_text=resume_data["content"],
-                    job_context=jobs[0].title if jobs else "General"  # Use first job for context
-                )
-                
-                # Save analysis
-                analysis = ResumeAnalysis(
-                    candidate_email=resume_data["from"],
-                    job_id=str(jobs[0].id) if jobs else None,
-                    resume_text=resume_data["content"][:5000],  # Truncate for storage
-                    score=analysis_result.get("score", 0),
-                    ats_score=analysis_result.get("ats_score", 0),
-                    readability_score=analysis_result.get("readability_score", 0),
-                    strengths=analysis_result.get("strengths", []),
-                    weaknesses=analysis_result.get("weaknesses", []),
-                    suggestions=analysis_result.get("suggestions", []),
-                    keyword_matches=analysis_result.get("keyword_matches", []),
-                    missing_keywords=analysis_result.get("missing_keywords", []),
-                    metadata={
-                        "source": "gmail",
-                        "email_id": resume_data["email_id"],
-                        "subject": resume_data["subject"],
-                        "filename": resume_data["filename"],
-                        "date": resume_data["date"]
-                    }
-                )
-                
-                await analysis.insert()
-                analyzed_count += 1
-                logger.info(f"Analyzed resume from {resume_data['from']}")
-                
+                analysis_ids = await analyzer.save_analyses([analysis for _, analysis in batch])
             except Exception as e:
-                logger.error(f"Error analyzing resume from {resume_data.get('from')}: {e}")
-                continue
+                logger.error(f"Error saving {len(batch)} scanned analyses: {e}")
+                failed_count += len(batch)
+                for resume_data, _ in batch:
+                    await attachment_ledger.release(
+                        integration_id, resume_data["email_id"], resume_data["content_hash"]
+                    )
+                return
+            analyzed_count += len(analysis_ids)
+            await attachment_ledger.complete_many(integration_id, [
+                (resume_data["email_id"], resume_data["content_hash"], analysis_id)
+                for (resume_data, _), analysis_id in zip(batch, analysis_ids)
+            ])
+        
+        async def checkpoint():
+            await scan_run_service.checkpoint(run, scan_state, analyzed_count, failed_count)
+        
+        async def produce():
+            async for resume_data in gmail_service.iter_resumes_for_scan(
+                credentials=credentials,
+                job_keywords=job_keywords,
+                state=scan_state,
+                last_scan=integration.last_scan_at,
+                start_history_id=integration.history_id,
+                integration_id=integration_id,
+                on_page=checkpoint
+            ):
+                await queue.put(resume_data)
+            # One stop marker per consumer
+            for _ in range(ANALYSIS_CONCURRENCY):
+                await queue.put(None)
+        
+        async def consume():
+            nonlocal failed_count
+            while True:
+                # Take everything already waiting (up to this consumer's stop marker)
+                # so the batch is routed with one scoring pass
+                batch = [await queue.get()]
+                while batch[-1] is not None and not queue.empty():
+                    batch.append(queue.get_nowait())
+                resumes = [resume_data for resume_data in batch if resume_data is not None]
+                selections = matcher.select_many(
+                    [resume_data["content"] for resume_data in resumes], max_jobs=MAX_JOBS_PER_RESUME
+                )
+                for resume_data, matches in zip(resumes, selections):
+                    analyses = []
+                    for match in matches:
+                        analysis = await analyze_scanned_resume(
+                            analyzer, resume_data, match, integration.recruiter_id, str(run.id)
+                        )
+                        if analysis is not None:
+                            analyses.append(analysis)
+                    if not analyses:
+                        failed_count += 1
+                        # Leave it for the next scan to retry
+                        await attachment_ledger.release(
+                            integration_id, resume_data["email_id"], resume_data["content_hash"]
+                        )
+                        continue
+                    pending.extend((resume_data, analysis) for analysis in analyses)
+                    if len(pending) >= ANALYSIS_WRITE_BATCH:
+                        await flush()
+                if batch[-1] is None:
+                    return
+        
+        # If the producer or a consumer fails, the task group cancels the others and waits
+        # for them, so nothing is still analyzing once the run is finished and the lock freed
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(produce())
+                for _ in range(ANALYSIS_CONCURRENCY):
+                    group.create_task(consume())
+        except ExceptionGroup as errors:
+            # Record the first failure as the scan's error
+            raise errors.exceptions[0]
+        finally:
+            # Save whatever was analyzed, even if the scan stopped early
+            await flush()
+        
+        logger.info(f"Analyzed {analyzed_count} of {scan_state.resumes_extracted} extracted resumes")
+        await scan_run_service.finish(run, scan_state, analyzed_count, failed_count)
         
         # Update integration status
-        integration.last_scan_status = "success"
-        integration.last_scan_at = datetime.utcnow()
-        integration.last_scan_count = analyzed_count
-        integration.last_error = None
-        await integration.save()
+        await integration.set({
+            GmailIntegration.last_scan_status: "success",
+            GmailIntegration.last_scan_at: datetime.utcnow(),
+            GmailIntegration.last_scan_count: analyzed_count,
+            GmailIntegration.last_error: None,
+            GmailIntegration.history_id: scan_state.history_id,
+        })
         
         logger.info(f"Email scan completed. Analyzed {analyzed_count} resumes.")
         
         # Send notification email if enabled
         if integration.send_notifications:
-            await send_scan_notification(integration, analyzed_count, jobs)
+            await send_scan_notification(integration, run, jobs)
         
     except Exception as e:
         logger.error(f"Error in email scan: {e}")
         
-        # Update error status
+        # Update error status; the run keeps its checkpoint for the next scan to resume
         try:
+            if run is not None:
+                await scan_run_service.finish(run, scan_state, analyzed_count, failed_count, error=str(e))
             integration = await GmailIntegration.get(integration_id)
             if integration:
-                integration.last_scan_status = "error"
-                integration.last_error = str(e)
-                integration.last_scan_at = datetime.utcnow()
-                await integration.save()
+                await integration.set({
+                    GmailIntegration.last_scan_status: "error",
+                    GmailIntegration.last_error: str(e),
+                    GmailIntegration.last_scan_at: datetime.utcnow(),
+                })
         except Exception as save_error:
             logger.error(f"Error saving error status: {save_error}")
+        
+        # Let the scan queue retry it
+        raise
 
 
-async def send_scan_notification(
-    integration: GmailIntegration,
-    analyzed_count: int,
-    jobs: List[Job]
-):
-    """Send email notification after scan completion"""
+async def analyze_scanned_resume(
+    analyzer: "ResumeAnalyzerService",
+    resume_data: dict,
+    match: JobMatch,
+    user_id: str,
+    scan_run_id: Optional[str] = None
+) -> Optional[ResumeAnalysis]:
+    """
+    Analyze one resume extracted from Gmail against the job it was routed to
+    
+    Returns:
+        Unsaved ResumeAnalysis, or None if analysis failed
+    """
+    job = match.job
+    sender_name, sender_email = parseaddr(resume_data["from"])
+    
     try:
-        # Import email service
-        from app.services.email_service import send_email
-        
-        recipient = integration.notification_email or integration.email
-        job_titles = ", ".join([job.title for job in jobs[:3]])
-        if len(jobs) > 3:
-            job_titles += f" and {len(jobs) - 3} more"
-        
-        subject = f"Resume Scan Complete - {analyzed_count} CVs Analyzed"
-        
-        body = f"""
-        <html>
-        <body>
-            <h2>Gmail Resume Scan Complete</h2>
-            <p>Your scheduled email scan has been completed.</p>
-            
-            <h3>Scan Summary:</h3>
-            <ul>
-                <li><strong>CVs Analyzed:</strong> {analyzed_count}</li>
-                <li><strong>Jobs:</strong> {job_titles}</li>
-                <li><strong>Scan Time:</strong> {datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")}</li>
-            </ul>
-            
-            <p>
-                <a href="http://localhost:3000/zume/resume/analyze" 
-                   style="background-color: #4F46E5; color: white; padding: 10px 20px; 
-                          text-decoration: none; border-radius: 5px; display: inline-block;">
-                    View Analysis Results
-                </a>
-            </p>
-            
-            <p>Thank you for using our service!</p>
-        </body>
-        </html>
-        """
-        
-        await send_email(
-            to_email=recipient,
-            subject=subject,
-            html_content=body
+        analysis_result = await analyzer.analyze_resume_text(
+            resume_text=resume_data["content"],
+            job_title=job.title,
+            job_description=job.description,
+            links=resume_data.get("links"),
+            candidate_name=sender_name
+        )
+        
+        local_metrics = compute_local_metrics(
+            resume_data["content"],
+            resume_data.get("sections", []),
+            job.description
+        )
+        
+        analysis = analyzer.build_analysis_document(
+            user_id=user_id,
+            file_name=resume_data["filename"],
+            file_size=resume_data.get("file_size", len(resume_data["content"])),
+            file_type=resume_data["mime_type"],
+            job_title=job.title,
+            job_description=job.description,
+            analysis_result=analysis_result,
+            raw_response=analysis_result["raw_response"],
+            professional_links=analysis_result["professional_links"],
+            online_info=analysis_result["online_info"],
+            document_id=resume_data["document_id"],
+            local_metrics=local_metrics,
+            job_id=str(job.id),
+            source="gmail",
+            candidate_email=sender_email or resume_data["from"],
+            source_metadata={
+                "email_id": resume_data["email_id"],
+                "subject": resume_data["subject"],
+                "date": resume_data["date"],
+                "job_match_score": match.score,
+                "scan_run_id": scan_run_id
+            }
         )
         
-        logger.info(f"Notification email sent to {recipient}")
+        logger.info(f"Analyzed resume from {resume_data['from']}")
+        return analysis
         
     except Exception as e:
-        logger.error(f"Error sending notification email: {e}")
+        logger.error(f"Error analyzing resume from {resume_data.get('from')}: {e}")
+        return None
 
 
-async def analyze_resume_with_ai(resume_text: str, job_context: str) -> dict:
-    """
-    Placeholder for AI analysis - integrate with your existing AI service
-    
-    TODO: Replace this with actual AI analysis from your create_service.py
-    """
-    # This is a simplified version - you should integrate with your actual AI service
-    return {
-        "score": 75,
-        "ats_score": 70,
-        "readability_score": 80,
-        "strengths": ["Good formatting", "Relevant experience"],
-        "weaknesses": ["Missing keywords", "Too brief"],
-        "suggestions": [
-            {
-                "category": "Keywords",
-                "issue": "Missing important keywords",
-                "fix": "Add more technical skills",
-                "priority": "high"
-            }
-        ],
-        "keyword_matches": ["Python", "JavaScript"],
-        "missing_keywords": ["React", "AWS"]
-    }
+async def send_scan_notification(
+    integration: GmailIntegration,
+    run: ScanRun,
+    jobs: List[Job]
+):
+    """Notify the recruiter of a finished run, now or in their next digest"""
+    try:
+        from app.services.notification_service import notify_scan_complete
+        await notify_scan_complete(integration, run, jobs)
+    except Exception as e:
+        logger.error(f"Error sending notification email: {e}")
@@ -1,94 +1,345 @@
 """
 Background scheduler for periodic email scanning
+
+Every process competes for a leader lease in Mongo; only the leader runs scheduled
+jobs, and another process takes over within LEADER_LEASE_TTL if the leader dies.
+
+Scheduled jobs only enqueue scans for the scan workers (see app.services.scan_worker).
+They don't all fire on the hour: each integration gets a fixed offset derived from its id.
+
+Config changes are applied per integration: the API calls schedule_integration /
+unschedule_integration, the leader optionally follows a change stream for changes made
+on other processes, and a periodic reconcile repairs anything that drifted.
+
+Jobs are persisted in Mongo, so a new leader resumes the existing schedule without
+loading any integration, and runs missed while no leader was up are caught up once.
+The Mongo job store is synchronous, so job reads and writes run in a worker thread.
 """
+import asyncio
+import hashlib
+import os
+from collections import Counter
+from apscheduler.events import EVENT_JOB_SUBMITTED, JobSubmissionEvent
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.mongodb import MongoDBJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime
-from typing import List
+from apscheduler.triggers.interval import IntervalTrigger
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple, Union
+
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field
 
 from app.database.models.gmail_integration import GmailIntegration
-from app.services.scanner_service import perform_email_scan
+from app.services.lease_service import lease_service, PROCESS_ID
+from app.services.scan_queue import scan_queue
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 scheduler = AsyncIOScheduler()
 
+LEADER_LEASE_NAME = "scheduler-leader"
+LEADER_LEASE_TTL = timedelta(seconds=int(os.getenv("SCHEDULER_LEASE_TTL_SECONDS", "30")))
+# The leader reconciles scheduled jobs against Mongo this often to repair drift
+RESYNC_INTERVAL = timedelta(seconds=int(os.getenv("SCHEDULER_RESYNC_SECONDS", "300")))
+
+# "mongo" keeps jobs across restarts; "memory" rebuilds them whenever a leader starts
+JOBSTORE = os.getenv("SCHEDULER_JOBSTORE", "mongo")
+JOBSTORE_COLLECTION = "scheduler_jobs"
+# A run missed by up to this long (e.g. during a deploy) still happens when a leader
+# comes up; several missed runs of one job are coalesced into one
+MISFIRE_GRACE_TIME = int(os.getenv("SCHEDULER_MISFIRE_GRACE_SECONDS", "21600"))
+
+# Hourly scans are spread over this many minutes past the hour (at most 60)
+HOURLY_SPREAD_MINUTES = int(os.getenv("SCAN_HOURLY_SPREAD_MINUTES", "60"))
+# Daily and weekly scans start up to this many minutes after their configured time
+DAILY_SPREAD_MINUTES = int(os.getenv("SCAN_DAILY_SPREAD_MINUTES", "30"))
+# Follow gmail_integrations with a change stream (needs a replica set) so config changes
+# made on other processes apply immediately instead of at the next reconcile
+WATCH_INTEGRATIONS = os.getenv("SCHEDULER_CHANGE_STREAM", "false").lower() == "true"
+
+SCAN_JOB_PREFIX = "gmail_scan_"
+DIGEST_JOB_ID = "notification_digests"
+# How often pending scan notifications are checked for due hourly and daily digests
+DIGEST_INTERVAL_MINUTES = int(os.getenv("NOTIFICATION_DIGEST_INTERVAL_MINUTES", "5"))
+# Integration fields that affect its scan job
+SCHEDULE_FIELDS = ("email", "scan_schedule", "scan_time", "is_active")
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+is_leader = False
+_election_task: Optional[asyncio.Task] = None
+_watch_task: Optional[asyncio.Task] = None
+
+# job id -> fire time the scheduler submitted the job for
+_scheduled_at: Dict[str, datetime] = {}
+
+
+class ScheduleView(BaseModel):
+    """The integration fields the scheduler reads"""
+    id: PydanticObjectId = Field(alias="_id")
+    email: str
+    scan_schedule: str = "daily"
+    scan_time: str = "09:00"
+    is_active: bool = True
+
+
+def scan_job_id(integration_id: str) -> str:
+    return f"{SCAN_JOB_PREFIX}{integration_id}"
+
+
+def scan_offset_seconds(integration_id: str, window_minutes: int) -> int:
+    """Stable offset within the window, so an integration always runs at the same time"""
+    window = window_minutes * 60
+    if window <= 0:
+        return 0
+    digest = hashlib.sha256(integration_id.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % window
+
+
+def build_scan_trigger(integration: Union[GmailIntegration, ScheduleView]) -> Optional[Tuple[CronTrigger, str]]:
+    """
+    Cron trigger and job name for an integration's schedule, shifted by its offset
+
+    Returns:
+        None if the schedule is unknown
+    """
+    integration_id = str(integration.id)
+    
+    if integration.scan_schedule == "hourly":
+        offset = scan_offset_seconds(integration_id, min(HOURLY_SPREAD_MINUTES, 60))
+        minute, second = divmod(offset, 60)
+        trigger = CronTrigger(minute=minute, second=second)
+        return trigger, f"Hourly scan for {integration.email} at :{minute:02d}:{second:02d}"
+    
+    if integration.scan_schedule not in ("daily", "weekly"):
+        return None
+    
+    hour, minute = map(int, integration.scan_time.split(':'))
+    start = hour * 3600 + minute * 60 + scan_offset_seconds(integration_id, DAILY_SPREAD_MINUTES)
+    day_shift, start = divmod(start, 86400)
+    hour, rest = divmod(start, 3600)
+    minute, second = divmod(rest, 60)
+    at = f"{hour:02d}:{minute:02d}:{second:02d}"
+    
+    if integration.scan_schedule == "daily":
+        trigger = CronTrigger(hour=hour, minute=minute, second=second)
+        return trigger, f"Daily scan for {integration.email} at {at}"
+    
+    # Weekly scans run on Mondays; an offset past midnight moves them to Tuesday
+    day = WEEKDAYS[day_shift % 7]
+    trigger = CronTrigger(day_of_week=day, hour=hour, minute=minute, second=second)
+    return trigger, f"Weekly scan for {integration.email} on {day} at {at}"
+
+
+def _record_submission(event: JobSubmissionEvent):
+    if event.scheduled_run_times:
+        _scheduled_at[event.job_id] = event.scheduled_run_times[-1]
+
+
+scheduler.add_listener(_record_submission, EVENT_JOB_SUBMITTED)
+
 
 async def scan_job_wrapper(integration_id: str):
-    """Wrapper for scheduled scan jobs"""
+    """
+    Scheduled job: queue a scan unless one is already waiting or running.
+    Scheduled scans are not subject to the manual-scan queue limit.
+    """
+    scheduled_at = _scheduled_at.pop(scan_job_id(integration_id), None)
+    try:
+        # Stored as naive UTC, like every other timestamp
+        scheduled_for = scheduled_at.astimezone(timezone.utc).replace(tzinfo=None) if scheduled_at else None
+        _, created = await scan_queue.enqueue(integration_id, trigger="scheduled", scheduled_for=scheduled_for)
+        if not created:
+            logger.info(f"Scan already queued for integration {integration_id}, skipping scheduled run")
+    except Exception as e:
+        logger.error(f"Error queueing scheduled scan for {integration_id}: {e}")
+
+
+def _job_state(job) -> Tuple[str, str]:
+    """What a scheduled job is compared on"""
+    return str(job.trigger), job.name
+
+
+def _schedule_action(scheduled: Optional[Tuple[CronTrigger, str]], current: Optional[Tuple[str, str]]) -> Optional[str]:
+    """
+    The change that brings a job (current state, None if absent) in line with its schedule
+    (None means no job)
+
+    Returns:
+        "added", "updated" or "removed", or None if the job is already correct
+    """
+    if scheduled is None:
+        return "removed" if current is not None else None
+    if current is None:
+        return "added"
+    trigger, name = scheduled
+    return "updated" if current != (str(trigger), name) else None
+
+
+def _apply_schedule(integration_id: str, scheduled: Optional[Tuple[CronTrigger, str]], action: Optional[str]):
+    """Write one planned change to the job store (blocking)"""
+    job_id = scan_job_id(integration_id)
+    if action == "removed":
+        scheduler.remove_job(job_id)
+    elif action == "added":
+        trigger, name = scheduled
+        scheduler.add_job(scan_job_wrapper, trigger=trigger, args=[integration_id], id=job_id, name=name)
+    elif action == "updated":
+        trigger, name = scheduled
+        scheduler.modify_job(job_id, name=name)
+        scheduler.reschedule_job(job_id, trigger=trigger)
+
+
+def _sync_schedule(integration_id: str, scheduled: Optional[Tuple[CronTrigger, str]]) -> Optional[str]:
+    """Look up one integration's job and bring it in line with its schedule (blocking)"""
+    job = scheduler.get_job(scan_job_id(integration_id))
+    action = _schedule_action(scheduled, _job_state(job) if job else None)
+    _apply_schedule(integration_id, scheduled, action)
+    return action
+
+
+def _apply_schedules(planned: List[Tuple[str, Optional[Tuple[CronTrigger, str]], str]]) -> Counter:
+    """Write a reconcile's planned changes to the job store (blocking)"""
+    changes: Counter = Counter()
+    for integration_id, scheduled, action in planned:
+        try:
+            _apply_schedule(integration_id, scheduled, action)
+            changes[action] += 1
+        except Exception as e:
+            logger.error(f"Error updating scan job for integration {integration_id}: {e}")
+    return changes
+
+
+async def schedule_integration(integration: Union[GmailIntegration, ScheduleView]):
+    """
+    Add, update or remove the scan job of one integration after it changed
+
+    Only the leader runs the scheduler; on other processes this is a no-op and the
+    leader picks the change up from the change stream or its next reconcile.
+    """
+    if not is_leader:
+        return
+    integration_id = str(integration.id)
     try:
-        logger.info(f"Executing scheduled scan for integration {integration_id}")
-        await perform_email_scan(integration_id=integration_id)
+        scheduled = build_scan_trigger(integration) if integration.is_active else None
+        action = await asyncio.to_thread(_sync_schedule, integration_id, scheduled)
+        if action:
+            logger.info(f"Scan job for integration {integration_id} {action}")
     except Exception as e:
-        logger.error(f"Error in scheduled scan for {integration_id}: {e}")
+        logger.error(f"Error scheduling scans for integration {integration_id}: {e}")
 
 
-async def setup_scheduled_scans():
-    """Setup all scheduled scans based on active integrations"""
+async def unschedule_integration(integration_id: str):
+    """Remove the scan job of a deleted integration"""
+    if not is_leader:
+        return
+    try:
+        if await asyncio.to_thread(_sync_schedule, integration_id, None):
+            logger.info(f"Scan job for integration {integration_id} removed")
+    except Exception as e:
+        logger.error(f"Error unscheduling scans for integration {integration_id}: {e}")
+
+
+async def reconcile_scheduled_scans():
+    """
+    Diff active integrations against the scheduled jobs and fix only what differs.
+    Jobs are loaded from the store once and compared in memory; only changes are written.
+    """
     try:
-        # Clear existing jobs
-        scheduler.remove_all_jobs()
-        
-        # Get all active integrations
         integrations = await GmailIntegration.find(
             GmailIntegration.is_active == True
-        ).to_list()
+        ).project(ScheduleView).to_list()
         
-        logger.info(f"Setting up {len(integrations)} scheduled scans")
+        jobs = await asyncio.to_thread(scheduler.get_jobs)
+        # integration id -> state of its job
+        current = {
+            job.id[len(SCAN_JOB_PREFIX):]: _job_state(job)
+            for job in jobs if job.id.startswith(SCAN_JOB_PREFIX)
+        }
         
+        planned = []
         for integration in integrations:
-            job_id = f"gmail_scan_{integration.id}"
-            
-            if integration.scan_schedule == "hourly":
-                # Run every hour
-                scheduler.add_job(
-                    scan_job_wrapper,
-                    trigger=CronTrigger(minute=0),
-                    args=[str(integration.id)],
-                    id=job_id,
-                    replace_existing=True,
-                    name=f"Hourly scan for {integration.email}"
-                )
-                logger.info(f"Scheduled hourly scan for {integration.email}")
-                
-            elif integration.scan_schedule == "daily":
-                # Run daily at specified time
-                hour, minute = map(int, integration.scan_time.split(':'))
-                scheduler.add_job(
-                    scan_job_wrapper,
-                    trigger=CronTrigger(hour=hour, minute=minute),
-                    args=[str(integration.id)],
-                    id=job_id,
-                    replace_existing=True,
-                    name=f"Daily scan for {integration.email} at {integration.scan_time}"
-                )
-                logger.info(f"Scheduled daily scan for {integration.email} at {integration.scan_time}")
-                
-            elif integration.scan_schedule == "weekly":
-                # Run weekly on Monday at specified time
-                hour, minute = map(int, integration.scan_time.split(':'))
-                scheduler.add_job(
-                    scan_job_wrapper,
-                    trigger=CronTrigger(day_of_week='mon', hour=hour, minute=minute),
-                    args=[str(integration.id)],
-                    id=job_id,
-                    replace_existing=True,
-                    name=f"Weekly scan for {integration.email} on Mondays at {integration.scan_time}"
-                )
-                logger.info(f"Scheduled weekly scan for {integration.email}")
+            integration_id = str(integration.id)
+            scheduled = build_scan_trigger(integration)
+            if scheduled is None:
+                logger.warning(f"Unknown scan schedule {integration.scan_schedule!r} for {integration.email}")
+            action = _schedule_action(scheduled, current.pop(integration_id, None))
+            if action:
+                planned.append((integration_id, scheduled, action))
+        
+        # Jobs of integrations that were deleted or deactivated
+        planned.extend((integration_id, None, "removed") for integration_id in current)
         
-        logger.info("All scheduled scans configured successfully")
+        if planned:
+            changes = await asyncio.to_thread(_apply_schedules, planned)
+            logger.info(f"Reconciled scans for {len(integrations)} active integrations: {dict(changes)}")
         
     except Exception as e:
-        logger.error(f"Error setting up scheduled scans: {e}")
+        logger.error(f"Error reconciling scheduled scans: {e}")
+
+
+async def _apply_change(change: dict):
+    integration_id = str(change["documentKey"]["_id"])
+    document = change.get("fullDocument")
+    if change["operationType"] == "delete" or document is None:
+        await unschedule_integration(integration_id)
+    else:
+        await schedule_integration(ScheduleView.model_validate(document))
+
+
+async def _watch_integrations():
+    """Apply schedule changes made on any process as they are written"""
+    pipeline = [{"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace", "delete"]}},
+        *({f"updateDescription.updatedFields.{field}": {"$exists": True}} for field in SCHEDULE_FIELDS),
+    ]}}]
+    collection = GmailIntegration.get_pymongo_collection()
+    while True:
+        try:
+            async with await collection.watch(pipeline, full_document="updateLookup") as stream:
+                logger.info("Watching gmail integrations for schedule changes")
+                async for change in stream:
+                    await _apply_change(change)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The periodic reconcile still covers changes missed meanwhile
+            logger.error(f"Integration change stream failed: {e}")
+            await asyncio.sleep(RESYNC_INTERVAL.total_seconds())
+
+
+def _configure_scheduler():
+    """Set the job store and run policies; must happen before the first start"""
+    if JOBSTORE == "mongo":
+        jobstore = MongoDBJobStore(
+            database="db",
+            collection=JOBSTORE_COLLECTION,
+            host=os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+        )
+    else:
+        jobstore = MemoryJobStore()
+    scheduler.configure(
+        jobstores={"default": jobstore},
+        job_defaults={
+            "misfire_grace_time": MISFIRE_GRACE_TIME,
+            "coalesce": True,
+            "max_instances": 1,
+        }
+    )
 
 
 def start_scheduler():
     """Start the background scheduler"""
     if not scheduler.running:
+        _configure_scheduler()
         scheduler.start()
         logger.info("Scheduler started")
+    else:
+        scheduler.resume()
+        logger.info("Scheduler resumed")
 
 
 def stop_scheduler():
@@ -98,7 +349,117 @@ def stop_scheduler():
         logger.info("Scheduler stopped")
 
 
+async def _become_leader():
+    global is_leader
+    is_leader = True
+    logger.info(f"Process {PROCESS_ID} is now the scheduler leader")
+    start_scheduler()
+    
+    # Persisted jobs are already scheduled; only an empty store needs a full load now,
+    # otherwise the periodic reconcile catches up in the background
+    jobs = await asyncio.to_thread(scheduler.get_jobs)
+    if not any(job.id.startswith(SCAN_JOB_PREFIX) for job in jobs):
+        await reconcile_scheduled_scans()
+    
+    from app.services.notification_service import send_due_digests
+    await asyncio.to_thread(
+        scheduler.add_job,
+        send_due_digests,
+        trigger=IntervalTrigger(minutes=DIGEST_INTERVAL_MINUTES),
+        id=DIGEST_JOB_ID,
+        name="Send notification digests",
+        replace_existing=True
+    )
+    
+    global _watch_task
+    if WATCH_INTEGRATIONS and _watch_task is None:
+        _watch_task = asyncio.create_task(_watch_integrations())
+    
+    # Token refreshes are also a single-process job
+    from app.services.token_manager import gmail_token_manager
+    gmail_token_manager.start()
+
+
+async def _lose_leadership():
+    global is_leader
+    is_leader = False
+    logger.warning(f"Process {PROCESS_ID} lost the scheduler leader lease")
+    if scheduler.running:
+        scheduler.pause()
+    await _stop_watching()
+    
+    from app.services.token_manager import gmail_token_manager
+    await gmail_token_manager.stop()
+
+
+async def _stop_watching():
+    global _watch_task
+    if _watch_task is not None:
+        _watch_task.cancel()
+        try:
+            await _watch_task
+        except asyncio.CancelledError:
+            pass
+        _watch_task = None
+
+
+async def _run_leader_election():
+    """Acquire or renew the leader lease every third of its ttl"""
+    last_sync = datetime.utcnow()
+    while True:
+        try:
+            leading = await lease_service.acquire(LEADER_LEASE_NAME, PROCESS_ID, LEADER_LEASE_TTL)
+            if leading and not is_leader:
+                await _become_leader()
+                last_sync = datetime.utcnow()
+            elif not leading and is_leader:
+                await _lose_leadership()
+            elif is_leader and datetime.utcnow() - last_sync >= RESYNC_INTERVAL:
+                await reconcile_scheduled_scans()
+                last_sync = datetime.utcnow()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in scheduler leader election: {e}")
+            # Without a confirmed renewal another process may take over; stop scheduling
+            if is_leader:
+                await _lose_leadership()
+        await asyncio.sleep(LEADER_LEASE_TTL.total_seconds() / 3)
+
+
+def start_leader_election():
+    """Compete for the scheduler leader lease in the background"""
+    global _election_task
+    if _election_task is None:
+        _election_task = asyncio.create_task(_run_leader_election())
+        logger.info(f"Scheduler leader election started ({PROCESS_ID})")
+
+
+async def stop_leader_election():
+    """Stop competing, stop the scheduler and hand the lease to another process"""
+    global _election_task, is_leader
+    if _election_task is not None:
+        _election_task.cancel()
+        try:
+            await _election_task
+        except asyncio.CancelledError:
+            pass
+        _election_task = None
+    
+    if is_leader:
+        await _stop_watching()
+        from app.services.token_manager import gmail_token_manager
+        await gmail_token_manager.stop()
+        is_leader = False
+    
+    stop_scheduler()
+    try:
+        await lease_service.release(LEADER_LEASE_NAME, PROCESS_ID)
+    except Exception as e:
+        logger.warning(f"Error releasing scheduler leader lease: {e}")
+
+
 async def refresh_scheduler():
-    """Refresh scheduler jobs (call this when integration config changes)"""
-    await setup_scheduled_scans()
+    """Reconcile all scheduler jobs now (per-integration changes use schedule_integration)"""
+    await reconcile_scheduled_scans()
     logger.info("Scheduler refreshed")
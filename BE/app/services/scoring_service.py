@@ -0,0 +1,157 @@
+"""
+Local resume scoring - deterministic metrics computed from extracted text without an LLM call
+"""
+import re
+from typing import Dict, List, Optional
+
+from app.database.models.resume_analysis import LocalMetrics
+from app.database.models.resume_document import ResumeSection
+
+# Sections an ATS expects to find in a resume
+CORE_SECTIONS = ["experience", "education", "skills"]
+RECOMMENDED_SECTIONS = ["summary", "projects", "certifications"]
+
+STOP_WORDS = {
+    "the", "and", "for", "with", "you", "your", "our", "are", "will", "this", "that", "from",
+    "have", "has", "who", "can", "all", "any", "not", "but", "was", "were", "been", "their",
+    "they", "them", "into", "about", "also", "such", "other", "more", "work", "team", "role",
+    "able", "must", "should", "would", "could", "using", "use", "well", "including", "within",
+    "across", "years", "year", "experience", "strong", "good", "skills", "ability", "join",
+}
+
+_WORD_PATTERN = re.compile(r"[a-zA-Z][a-zA-Z0-9+#.\-]*[a-zA-Z0-9+#]|[a-zA-Z]")
+_BULLET_PATTERN = re.compile(r"^\s*(?:[•\-\*▪●◦–]|\d+[.)])\s+")
+_NUMBER_PATTERN = re.compile(r"\d+%|\$\s?\d|\d+\+?\s*(?:k|m|x|users|clients|projects|people|hours)?\b", re.IGNORECASE)
+_EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE_PATTERN = re.compile(r"\+?\d[\d\s().-]{7,}\d")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stop words and very short words removed"""
+    return [
+        word for word in (match.lower().strip(".-") for match in _WORD_PATTERN.findall(text))
+        if len(word) > 2 and word not in STOP_WORDS
+    ]
+
+
+def keyword_match(text: str, job_description: Optional[str]) -> Optional[float]:
+    """Percentage of distinct job description keywords present in the resume"""
+    if not job_description:
+        return None
+
+    job_terms = set(tokenize(job_description))
+    if not job_terms:
+        return None
+
+    resume_terms = set(tokenize(text))
+    return round(100 * len(job_terms & resume_terms) / len(job_terms), 1)
+
+
+def compute_local_metrics(
+    text: str,
+    sections: List[ResumeSection],
+    job_description: Optional[str] = None
+) -> LocalMetrics:
+    """
+    Compute deterministic resume metrics from normalized text and its section model.
+    These are cheap enough to recompute after every edit.
+    """
+    lines = [line for line in text.split("\n") if line.strip()]
+    words = text.split()
+    word_count = len(words)
+
+    section_names = {section.name for section in sections}
+    core_found = [name for name in CORE_SECTIONS if name in section_names]
+    recommended_found = [name for name in RECOMMENDED_SECTIONS if name in section_names]
+    section_coverage = (len(core_found) * 2 + len(recommended_found)) / (len(CORE_SECTIONS) * 2 + len(RECOMMENDED_SECTIONS))
+
+    bullet_lines = [line for line in lines if _BULLET_PATTERN.match(line)]
+    quantified_lines = [line for line in bullet_lines if _NUMBER_PATTERN.search(line)]
+    bullet_ratio = len(bullet_lines) / len(lines) if lines else 0.0
+    quantified_ratio = len(quantified_lines) / len(bullet_lines) if bullet_lines else 0.0
+
+    sentences = [s for s in re.split(r"[.!?\n]+", text) if s.strip()]
+    avg_sentence_length = word_count / len(sentences) if sentences else 0.0
+
+    has_email = bool(_EMAIL_PATTERN.search(text))
+    has_phone = bool(_PHONE_PATTERN.search(text))
+
+    # Length: 350-900 words is the comfortable range for one or two pages
+    if word_count < 150:
+        length_score = 30.0
+    elif word_count < 350:
+        length_score = 30.0 + 70.0 * (word_count - 150) / 200
+    elif word_count <= 900:
+        length_score = 100.0
+    else:
+        length_score = max(40.0, 100.0 - (word_count - 900) / 20)
+
+    # Readability: short bullet-style sentences scan best
+    readability_score = max(0.0, min(100.0, 100.0 - max(0.0, avg_sentence_length - 18) * 4))
+
+    ats_score = (
+        section_coverage * 50
+        + (10 if has_email else 0)
+        + (10 if has_phone else 0)
+        + min(bullet_ratio * 2, 1.0) * 15
+        + length_score * 0.15
+    )
+
+    match = keyword_match(text, job_description)
+
+    return LocalMetrics(
+        word_count=word_count,
+        section_count=len(sections),
+        missing_sections=[name for name in CORE_SECTIONS if name not in section_names],
+        bullet_ratio=round(bullet_ratio, 3),
+        quantified_bullet_ratio=round(quantified_ratio, 3),
+        avg_sentence_length=round(avg_sentence_length, 1),
+        has_contact_info=has_email or has_phone,
+        ats_score=round(min(ats_score, 100.0), 1),
+        readability_score=round(readability_score, 1),
+        keyword_match=match
+    )
+
+
+def changed_sections(
+    old_text: str,
+    old_sections: List[ResumeSection],
+    new_text: str,
+    new_sections: List[ResumeSection]
+) -> Dict[str, Dict[str, str]]:
+    """
+    Compare two versions of a resume section by section.
+
+    Returns:
+        Mapping of section name to {"before": ..., "after": ...} for sections that differ.
+        When neither version has detected sections the whole text is treated as one section.
+    """
+    if not old_sections and not new_sections:
+        if old_text.strip() == new_text.strip():
+            return {}
+        return {"resume": {"before": old_text, "after": new_text}}
+
+    def by_name(text: str, sections: List[ResumeSection]) -> Dict[str, str]:
+        result: Dict[str, str] = {}
+        for section in sections:
+            result.setdefault(section.name, text[section.start:section.end].strip())
+        # Text before the first heading usually holds the name and contact details
+        if sections:
+            first = min(sections, key=lambda s: s.start)
+            header = text[:max(text.rfind(first.heading, 0, first.start), 0)].strip()
+        else:
+            header = ""
+        if header:
+            result.setdefault("header", header)
+        return result
+
+    old_by_name = by_name(old_text, old_sections)
+    new_by_name = by_name(new_text, new_sections)
+
+    changes = {}
+    for name in list(old_by_name) + [n for n in new_by_name if n not in old_by_name]:
+        before = old_by_name.get(name, "")
+        after = new_by_name.get(name, "")
+        if before != after:
+            changes[name] = {"before": before, "after": after}
+    return changes
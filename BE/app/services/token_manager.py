@@ -0,0 +1,172 @@
+"""
+Gmail OAuth token manager - refreshes access tokens in the background shortly before
+they expire, spread over time, so scans start with ready credentials
+"""
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from google.oauth2.credentials import Credentials
+
+from app.database.models.gmail_integration import GmailIntegration
+from app.services.gmail_service import gmail_service
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Refresh this long before token_expiry at the latest
+REFRESH_MARGIN = timedelta(minutes=int(os.getenv("GMAIL_TOKEN_REFRESH_MARGIN_MINUTES", "10")))
+# Refreshes are spread over this window before the margin, per integration
+REFRESH_SPREAD = timedelta(minutes=int(os.getenv("GMAIL_TOKEN_REFRESH_SPREAD_MINUTES", "15")))
+# How often the background loop looks for tokens that are due
+CHECK_INTERVAL_SECONDS = int(os.getenv("GMAIL_TOKEN_CHECK_INTERVAL_SECONDS", "60"))
+MAX_CONCURRENT_REFRESHES = int(os.getenv("GMAIL_TOKEN_MAX_CONCURRENT_REFRESHES", "5"))
+# A scan refreshes on the spot if its token has less than this left
+MIN_SCAN_VALIDITY = timedelta(minutes=2)
+
+
+def _spread_offset(integration_id: str) -> timedelta:
+    """Stable per-integration offset within REFRESH_SPREAD"""
+    digest = hashlib.sha256(integration_id.encode("utf-8")).digest()
+    fraction = int.from_bytes(digest[:8], "big") / 2 ** 64
+    return REFRESH_SPREAD * fraction
+
+
+class GmailTokenManager:
+    """Keeps GmailIntegration access tokens fresh and coalesces concurrent refreshes"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self._slots = asyncio.Semaphore(MAX_CONCURRENT_REFRESHES)
+
+    def refresh_due_at(self, integration: GmailIntegration) -> Optional[datetime]:
+        """When this integration's token should be refreshed (None if there is no expiry)"""
+        if not integration.token_expiry:
+            return None
+        return integration.token_expiry - REFRESH_MARGIN - _spread_offset(str(integration.id))
+
+    async def get_credentials(self, integration: GmailIntegration) -> Credentials:
+        """
+        Credentials ready for a scan
+
+        Uses the stored token when it is still valid for a while, otherwise refreshes it
+        (joining a refresh already in progress for the same integration).
+        """
+        expiry = integration.token_expiry
+        if integration.access_token and expiry and expiry - datetime.utcnow() > MIN_SCAN_VALIDITY:
+            return gmail_service.build_credentials(
+                access_token=integration.access_token,
+                refresh_token=integration.refresh_token or "",
+                token_expiry=expiry
+            )
+
+        credentials = await self.refresh(integration)
+        if credentials is None:
+            raise Exception("Could not refresh Gmail access token")
+        return credentials
+
+    async def refresh(self, integration: GmailIntegration) -> Optional[Credentials]:
+        """
+        Refresh and persist the integration's access token
+
+        Concurrent callers for the same integration share one token request.
+
+        Returns:
+            Refreshed credentials, or None if the refresh failed
+        """
+        key = str(integration.id)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(integration))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        credentials = await asyncio.shield(task)
+        if credentials is not None:
+            # Keep the caller's copy in step with what was persisted
+            integration.access_token = credentials.token
+            integration.token_expiry = credentials.expiry
+            if credentials.refresh_token:
+                integration.refresh_token = credentials.refresh_token
+        return credentials
+
+    async def _refresh(self, integration: GmailIntegration) -> Optional[Credentials]:
+        if not integration.refresh_token:
+            logger.warning(f"Integration {integration.id} has no refresh token")
+            return None
+
+        async with self._slots:
+            credentials = await gmail_service.refresh_access_token(integration.refresh_token)
+
+        if credentials is None:
+            return None
+
+        # Partial update so a scan saving the same document doesn't race with this write
+        update = {
+            GmailIntegration.access_token: credentials.token,
+            GmailIntegration.token_expiry: credentials.expiry,
+            GmailIntegration.updated_at: datetime.utcnow(),
+        }
+        if credentials.refresh_token and credentials.refresh_token != integration.refresh_token:
+            update[GmailIntegration.refresh_token] = credentials.refresh_token
+        await integration.set(update)
+
+        logger.info(f"Refreshed Gmail token for integration {integration.id} (expires {credentials.expiry})")
+        return credentials
+
+    async def refresh_due_tokens(self) -> int:
+        """Refresh every active integration whose refresh time has passed"""
+        now = datetime.utcnow()
+        horizon = now + REFRESH_MARGIN + REFRESH_SPREAD
+
+        integrations = await GmailIntegration.find(
+            GmailIntegration.is_active == True,
+            GmailIntegration.refresh_token != None,
+            {"$or": [
+                {"token_expiry": None},
+                {"token_expiry": {"$lte": horizon}},
+            ]}
+        ).to_list()
+
+        due = [
+            integration for integration in integrations
+            if (self.refresh_due_at(integration) or now) <= now
+        ]
+        if due:
+            logger.info(f"Refreshing {len(due)} Gmail tokens")
+            await asyncio.gather(*(self.refresh(integration) for integration in due), return_exceptions=True)
+        return len(due)
+
+    async def _run_loop(self):
+        while True:
+            try:
+                await self.refresh_due_tokens()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error refreshing Gmail tokens: {e}")
+            await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+
+    def start(self):
+        """Start the background refresh loop"""
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run_loop())
+            logger.info("Gmail token manager started")
+
+    async def stop(self):
+        """Stop the background refresh loop"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+            logger.info("Gmail token manager stopped")
+
+
+# Singleton instance
+gmail_token_manager = GmailTokenManager()
@@ -0,0 +1,254 @@
+"""
+Resume document rendering - writes plain resume text to DOCX and PDF.
+Shared by /apply-fix and the synthetic corpus generator.
+"""
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+HEADER_KEYWORDS = ['EXPERIENCE', 'EDUCATION', 'SKILLS', 'SUMMARY', 'CONTACT']
+BULLET_PREFIXES = ('•', '-', '*', '▪')
+
+# Layouts understood by both renderers
+LAYOUTS = ("single", "two-column", "table")
+
+
+def is_header(text: str) -> bool:
+    """ALL CAPS paragraphs or paragraphs starting with a common header keyword"""
+    text = text.strip()
+    return text.isupper() or any(text.startswith(kw) for kw in HEADER_KEYWORDS)
+
+
+def is_bullet(text: str) -> bool:
+    return text.strip().startswith(BULLET_PREFIXES)
+
+
+def split_paragraphs(content: str) -> List[str]:
+    """Split resume text into non-empty paragraphs"""
+    return [para.strip() for para in content.split('\n\n') if para.strip()]
+
+
+def group_sections(paragraphs: List[str]) -> List[Tuple[Optional[str], List[str]]]:
+    """Group paragraphs under the header that precedes them"""
+    sections: List[Tuple[Optional[str], List[str]]] = [(None, [])]
+    for para in paragraphs:
+        if is_header(para):
+            sections.append((para, []))
+        else:
+            sections[-1][1].append(para)
+    return [(header, body) for header, body in sections if header or body]
+
+
+def render_docx(
+    content: str,
+    output_path: Path,
+    base_document_path: Optional[str] = None,
+    layout: str = "single"
+) -> str:
+    """
+    Write resume text to a DOCX file.
+
+    Args:
+        content: Resume text, paragraphs separated by blank lines
+        output_path: Destination .docx path
+        base_document_path: Existing DOCX whose styles should be kept (its content is replaced)
+        layout: "single", "two-column" or "table"
+
+    Returns:
+        Path of the written file
+    """
+    from docx import Document
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+    from docx.shared import Pt
+
+    if base_document_path:
+        # Load the original document to preserve styles, then clear its content
+        doc = Document(base_document_path)
+        for element in list(doc.element.body):
+            if element.tag != qn('w:sectPr'):
+                doc.element.body.remove(element)
+    else:
+        doc = Document()
+
+    style_names = [s.name for s in doc.styles]
+
+    def add_paragraph(container, para_text: str):
+        p = container.add_paragraph(para_text)
+        if is_header(para_text):
+            if base_document_path and 'Heading 1' in style_names:
+                p.style = 'Heading 1'
+            for run in p.runs:
+                run.bold = True
+                run.font.size = Pt(14)
+        elif is_bullet(para_text):
+            if 'List Bullet' in style_names:
+                p.style = 'List Bullet'
+        else:
+            for run in p.runs:
+                run.font.size = Pt(11)
+        return p
+
+    paragraphs = split_paragraphs(content)
+
+    if layout == "table":
+        sections = group_sections(paragraphs)
+        table = doc.add_table(rows=0, cols=2)
+        for header, body in sections:
+            row = table.add_row()
+            header_cell, body_cell = row.cells
+            header_cell.text = ""
+            body_cell.text = ""
+            if header:
+                run = header_cell.paragraphs[0].add_run(header)
+                run.bold = True
+            for index, para_text in enumerate(body):
+                if index == 0:
+                    body_cell.paragraphs[0].add_run(para_text)
+                else:
+                    body_cell.add_paragraph(para_text)
+    else:
+        for para_text in paragraphs:
+            add_paragraph(doc, para_text)
+
+        if layout == "two-column":
+            # Newspaper-style columns on the last (only) section
+            sect_pr = doc.sections[-1]._sectPr
+            cols = sect_pr.find(qn('w:cols'))
+            if cols is None:
+                cols = OxmlElement('w:cols')
+                sect_pr.append(cols)
+            cols.set(qn('w:num'), '2')
+            cols.set(qn('w:space'), '360')
+
+    doc.save(str(output_path))
+    return str(output_path)
+
+
+def render_pdf(content: str, output_path: Path, layout: str = "single") -> str:
+    """
+    Write resume text to a PDF file with reportlab.
+
+    Falls back to a plain canvas renderer if reportlab's platypus module is unavailable.
+
+    Args:
+        content: Resume text, paragraphs separated by blank lines
+        output_path: Destination .pdf path
+        layout: "single", "two-column" or "table"
+
+    Returns:
+        Path of the written file
+    """
+    try:
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.units import inch
+        from reportlab.platypus import (
+            SimpleDocTemplate, BaseDocTemplate, Frame, PageTemplate,
+            Paragraph, Spacer, Table, TableStyle
+        )
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    except ImportError:
+        logger.warning("reportlab not fully installed. Using basic PDF generation.")
+        return _render_pdf_canvas(content, output_path)
+
+    styles = getSampleStyleSheet()
+
+    # Create custom styles
+    header_style = ParagraphStyle(
+        'CustomHeader',
+        parent=styles['Heading1'],
+        fontSize=14,
+        textColor='#1a1a1a',
+        spaceAfter=12,
+        bold=True
+    )
+
+    normal_style = ParagraphStyle(
+        'CustomNormal',
+        parent=styles['Normal'],
+        fontSize=11,
+        textColor='#333333',
+        spaceAfter=8
+    )
+
+    paragraphs = split_paragraphs(content)
+    story = []
+
+    if layout == "table":
+        rows = []
+        for header, body in group_sections(paragraphs):
+            rows.append([
+                Paragraph(header or "", header_style),
+                [Paragraph(para, normal_style) for para in body] or ""
+            ])
+        table = Table(rows, colWidths=[1.8 * inch, 4.7 * inch])
+        table.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LINEBELOW', (0, 0), (-1, -1), 0.25, '#cccccc'),
+        ]))
+        story.append(table)
+    else:
+        for para_text in paragraphs:
+            style = header_style if is_header(para_text) else normal_style
+            story.append(Paragraph(para_text, style))
+            story.append(Spacer(1, 0.1 * inch))
+
+    if layout == "two-column":
+        doc = BaseDocTemplate(str(output_path), pagesize=letter)
+        gap = 0.25 * inch
+        column_width = (doc.width - gap) / 2
+        frames = [
+            Frame(doc.leftMargin, doc.bottomMargin, column_width, doc.height, id='left'),
+            Frame(doc.leftMargin + column_width + gap, doc.bottomMargin, column_width, doc.height, id='right'),
+        ]
+        doc.addPageTemplates([PageTemplate(id='TwoColumn', frames=frames)])
+    else:
+        doc = SimpleDocTemplate(str(output_path), pagesize=letter)
+
+    doc.build(story)
+    return str(output_path)
+
+
+def _render_pdf_canvas(content: str, output_path: Path) -> str:
+    """Basic line-by-line PDF renderer"""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+
+    c = canvas.Canvas(str(output_path), pagesize=letter)
+    width, height = letter
+    y_position = height - 1 * inch
+    c.setFont("Helvetica", 11)
+
+    for line in content.split('\n'):
+        if y_position < 1 * inch:
+            c.showPage()
+            y_position = height - 1 * inch
+            c.setFont("Helvetica", 11)
+
+        if len(line) > 90:
+            words = line.split()
+            current_line = ""
+            for word in words:
+                if len(current_line + " " + word) < 90:
+                    current_line += " " + word if current_line else word
+                else:
+                    c.drawString(1 * inch, y_position, current_line)
+                    y_position -= 15
+                    current_line = word
+                    if y_position < 1 * inch:
+                        c.showPage()
+                        y_position = height - 1 * inch
+                        c.setFont("Helvetica", 11)
+            if current_line:
+                c.drawString(1 * inch, y_position, current_line)
+                y_position -= 15
+        else:
+            c.drawString(1 * inch, y_position, line)
+            y_position -= 15
+
+    c.save()
+    return str(output_path)
@@ -0,0 +1,134 @@
+"""
+In-process metrics registry - counters, gauges and histograms exposed by the /metrics endpoints
+"""
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _sample_line(name: str, labels: Dict[str, str], value: float) -> str:
+    if not labels:
+        return f"{name} {value}"
+    rendered = ",".join(f'{key}="{_escape(str(label))}"' for key, label in sorted(labels.items()))
+    return f"{name}{{{rendered}}} {value}"
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of counters, gauges and histograms
+
+    Gauges can also be registered as callbacks that are evaluated on every snapshot,
+    for values that are cheaper to read on demand than to keep updated.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        # name -> labels -> {"buckets": [...counts], "sum": s, "count": n}
+        self._histograms: Dict[str, Dict[LabelKey, Dict]] = {}
+        self._bucket_bounds: Dict[str, Tuple[float, ...]] = {}
+        self._help: Dict[str, str] = {}
+        self._callbacks: List[Callable[[], List[Tuple[str, Dict[str, str], float]]]] = []
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, labels: Optional[Dict[str, str]] = None) -> None:
+        """Increase a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        """Set a gauge"""
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        labels: Optional[Dict[str, str]] = None,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> None:
+        """Record a value in a histogram"""
+        key = _label_key(labels)
+        with self._lock:
+            bounds = self._bucket_bounds.setdefault(name, tuple(sorted(buckets)))
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = {"buckets": [0] * len(bounds), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(bounds):
+                if value <= bound:
+                    histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def register_callback(self, callback: Callable[[], List[Tuple[str, Dict[str, str], float]]]) -> None:
+        """Register a function returning (gauge name, labels, value) samples"""
+        self._callbacks.append(callback)
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        """All samples as {metric name: [{"labels": {...}, "value": v}]}"""
+        with self._lock:
+            samples = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in {**self._counters, **self._gauges}.items()
+            }
+
+            for name, series in self._histograms.items():
+                bounds = self._bucket_bounds[name]
+                samples[name] = [
+                    {
+                        "labels": dict(key),
+                        "count": histogram["count"],
+                        "sum": round(histogram["sum"], 3),
+                        "buckets": dict(zip((str(b) for b in bounds), histogram["buckets"])),
+                    }
+                    for key, histogram in series.items()
+                ]
+
+        for callback in self._callbacks:
+            for name, labels, value in callback():
+                samples.setdefault(name, []).append({"labels": labels, "value": value})
+        return samples
+
+    def render_prometheus(self) -> str:
+        """Samples in the Prometheus text exposition format"""
+        counters = set(self._counters)
+        histograms = set(self._histograms)
+        lines = []
+        for name, samples in sorted(self.snapshot().items()):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            kind = "counter" if name in counters else "histogram" if name in histograms else "gauge"
+            lines.append(f"# TYPE {name} {kind}")
+            for sample in samples:
+                if kind == "histogram":
+                    for bound, count in sample["buckets"].items():
+                        lines.append(_sample_line(f"{name}_bucket", {**sample["labels"], "le": bound}, count))
+                    lines.append(_sample_line(f"{name}_bucket", {**sample["labels"], "le": "+Inf"}, sample["count"]))
+                    lines.append(_sample_line(f"{name}_sum", sample["labels"], sample["sum"]))
+                    lines.append(_sample_line(f"{name}_count", sample["labels"], sample["count"]))
+                else:
+                    lines.append(_sample_line(name, sample["labels"], sample["value"]))
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+metrics = MetricsRegistry()
@@ -0,0 +1,56 @@
+"""
+Scan worker process - runs queued Gmail scans and sends queued emails without serving the API
+
+    python -m app.worker
+
+Start as many as needed, on any number of nodes; they share the Mongo scan queue.
+Workers also compete for the scheduler leader lease, so scheduled scans and token
+refreshes keep running when the API is deployed in api-only mode.
+"""
+import asyncio
+import signal
+
+from app.database.connection import connect
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+async def run_worker():
+    await connect.init_db()
+    logger.info("Database initialized successfully")
+
+    from app.services.email_service import email_outbox
+    from app.services.scan_worker import scan_worker
+    from app.services.scheduler_service import start_leader_election, stop_leader_election
+
+    start_leader_election()
+    scan_worker.start()
+    email_outbox.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    logger.info("Shutting down scan worker...")
+    await scan_worker.stop()
+    await email_outbox.stop()
+    await stop_leader_election()
+
+    from app.services.extraction_engine import extraction_engine
+    extraction_engine.shutdown()
+
+    from app.services.gmail_service import gmail_service
+    gmail_service.shutdown()
+
+    await connect.close_db()
+
+
+def main():
+    asyncio.run(run_worker())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Synthetic resume corpus generator for load and performance testing
+
+Builds CandidateProfile-shaped candidates, renders them to PDF/DOCX with the same
+renderer /apply-fix uses, writes a ground-truth .txt next to every file and emits
+matching Job descriptions. Optionally seeds MongoDB with the jobs and profiles.
+
+Usage (from the BE directory):
+    python -m benchmarks.corpus_generator out/corpus --count 2000
+    python -m benchmarks.corpus_generator out/corpus --count 500 --formats pdf --layouts two-column table
+    python -m benchmarks.corpus_generator out/corpus --count 1000 --seed-mongo --recruiter-id <user id>
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.database.models.candidate import Education, Project, WorkExperience
+from app.utils.document_renderer import LAYOUTS, render_docx, render_pdf
+
+FIRST_NAMES = ["Ayesha", "Omar", "Lena", "Carlos", "Mei", "Arjun", "Sofia", "Daniel", "Fatima", "Noah",
+               "Hana", "Lucas", "Zara", "Ethan", "Amara", "Mateo", "Yuki", "Bilal", "Chloe", "Ibrahim"]
+LAST_NAMES = ["Khan", "Garcia", "Chen", "Patel", "Muller", "Silva", "Okafor", "Novak", "Haddad", "Kim",
+              "Rossi", "Nguyen", "Ahmed", "Johnson", "Tanaka", "Kowalski", "Mensah", "Larsen", "Costa", "Ali"]
+CITIES = ["Lahore", "Berlin", "Toronto", "Austin", "Singapore", "Dubai", "London", "Bangalore", "Madrid", "Sydney"]
+COMPANIES = ["Northwind", "Contoso", "Globex", "Initech", "Umbrella Labs", "Hooli", "Vandelay", "Stark Systems",
+             "Wayne Digital", "Acme Cloud", "Pied Piper", "Soylent Data"]
+UNIVERSITIES = ["LUMS", "TU Munich", "University of Toronto", "UT Austin", "NUS", "Imperial College",
+                "IIT Bombay", "Universidad Complutense", "University of Sydney", "NUST"]
+
+ROLE_FAMILIES: Dict[str, Dict[str, List[str]]] = {
+    "Backend Engineer": {
+        "skills": ["Python", "FastAPI", "Django", "PostgreSQL", "MongoDB", "Redis", "Docker", "Kubernetes",
+                   "AWS", "gRPC", "Kafka", "Celery", "REST APIs", "Microservices"],
+        "verbs": ["Designed", "Built", "Scaled", "Migrated", "Optimized", "Owned"],
+        "objects": ["payment APIs", "an event pipeline", "the search service", "multi-tenant billing",
+                    "a job queue", "the authentication service"],
+    },
+    "Frontend Engineer": {
+        "skills": ["TypeScript", "React", "Next.js", "Redux", "Tailwind CSS", "GraphQL", "Jest", "Cypress",
+                   "Webpack", "Accessibility", "Figma", "Storybook"],
+        "verbs": ["Implemented", "Redesigned", "Led", "Shipped", "Refactored", "Improved"],
+        "objects": ["the checkout flow", "a design system", "the analytics dashboard", "onboarding screens",
+                    "server-side rendering", "the component library"],
+    },
+    "Data Scientist": {
+        "skills": ["Python", "Pandas", "scikit-learn", "PyTorch", "SQL", "Spark", "Airflow", "A/B Testing",
+                   "Statistics", "Tableau", "XGBoost", "NLP"],
+        "verbs": ["Trained", "Deployed", "Analyzed", "Forecasted", "Modeled", "Automated"],
+        "objects": ["a churn model", "demand forecasts", "recommendation ranking", "fraud detection",
+                    "pricing experiments", "a text classifier"],
+    },
+    "DevOps Engineer": {
+        "skills": ["Terraform", "Kubernetes", "Docker", "AWS", "GCP", "Prometheus", "Grafana", "CI/CD",
+                   "GitHub Actions", "Ansible", "Linux", "Helm"],
+        "verbs": ["Automated", "Hardened", "Migrated", "Reduced", "Standardized", "Monitored"],
+        "objects": ["cloud infrastructure", "the deployment pipeline", "cluster autoscaling", "on-call alerting",
+                    "disaster recovery", "infrastructure costs"],
+    },
+    "Product Manager": {
+        "skills": ["Roadmapping", "User Research", "SQL", "Jira", "A/B Testing", "Stakeholder Management",
+                   "Analytics", "Agile", "Pricing", "Go-to-market"],
+        "verbs": ["Launched", "Defined", "Prioritized", "Grew", "Coordinated", "Drove"],
+        "objects": ["a self-serve plan", "the mobile roadmap", "enterprise onboarding", "activation metrics",
+                    "the partner program", "a new pricing tier"],
+    },
+}
+
+SOFT_SKILLS = ["Communication", "Mentoring", "Ownership", "Collaboration", "Problem Solving", "Leadership"]
+DEGREES = ["BSc", "BS", "MSc", "MS", "BEng", "MBA"]
+FIELDS = ["Computer Science", "Software Engineering", "Data Science", "Electrical Engineering",
+          "Mathematics", "Business Administration"]
+
+
+def _achievement(rng: random.Random, family: Dict[str, List[str]]) -> str:
+    metric = rng.choice([
+        f"cutting latency by {rng.randint(15, 80)}%",
+        f"serving {rng.randint(2, 90)}k daily users",
+        f"saving ${rng.randint(10, 500)}k per year",
+        f"improving conversion by {rng.randint(2, 30)}%",
+        f"with a team of {rng.randint(2, 12)} people",
+    ])
+    return f"{rng.choice(family['verbs'])} {rng.choice(family['objects'])} using {rng.choice(family['skills'])}, {metric}"
+
+
+def generate_profile(rng: random.Random, index: int, length: str) -> Dict:
+    """Generate a CandidateProfile-shaped dict; length is 'short', 'medium' or 'long'"""
+    role = rng.choice(list(ROLE_FAMILIES))
+    family = ROLE_FAMILIES[role]
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+    experience_count = {"short": 1, "medium": rng.randint(2, 3), "long": rng.randint(4, 8)}[length]
+    achievement_count = {"short": 2, "medium": 4, "long": 6}[length]
+
+    year = 2025
+    work_experience = []
+    for position in range(experience_count):
+        start_year = year - rng.randint(1, 4)
+        work_experience.append(WorkExperience(
+            title=("Senior " if position == 0 and experience_count > 2 else "") + role,
+            company=rng.choice(COMPANIES),
+            location=rng.choice(CITIES),
+            start_date=date(start_year, rng.randint(1, 12), 1),
+            end_date=None if position == 0 else date(year, rng.randint(1, 12), 1),
+            currently_working=position == 0,
+            achievements=[_achievement(rng, family) for _ in range(achievement_count)]
+        ))
+        year = start_year
+
+    education = [Education(
+        institution=rng.choice(UNIVERSITIES),
+        degree=rng.choice(DEGREES),
+        field_of_study=rng.choice(FIELDS),
+        graduation_year=year - rng.randint(0, 2),
+        gpa=round(rng.uniform(2.8, 4.0), 2)
+    )]
+
+    projects = [
+        Project(
+            name=f"{rng.choice(['Open', 'Smart', 'Rapid', 'Micro', 'Hyper'])}{rng.choice(['Flow', 'Board', 'Track', 'Sync'])}",
+            description=_achievement(rng, family),
+            technologies=rng.sample(family["skills"], 3),
+            github_url=f"https://github.com/{first.lower()}{last.lower()}/project{n}"
+        )
+        for n in range({"short": 0, "medium": 1, "long": 3}[length])
+    ]
+
+    return {
+        "user_id": f"synthetic-{index:06d}",
+        "full_name": f"{first} {last}",
+        "email": f"{first.lower()}.{last.lower()}{index}@example.com",
+        "phone": f"+1 555 {rng.randint(100, 999)} {rng.randint(1000, 9999)}",
+        "title": role,
+        "location": {"city": rng.choice(CITIES)},
+        "summary": f"{role} with {2025 - year} years of experience in {', '.join(rng.sample(family['skills'], 3))}.",
+        "urls": {"linkedin": f"https://linkedin.com/in/{first.lower()}-{last.lower()}-{index}"},
+        "work_experience": [w.model_dump(mode="json") for w in work_experience],
+        "education": [e.model_dump(mode="json") for e in education],
+        "technical_skills": rng.sample(family["skills"], min(len(family["skills"]), rng.randint(5, 10))),
+        "soft_skills": rng.sample(SOFT_SKILLS, 3),
+        "projects": [p.model_dump(mode="json") for p in projects],
+    }
+
+
+def profile_to_text(profile: Dict) -> str:
+    """Render a profile as resume text (paragraphs separated by blank lines)"""
+    parts = [
+        profile["full_name"],
+        f"{profile['title']} | {profile['location']['city']} | {profile['email']} | {profile['phone']}",
+        profile["urls"]["linkedin"],
+        "SUMMARY",
+        profile["summary"],
+        "EXPERIENCE",
+    ]
+    for job in profile["work_experience"]:
+        end = "Present" if job["currently_working"] else job["end_date"]
+        parts.append(f"{job['title']} - {job['company']}, {job['location']} ({job['start_date']} to {end})")
+        parts.extend(f"• {achievement}" for achievement in job["achievements"])
+
+    parts.append("EDUCATION")
+    for edu in profile["education"]:
+        parts.append(f"{edu['degree']} {edu['field_of_study']} - {edu['institution']}, {edu['graduation_year']} (GPA {edu['gpa']})")
+
+    parts.append("SKILLS")
+    parts.append(", ".join(profile["technical_skills"]))
+    parts.append(", ".join(profile["soft_skills"]))
+
+    if profile["projects"]:
+        parts.append("PROJECTS")
+        for project in profile["projects"]:
+            parts.append(f"{project['name']}: {project['description']} ({', '.join(project['technologies'])}) {project['github_url']}")
+
+    return "\n\n".join(parts)
+
+
+def generate_job(rng: random.Random, role: str, index: int) -> Dict:
+    """Generate a Job-shaped dict for a role family"""
+    family = ROLE_FAMILIES[role]
+    skills = rng.sample(family["skills"], 6)
+    return {
+        "title": role,
+        "description": (
+            f"We are hiring a {role} to join our {rng.choice(COMPANIES)} team in {rng.choice(CITIES)}. "
+            f"You will {rng.choice(family['verbs']).lower()} {rng.choice(family['objects'])} and "
+            f"{rng.choice(family['verbs']).lower()} {rng.choice(family['objects'])}. "
+            f"Requirements: {', '.join(skills[:4])}. Nice to have: {', '.join(skills[4:])}. "
+            f"{rng.randint(2, 7)}+ years of professional experience."
+        ),
+        "location": {"city": rng.choice(CITIES)},
+        "type": "Full-time",
+        "status": "open",
+        "synthetic_index": index,
+    }
+
+
+def generate_corpus(
+    output_dir: Path,
+    count: int,
+    formats: List[str],
+    layouts: List[str],
+    jobs_per_role: int,
+    seed: int
+) -> Dict[str, List[Dict]]:
+    """Write resumes, ground truth and jobs.jsonl to output_dir"""
+    rng = random.Random(seed)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    profiles = []
+    for index in range(count):
+        length = rng.choices(["short", "medium", "long"], weights=[2, 5, 3])[0]
+        profile = generate_profile(rng, index, length)
+        text = profile_to_text(profile)
+        fmt = rng.choice(formats)
+        layout = rng.choice(layouts)
+
+        stem = f"resume_{index:06d}_{layout}"
+        if fmt == "pdf":
+            render_pdf(text, output_dir / f"{stem}.pdf", layout=layout)
+        else:
+            render_docx(text, output_dir / f"{stem}.docx", layout=layout)
+        (output_dir / f"{stem}.txt").write_text(text, encoding="utf-8")
+
+        profiles.append(profile)
+        if (index + 1) % 100 == 0:
+            print(f"Generated {index + 1}/{count} resumes")
+
+    jobs = [
+        generate_job(rng, role, index)
+        for role in ROLE_FAMILIES
+        for index in range(jobs_per_role)
+    ]
+    with (output_dir / "jobs.jsonl").open("w", encoding="utf-8") as handle:
+        for job in jobs:
+            handle.write(json.dumps(job) + "\n")
+    with (output_dir / "profiles.jsonl").open("w", encoding="utf-8") as handle:
+        for profile in profiles:
+            handle.write(json.dumps(profile) + "\n")
+
+    return {"profiles": profiles, "jobs": jobs}
+
+
+async def seed_mongo(profiles: List[Dict], jobs: List[Dict], recruiter_id: str, company_id: Optional[str]) -> None:
+    """Insert generated jobs and candidate profiles for load runs"""
+    from app.database.connection import connect
+    from app.database.models.candidate import CandidateProfile
+    from app.database.models.job import Job
+    from app.services.job_matcher import build_keyword_profile
+
+    await connect.init_db()
+    try:
+        job_documents = [
+            Job(
+                recruiter_id=recruiter_id,
+                company_id=company_id or "",
+                title=job["title"],
+                description=job["description"],
+                location=job["location"],
+                type=job["type"],
+                status=job["status"]
+            )
+            for job in jobs
+        ]
+        # Keywords used by Gmail scans and resume routing, as when a job is created
+        for job_document in job_documents:
+            job_document.keyword_profile = build_keyword_profile(job_document)
+        await Job.insert_many(job_documents)
+
+        batch_size = 500
+        for start in range(0, len(profiles), batch_size):
+            await CandidateProfile.insert_many([
+                CandidateProfile(**profile) for profile in profiles[start:start + batch_size]
+            ])
+        print(f"Seeded {len(job_documents)} jobs and {len(profiles)} candidate profiles")
+    finally:
+        await connect.close_db()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic resume corpus")
+    parser.add_argument("output", type=Path, help="Output directory")
+    parser.add_argument("--count", type=int, default=1000, help="Number of resumes")
+    parser.add_argument("--formats", nargs="+", choices=["pdf", "docx"], default=["pdf", "docx"])
+    parser.add_argument("--layouts", nargs="+", choices=list(LAYOUTS), default=list(LAYOUTS))
+    parser.add_argument("--jobs-per-role", type=int, default=3, help="Job descriptions per role family")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible corpora")
+    parser.add_argument("--seed-mongo", action="store_true", help="Insert jobs and profiles into MongoDB")
+    parser.add_argument("--recruiter-id", default="synthetic-recruiter", help="Recruiter ID for seeded jobs")
+    parser.add_argument("--company-id", default=None, help="Company ID for seeded jobs")
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.output, args.count, args.formats, args.layouts, args.jobs_per_role, args.seed)
+    print(f"Wrote {args.count} resumes and {len(corpus['jobs'])} jobs to {args.output}")
+
+    if args.seed_mongo:
+        asyncio.run(seed_mongo(corpus["profiles"], corpus["jobs"], args.recruiter_id, args.company_id))
+
+
+if __name__ == "__main__":
+    main()
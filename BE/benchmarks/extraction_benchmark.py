@@ -0,0 +1,74 @@
+"""
+Extraction engine benchmark - reports pages/sec per core for a directory of resumes
+
+Usage (from the BE directory):
+    python -m benchmarks.extraction_benchmark path/to/resumes --workers 4 --repeat 3
+"""
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from app.services.extraction_engine import ExtractionEngine
+
+RESUME_EXTENSIONS = {".pdf", ".docx"}
+
+
+async def run_benchmark(files: list[Path], workers: int, repeat: int, max_pages: int) -> dict:
+    """Extract every file `repeat` times through a fresh engine and time it"""
+    engine = ExtractionEngine(max_workers=workers, max_pages=max_pages)
+    payloads = [(path.name, path.read_bytes()) for path in files]
+
+    # Warm up the pool so process start-up isn't measured
+    await asyncio.gather(*(engine.extract(data, name) for name, data in payloads[:workers]))
+
+    pages = 0
+    failures = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = await asyncio.gather(*(engine.extract(data, name) for name, data in payloads))
+        for result in results:
+            if result is None:
+                failures += 1
+            else:
+                pages += min(result.page_count, max_pages) if result.page_count else 1
+    elapsed = time.perf_counter() - started
+
+    engine.shutdown()
+
+    pages_per_sec = pages / elapsed if elapsed else 0.0
+    return {
+        "documents": len(payloads) * repeat,
+        "pages": pages,
+        "failures": failures,
+        "workers": workers,
+        "elapsed_sec": round(elapsed, 3),
+        "pages_per_sec": round(pages_per_sec, 2),
+        "pages_per_sec_per_core": round(pages_per_sec / workers, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the resume extraction engine")
+    parser.add_argument("corpus", type=Path, help="Directory containing PDF/DOCX resumes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus per run")
+    parser.add_argument("--max-pages", type=int, default=10, help="Page limit per document")
+    args = parser.parse_args()
+
+    files = sorted(p for p in args.corpus.rglob("*") if p.suffix.lower() in RESUME_EXTENSIONS)
+    if not files:
+        raise SystemExit(f"No PDF/DOCX files found in {args.corpus}")
+
+    print(f"Corpus: {len(files)} files from {args.corpus}")
+    print(f"{'workers':>8} {'docs':>6} {'pages':>7} {'fail':>5} {'sec':>8} {'pages/s':>9} {'pages/s/core':>13}")
+    for workers in args.workers:
+        result = asyncio.run(run_benchmark(files, workers, args.repeat, args.max_pages))
+        print(
+            f"{result['workers']:>8} {result['documents']:>6} {result['pages']:>7} {result['failures']:>5} "
+            f"{result['elapsed_sec']:>8} {result['pages_per_sec']:>9} {result['pages_per_sec_per_core']:>13}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Extractor benchmark harness - compares parser backends on throughput, peak RSS and text fidelity
+
+The corpus is a directory of PDF/DOCX resumes (synthetic, or real ones that have been
+anonymized). A `<name>.txt` file next to a resume is treated as its ground-truth text and
+enables the fidelity columns.
+
+Usage (from the BE directory):
+    python -m benchmarks.extractor_harness path/to/corpus
+    python -m benchmarks.extractor_harness path/to/corpus --backend pypdf2 mypkg.backends:PdfMinerBackend
+    python -m benchmarks.extractor_harness path/to/corpus --json report.json
+"""
+import argparse
+import difflib
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.services.extraction_service import EXTRACTOR_BACKENDS, extract_resume, normalize_text
+
+RESUME_EXTENSIONS = {".pdf", ".docx"}
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def token_f1(extracted: str, truth: str) -> float:
+    """Bag-of-words F1 between extracted text and ground truth"""
+    extracted_tokens = Counter(extracted.lower().split())
+    truth_tokens = Counter(truth.lower().split())
+    if not extracted_tokens or not truth_tokens:
+        return 0.0
+
+    overlap = sum((extracted_tokens & truth_tokens).values())
+    precision = overlap / sum(extracted_tokens.values())
+    recall = overlap / sum(truth_tokens.values())
+    return 2 * precision * recall / (precision + recall) if overlap else 0.0
+
+
+def order_similarity(extracted: str, truth: str) -> float:
+    """Reading-order similarity of the token sequences (catches scrambled columns)"""
+    return difflib.SequenceMatcher(None, extracted.lower().split(), truth.lower().split(), autojunk=False).ratio()
+
+
+def _measure_backend(backend: str, files: List[str], max_pages: int, repeat: int) -> Dict:
+    """Run in a fresh process so peak RSS belongs to this backend alone"""
+    payloads = [(Path(path).name, Path(path).read_bytes(), Path(path).suffix.lower()) for path in files]
+    truths = {}
+    for path in files:
+        truth_path = Path(path).with_suffix(".txt")
+        if truth_path.exists():
+            truths[Path(path).name] = normalize_text(truth_path.read_text(encoding="utf-8"))
+
+    baseline_rss = _peak_rss_mb()
+    by_format: Dict[str, Dict] = {}
+
+    for iteration in range(repeat):
+        for name, data, ext in payloads:
+            stats = by_format.setdefault(ext, {
+                "documents": 0, "failures": 0, "pages": 0, "bytes": 0, "seconds": 0.0,
+                "f1": [], "order": []
+            })
+
+            started = time.perf_counter()
+            result = extract_resume(data, name, max_pages=max_pages, backend=backend)
+            stats["seconds"] += time.perf_counter() - started
+            stats["documents"] += 1
+            stats["bytes"] += len(data)
+
+            if result is None or not result.text:
+                stats["failures"] += 1
+                continue
+
+            stats["pages"] += min(result.page_count, max_pages) if result.page_count else 1
+            # Fidelity is deterministic, so score it on the first pass only
+            if iteration == 0 and name in truths:
+                stats["f1"].append(token_f1(result.text, truths[name]))
+                stats["order"].append(order_similarity(result.text, truths[name]))
+
+    peak_rss = _peak_rss_mb()
+    rows = []
+    for ext, stats in sorted(by_format.items()):
+        seconds = stats["seconds"] or 1e-9
+        rows.append({
+            "backend": backend,
+            "format": ext.lstrip("."),
+            "documents": stats["documents"],
+            "failures": stats["failures"],
+            "docs_per_sec": round(stats["documents"] / seconds, 2),
+            "pages_per_sec": round(stats["pages"] / seconds, 2),
+            "mb_per_sec": round(stats["bytes"] / (1024 * 1024) / seconds, 2),
+            "peak_rss_mb": round(peak_rss, 1),
+            "rss_growth_mb": round(peak_rss - baseline_rss, 1),
+            "token_f1": round(sum(stats["f1"]) / len(stats["f1"]), 3) if stats["f1"] else None,
+            "order_similarity": round(sum(stats["order"]) / len(stats["order"]), 3) if stats["order"] else None,
+        })
+    return {"backend": backend, "rows": rows}
+
+
+def run_harness(corpus: Path, backends: List[str], max_pages: int = 10, repeat: int = 1) -> List[Dict]:
+    """Benchmark every backend over the corpus, each in its own process"""
+    files = sorted(str(p) for p in corpus.rglob("*") if p.suffix.lower() in RESUME_EXTENSIONS)
+    if not files:
+        raise SystemExit(f"No PDF/DOCX files found in {corpus}")
+
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for backend in backends:
+        with context.Pool(processes=1) as pool:
+            result = pool.apply(_measure_backend, (backend, files, max_pages, repeat))
+        rows.extend(result["rows"])
+    return rows
+
+
+def print_report(rows: List[Dict]) -> None:
+    columns = [
+        ("backend", 24), ("format", 6), ("documents", 9), ("failures", 8), ("docs_per_sec", 12),
+        ("pages_per_sec", 13), ("mb_per_sec", 10), ("peak_rss_mb", 11), ("token_f1", 8), ("order_similarity", 16),
+    ]
+    print(" ".join(f"{name:>{width}}" for name, width in columns))
+    for row in rows:
+        print(" ".join(
+            f"{'-' if row[name] is None else row[name]!s:>{width}}" for name, width in columns
+        ))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare resume extractor backends")
+    parser.add_argument("corpus", type=Path, help="Directory of PDF/DOCX resumes with optional .txt ground truth")
+    parser.add_argument(
+        "--backend", nargs="+", default=list(EXTRACTOR_BACKENDS),
+        help="Registered backend names or 'package.module:ClassName' paths"
+    )
+    parser.add_argument("--max-pages", type=int, default=10, help="Page limit per document")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the corpus per backend")
+    parser.add_argument("--json", type=Path, help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    rows = run_harness(args.corpus, args.backend, args.max_pages, args.repeat)
+    print_report(rows)
+
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2), encoding="utf-8")
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,36 +11,73 @@ from app.router.gmail_integration import router as gmail_router
 from app.router.profile import router as profile_router
 from app.router.templates import router as templates_router
 from app.router.trends import router as trends_router
+from app.router.metrics import router as metrics_router
 from app.middleware.security import SecurityHeadersMiddleware, RateLimitMiddleware
 from app.utils.logger import get_logger
+import os
 import signal
 import sys
 
 logger = get_logger(__name__)
 
+# "combined" serves the API and runs queued scans and emails; "api" only serves the API
+# (scans and emails are sent by `python -m app.worker` processes); "worker" runs scans
+# and emails without serving the API, and is started with `python -m app.worker` or
+# `python main.py`, never under an ASGI server
+APP_MODE = os.getenv("APP_MODE", "combined")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- STARTUP ---
+    if APP_MODE == "worker":
+        # e.g. `uvicorn main:app` with APP_MODE=worker would otherwise quietly serve the API
+        raise RuntimeError("APP_MODE=worker does not serve the API; start it with `python -m app.worker`")
+    if APP_MODE not in ("combined", "api"):
+        raise RuntimeError(f"Unknown APP_MODE {APP_MODE!r}; expected combined, api or worker")
     logger.info("Starting application...")
     await connect.init_db()  # Connects to Mongo & Initializes Beanie
     logger.info("Database initialized successfully")
     
-    # Start background scheduler for Gmail scanning
-    from app.services.scheduler_service import start_scheduler, setup_scheduled_scans
-    start_scheduler()
-    await setup_scheduled_scans()
-    logger.info("Background scheduler started")
+    # Scheduled Gmail scans and token refreshes run only in the process holding the
+    # scheduler leader lease
+    from app.services.scheduler_service import start_leader_election
+    start_leader_election()
+    logger.info("Background scheduler election started")
+    
+    if APP_MODE == "combined":
+        from app.services.scan_worker import scan_worker
+        scan_worker.start()
+        
+        from app.services.email_service import email_outbox
+        email_outbox.start()
 
     yield  # The application runs here
 
     # --- SHUTDOWN ---
     logger.info("Shutting down application...")
     
-    # Stop scheduler
-    from app.services.scheduler_service import stop_scheduler
-    stop_scheduler()
+    if APP_MODE == "combined":
+        # Scans in progress go back to the queue for another worker
+        from app.services.scan_worker import scan_worker
+        await scan_worker.stop()
+        
+        # Queued emails stay in the outbox for the next sender
+        from app.services.email_service import email_outbox
+        await email_outbox.stop()
+    
+    # Stop scheduler and token refreshes, releasing the leader lease
+    from app.services.scheduler_service import stop_leader_election
+    await stop_leader_election()
     logger.info("Background scheduler stopped")
     
+    # Stop text extraction worker processes
+    from app.services.extraction_engine import extraction_engine
+    extraction_engine.shutdown()
+    
+    # Stop Gmail API worker threads
+    from app.services.gmail_service import gmail_service
+    gmail_service.shutdown()
+    
     await connect.close_db() # Cleans up connection
 
 # Pass the lifespan to the app
@@ -87,6 +124,7 @@ app.include_router(gmail_router, prefix="/api/v1/gmail", tags=["GMAIL_INTEGRATIO
 app.include_router(profile_router, prefix="/api/v1/profile", tags=["PROFILE"])
 app.include_router(templates_router, prefix="/api/v1/templates", tags=["TEMPLATES"])
 app.include_router(trends_router, prefix="/api/v1/trends", tags=["TRENDS"])
+app.include_router(metrics_router, prefix="/api/v1/metrics", tags=["METRICS"])
 
 
 @app.get("/")
@@ -100,6 +138,11 @@ def signal_handler(sig, frame):
     sys.exit(0)
 
 if __name__ == "__main__":
+    if APP_MODE == "worker":
+        from app.worker import main
+        main()
+        sys.exit(0)
+    
     signal.signal(signal.SIGINT, signal_handler)
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
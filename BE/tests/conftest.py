@@ -0,0 +1,11 @@
+import os
+
+import pytest
+
+# The analyzer refuses to import without a key; tests never call Gemini
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
@@ -0,0 +1,122 @@
+"""
+The outbox sender delivers queued emails to a local SMTP stand-in: it claims them from
+the outbox, sends them over a pooled session and marks them sent
+"""
+import asyncio
+import socket
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.database.models.outbox_email import OutboxEmail
+from app.services.email_service import DEFAULT_FROM_EMAIL, EmailOutbox
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller  # noqa: E402
+
+
+class RecordingHandler:
+    """aiosmtpd handler that keeps every envelope it accepts"""
+
+    def __init__(self):
+        self.envelopes = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+def _matches(document: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(document, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(key)
+            if "$lte" in condition and (value is None or value > condition["$lte"]):
+                return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+
+def _apply(document: dict, update: dict) -> None:
+    document.update(update.get("$set", {}))
+    for key, amount in update.get("$inc", {}).items():
+        document[key] = document.get(key, 0) + amount
+
+
+class FakeOutboxCollection:
+    """In-memory stand-in for the outbox collection, covering the queries the sender runs"""
+
+    def __init__(self):
+        self.documents = {}
+
+    async def find_one_and_update(self, query, update, sort=None, return_document=None):
+        for document in self.documents.values():
+            if _matches(document, query):
+                _apply(document, update)
+                return dict(document)
+        return None
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            for document in self.documents.values():
+                if _matches(document, request._filter):
+                    _apply(document, request._doc)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    monkeypatch.setenv("SMTP_HOST", controller.hostname)
+    monkeypatch.setenv("SMTP_PORT", str(controller.port))
+    monkeypatch.setenv("SMTP_STARTTLS", "false")
+    for name in ("SMTP_USERNAME", "SMTP_PASSWORD", "SMTP_FROM_EMAIL"):
+        monkeypatch.delenv(name, raising=False)
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def outbox_collection(monkeypatch):
+    collection = FakeOutboxCollection()
+    monkeypatch.setattr(OutboxEmail, "get_pymongo_collection", classmethod(lambda cls: collection))
+    return collection
+
+
+@pytest.mark.anyio
+async def test_outbox_sends_queued_email_and_marks_it_sent(smtp_server, outbox_collection):
+    email = OutboxEmail(to_email="recruiter@example.com", subject="Scan complete", html_content="<p>Done</p>")
+    email.id = ObjectId()
+    outbox_collection.documents[email.id] = email.model_dump(by_alias=True)
+
+    outbox = EmailOutbox(pool_size=1)
+    outbox.start()
+    try:
+        for _ in range(50):
+            if outbox_collection.documents[email.id]["status"] == "sent":
+                break
+            await asyncio.sleep(0.1)
+    finally:
+        await outbox.stop()
+
+    stored = outbox_collection.documents[email.id]
+    assert stored["status"] == "sent"
+    assert stored["attempts"] == 1
+    assert isinstance(stored["sent_at"], datetime)
+
+    assert len(smtp_server.envelopes) == 1
+    envelope = smtp_server.envelopes[0]
+    assert envelope.mail_from == DEFAULT_FROM_EMAIL
+    assert envelope.rcpt_tos == ["recruiter@example.com"]
+    assert b"Subject: Scan complete" in envelope.original_content
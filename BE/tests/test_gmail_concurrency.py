@@ -0,0 +1,72 @@
+"""
+Gmail calls block, so they run on the Gmail thread pool; the API must keep serving
+requests while a scan waits on Gmail
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.gmail_service import GmailScanState, gmail_service
+from main import app
+
+SLOW_CALL_SECONDS = 1.0
+
+
+class SlowRequest:
+    """A Gmail API request whose execute() blocks like a slow response"""
+
+    def __init__(self, response: dict):
+        self.response = response
+
+    def execute(self) -> dict:
+        time.sleep(SLOW_CALL_SECONDS)
+        return self.response
+
+
+class SlowGmailClient:
+    """Just enough of the Gmail client for a scan of an empty mailbox"""
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def getProfile(self, userId: str) -> SlowRequest:
+        return SlowRequest({"historyId": "1"})
+
+    def list(self, **kwargs) -> SlowRequest:
+        return SlowRequest({"messages": []})
+
+
+@pytest.mark.anyio
+async def test_api_requests_are_served_while_a_scan_runs(monkeypatch):
+    async def get_service(credentials, cache_key=None):
+        return SlowGmailClient()
+
+    monkeypatch.setattr(gmail_service, "get_service", get_service)
+
+    async def scan():
+        state = GmailScanState()
+        resumes = [resume async for resume in gmail_service.iter_resumes_for_scan(None, [], state)]
+        return resumes, state
+
+    scan_task = asyncio.create_task(scan())
+    # Let the scan reach its first blocking Gmail call
+    await asyncio.sleep(0.1)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        started = time.monotonic()
+        response = await client.get("/")
+        elapsed = time.monotonic() - started
+
+    assert response.status_code == 200
+    assert elapsed < SLOW_CALL_SECONDS / 2
+    assert not scan_task.done()
+
+    resumes, state = await scan_task
+    assert resumes == []
+    assert state.history_id == "1"
+    assert state.mode == "full"
@@ -0,0 +1,116 @@
+"""
+A scan streams resumes from Gmail to concurrent analyses; when Gmail fails partway,
+every analysis must have stopped before the run is finished and its lock released
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import analyze_service, scanner_service
+from app.services.gmail_service import GmailScanState
+
+ANALYSIS_SECONDS = 0.2
+
+
+class FakeIntegration(SimpleNamespace):
+    async def set(self, fields):
+        for field, value in fields.items():
+            setattr(self, field, value)
+
+
+class FakeAnalyzer:
+    async def save_analyses(self, analyses):
+        return [f"analysis-{index}" for index, _ in enumerate(analyses)]
+
+
+class FakeMatcher:
+    def __init__(self, jobs):
+        self.jobs = jobs
+
+    def select_many(self, texts, max_jobs=2):
+        return [[SimpleNamespace(job=self.jobs[0], score=1.0)] for _ in texts]
+
+
+@pytest.fixture
+def scan(monkeypatch):
+    """Patch the scan's collaborators and record what the run saw"""
+    integration = FakeIntegration(
+        recruiter_id="recruiter", job_ids=[], keywords=[], last_scan_at=None,
+        history_id=None, send_notifications=False
+    )
+    job = SimpleNamespace(id="job", title="Engineer", description="Python")
+    seen = SimpleNamespace(
+        integration=integration, in_flight=0, started=0, finished_with=None, in_flight_at_finish=None
+    )
+
+    async def get_integration(integration_id):
+        return integration
+
+    async def start(integration_id, trigger, scan_job_id):
+        return SimpleNamespace(id="run", counters=SimpleNamespace(analyzed=0, failed=0)), GmailScanState()
+
+    async def finish(run, state, analyzed=0, failed=0, error=None):
+        seen.finished_with = error
+        seen.in_flight_at_finish = seen.in_flight
+
+    async def ignore(*args, **kwargs):
+        return None
+
+    async def keyword_profile(job):
+        return SimpleNamespace(keywords=["python"])
+
+    async def analyze(analyzer, resume_data, match, user_id, scan_run_id=None):
+        seen.in_flight += 1
+        seen.started += 1
+        try:
+            await asyncio.sleep(ANALYSIS_SECONDS)
+            return SimpleNamespace(resume=resume_data["email_id"])
+        finally:
+            seen.in_flight -= 1
+
+    async def resumes(**kwargs):
+        for index in range(3):
+            yield {"email_id": f"message-{index}", "content_hash": "hash", "content": "Python"}
+        await asyncio.sleep(0.05)
+        raise RuntimeError("Gmail failed")
+
+    # Field references are plain names here; init_beanie would provide expressions
+    fields = ("last_scan_status", "last_scan_at", "last_scan_count", "last_error", "history_id")
+    monkeypatch.setattr(scanner_service, "GmailIntegration", SimpleNamespace(
+        get=get_integration, **{field: field for field in fields}
+    ))
+    monkeypatch.setattr(scanner_service.scan_run_service, "start", start)
+    monkeypatch.setattr(scanner_service.scan_run_service, "checkpoint", ignore)
+    monkeypatch.setattr(scanner_service.scan_run_service, "finish", finish)
+    monkeypatch.setattr(scanner_service.gmail_token_manager, "get_credentials", ignore)
+    monkeypatch.setattr(scanner_service.Job, "find", lambda *args: SimpleNamespace(to_list=lambda: _value([job])))
+    monkeypatch.setattr(scanner_service, "ensure_keyword_profile", keyword_profile)
+    monkeypatch.setattr(scanner_service, "JobMatcher", FakeMatcher)
+    monkeypatch.setattr(scanner_service, "analyze_scanned_resume", analyze)
+    monkeypatch.setattr(scanner_service.attachment_ledger, "release", ignore)
+    monkeypatch.setattr(scanner_service.attachment_ledger, "complete_many", ignore)
+    monkeypatch.setattr(scanner_service.gmail_service, "iter_resumes_for_scan", resumes)
+    monkeypatch.setattr(analyze_service, "ResumeAnalyzerService", FakeAnalyzer)
+    return seen
+
+
+async def _value(value):
+    return value
+
+
+@pytest.mark.anyio
+async def test_gmail_failure_stops_analyses_before_the_run_finishes(scan):
+    with pytest.raises(RuntimeError, match="Gmail failed"):
+        await scanner_service._perform_email_scan("integration", job_ids=["0" * 24])
+
+    assert scan.started > 0
+    assert scan.finished_with == "Gmail failed"
+    assert scan.in_flight_at_finish == 0
+    assert scan.integration.last_scan_status == "error"
+
+    # Nothing keeps analyzing after the scan has returned
+    started = scan.started
+    await asyncio.sleep(ANALYSIS_SECONDS * 2)
+    assert scan.started == started
+    assert scan.in_flight == 0